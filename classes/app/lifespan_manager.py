@@ -76,6 +76,11 @@ class LifespanManager:
 
         RuleService.task_manager.stop()
 
+        # Сервисы дописывают накопленные данные
+        ecosystem = Ecosystem()
+        if ecosystem.service_runner is not None:
+            ecosystem.service_runner.stop()
+
     @contextlib.asynccontextmanager
     async def lifespan(self, app: FastAPI) -> AsyncIterator[None]:
         """Lifespan handler для FastAPI"""
@@ -26,10 +26,11 @@ from jwt import InvalidTokenError
 from pydantic import BaseModel
 from sqlmodel import select
 
+from classes.auth.principal_cache import principal_cache
 from classes.crypto.hasher import Hasher
 from config.dependencies import get_ecosystem
 from classes.logger.logger import Logger
-from database.session import write_session
+from database.session import read_session
 from entities.user import UserEntity
 
 from responses.unauthenticated_response import UnauthenticatedResponse
@@ -55,7 +56,7 @@ class Auth:
 
     @staticmethod
     def get_user(username: str) -> UserResponseInDb:
-        with write_session() as session:
+        with read_session() as session:
             user: UserEntity | None = session.exec(
                 select(UserEntity).where(UserEntity.username == username)
             ).first()
@@ -63,6 +64,17 @@ class Auth:
                 raise HTTPException(detail="User not found", status_code=404)
             return UserResponseInDb.model_validate(user.model_dump())
 
+    @staticmethod
+    def get_principal(username: str) -> UserResponseInDb:
+        """Пользователь для проверки токена: из кэша, при промахе - из БД"""
+        user = principal_cache.get(username)
+        if user is not None:
+            return user
+        version = principal_cache.version()
+        user = Auth.get_user(username)
+        principal_cache.put(user, version)
+        return user
+
     @staticmethod
     def authenticate_user(username: str, password: str):
         user = Auth.get_user(username)
@@ -116,7 +128,7 @@ class Auth:
             token_data = TokenData(username=username)
         except InvalidTokenError:
             raise credentials_exception
-        user = Auth.get_user(username=token_data.username)
+        user = Auth.get_principal(username=token_data.username)
         if user is None:
             raise credentials_exception
         exp: int = payload.get("exp")
@@ -158,7 +170,7 @@ class Auth:
             token_data = TokenData(username=username)
         except InvalidTokenError:
             raise auth_exception
-        user = Auth.get_user(username=token_data.username)
+        user = Auth.get_principal(username=token_data.username)
         if user is None:
             raise auth_exception
         return user
@@ -184,7 +196,7 @@ class Auth:
             raise WebSocketException(
                 code=status.WS_1008_POLICY_VIOLATION
             )
-        user = Auth.get_user(username=token_data.username)
+        user = Auth.get_principal(username=token_data.username)
         if user is None:
             raise WebSocketException(
                 code=status.WS_1008_POLICY_VIOLATION
@@ -0,0 +1,66 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from responses.user import UserResponseInDb
+
+
+class PrincipalCache:
+    """Кэш аутентифицированных пользователей по имени из токена (sub) с коротким TTL.
+    Сбрасывается при изменении или удалении пользователя.
+    """
+
+    def __init__(self, ttl: float = 30):
+        self.ttl = ttl
+        self._users: Dict[str, Tuple[UserResponseInDb, float]] = {}
+        self._lock = Lock()
+        # Растет при каждом сбросе: пользователь, прочитанный до сброса, не попадает в кэш
+        self._version: int = 0
+
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self, username: str) -> Optional[UserResponseInDb]:
+        with self._lock:
+            cached = self._users.get(username)
+            if cached is None:
+                return None
+            user, expires = cached
+            if time.monotonic() >= expires:
+                del self._users[username]
+                return None
+            return user
+
+    def put(self, user: UserResponseInDb, version: int):
+        with self._lock:
+            if version == self._version:
+                self._users[user.username] = (user, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id: int | None = None):
+        """Сбрасывает пользователя по id или весь кэш"""
+        with self._lock:
+            self._version += 1
+            if user_id is None:
+                self._users.clear()
+                return
+            for username in [name for name, (user, _) in self._users.items() if user.id == user_id]:
+                del self._users[username]
+
+
+principal_cache = PrincipalCache()
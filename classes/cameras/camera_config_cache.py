@@ -0,0 +1,131 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import dataclass
+from enum import StrEnum
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from classes.logger.logger import Logger
+from classes.logger.logger_types import LoggerType
+from models.camera_model import CameraModelWithRelations
+
+
+class CameraChangeKind(StrEnum):
+    ADDED = 'added'
+    UPDATED = 'updated'
+    ONLINE = 'online'
+    COVER = 'cover'
+    AREAS = 'areas'
+
+
+@dataclass(frozen=True)
+class CameraChangeEvent:
+    """Событие изменения камеры, отправляется подписчикам после commit"""
+    kind: CameraChangeKind
+    camera: CameraModelWithRelations
+    previous: Optional[CameraModelWithRelations] = None
+
+    @property
+    def needs_restart(self) -> bool:
+        """Изменились параметры подключения или записи - поток нужно перезапустить"""
+        return self.kind == CameraChangeKind.UPDATED
+
+
+CameraChangeListener = Callable[[CameraChangeEvent], None]
+
+
+class CameraConfigCache:
+    """Процессный write-through кэш конфигурации камер.
+
+    Заполняется при первом чтении из БД и обновляется репозиторием после каждого commit
+    (add/update/set_online/cover/areas), поэтому маршруты и потоки камер не читают БД на каждый запрос.
+    Подписчики получают явные события изменения вместо периодического опроса.
+    """
+
+    def __init__(self):
+        self._cameras: Dict[int, CameraModelWithRelations] = {}
+        # Загружен ли полный список камер
+        self._complete: bool = False
+        self._listeners: List[CameraChangeListener] = []
+        self._lock = Lock()
+        # Растет при каждом сбросе: камера, прочитанная до сброса, не попадает в кэш
+        self._version: int = 0
+
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self, camera_id: int) -> Optional[CameraModelWithRelations]:
+        with self._lock:
+            return self._cameras.get(camera_id)
+
+    def all(self) -> Optional[List[CameraModelWithRelations]]:
+        """Все камеры по имени или None, если полный список еще не загружен"""
+        with self._lock:
+            if not self._complete:
+                return None
+            return sorted(self._cameras.values(), key=lambda camera: camera.name)
+
+    def fill(self, cameras: List[CameraModelWithRelations], version: int):
+        """Заполняет кэш полным списком камер из БД"""
+        with self._lock:
+            if version != self._version:
+                return
+            self._cameras = {camera.id: camera for camera in cameras}
+            self._complete = True
+
+    def load(self, camera: CameraModelWithRelations, version: int):
+        """Кладет в кэш камеру, прочитанную из БД (без события)"""
+        with self._lock:
+            if version == self._version:
+                self._cameras[camera.id] = camera
+
+    def put(self, camera: CameraModelWithRelations, kind: CameraChangeKind):
+        """Записывает измененную камеру и уведомляет подписчиков. Вызывается после commit"""
+        with self._lock:
+            previous = self._cameras.get(camera.id)
+            self._cameras[camera.id] = camera
+            listeners = list(self._listeners)
+
+        event = CameraChangeEvent(kind=kind, camera=camera, previous=previous)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                Logger.err(f'[{camera.name}] Camera change listener error: {e}', LoggerType.CAMERAS)
+
+    def invalidate(self, camera_id: int | None = None):
+        """Сбрасывает камеру по id или весь кэш (например, при изменении хранилища)"""
+        with self._lock:
+            self._version += 1
+            if camera_id is None:
+                self._cameras.clear()
+            else:
+                self._cameras.pop(camera_id, None)
+            self._complete = False
+
+    def subscribe(self, listener: CameraChangeListener):
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def unsubscribe(self, listener: CameraChangeListener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+camera_config_cache = CameraConfigCache()
@@ -0,0 +1,97 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from datetime import datetime
+from enum import StrEnum
+
+import numpy as np
+
+# Точка графика: (время, значение)
+ChartPoint = tuple[datetime, float]
+
+
+class ChartDownsample(StrEnum):
+    NONE = 'none'
+    LTTB = 'lttb'
+    BUCKET = 'bucket'
+
+
+def downsample(points: list[ChartPoint], threshold: int, method: ChartDownsample) -> list[ChartPoint]:
+    """Прореживает точки графика до threshold выбранным методом"""
+    if method == ChartDownsample.NONE or threshold <= 0 or len(points) <= threshold:
+        return points
+    if method == ChartDownsample.BUCKET:
+        return bucket_mean(points, threshold)
+    return lttb(points, threshold)
+
+
+def lttb(points: list[ChartPoint], threshold: int) -> list[ChartPoint]:
+    """Largest-Triangle-Three-Buckets: сохраняет форму графика (пики и провалы),
+    оставляя первую и последнюю точку и по одной точке из каждого интервала.
+    """
+    size = len(points)
+    if threshold >= size or threshold < 3:
+        return points
+
+    x = np.fromiter((p[0].timestamp() for p in points), dtype=np.float64, count=size)
+    y = np.fromiter((p[1] for p in points), dtype=np.float64, count=size)
+
+    # Границы интервалов для точек между первой и последней
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Среднее следующего интервала (для последнего - последняя точка)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[size - 1], y[size - 1]
+
+        # Удвоенная площадь треугольника (a, кандидат, среднее следующего интервала)
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected.append(a)
+    selected.append(size - 1)
+    return [points[i] for i in selected]
+
+
+def bucket_mean(points: list[ChartPoint], threshold: int) -> list[ChartPoint]:
+    """Делит диапазон времени на threshold равных интервалов и берет среднее значение в каждом"""
+    size = len(points)
+    if threshold >= size or threshold < 1:
+        return points
+
+    x = np.fromiter((p[0].timestamp() for p in points), dtype=np.float64, count=size)
+    y = np.fromiter((p[1] for p in points), dtype=np.float64, count=size)
+
+    span = x[-1] - x[0]
+    if span <= 0:
+        return [points[0]]
+    index = np.minimum(((x - x[0]) / span * threshold).astype(np.int64), threshold - 1)
+    counts = np.bincount(index, minlength=threshold)
+    sums_y = np.bincount(index, weights=y, minlength=threshold)
+    sums_x = np.bincount(index, weights=x, minlength=threshold)
+
+    tz = points[0][0].tzinfo
+    return [
+        (datetime.fromtimestamp(sums_x[i] / counts[i], tz=tz), float(sums_y[i] / counts[i]))
+        for i in np.flatnonzero(counts)
+    ]
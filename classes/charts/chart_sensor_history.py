@@ -14,6 +14,7 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from classes.charts.chart_base import BaseChart
+from classes.charts.chart_downsample import ChartPoint
 from classes.charts.chart_series import ChartSeries
 from classes.charts.chart_type import ChartType
 from models.sensor_history_model import SensorHistoryModel
@@ -34,8 +35,15 @@ class SensorHistoryChart(BaseChart):
         series.type = ChartType.LINE
         data = []
         for d in history:
-            val = round(float(d.value), 2)
-            time = d.created
-            data.append([time, val])
+            if d.value_num is None:
+                continue
+            data.append([d.created, round(d.value_num, 2)])
         series.data = data
         self.series.append(series)
+
+    def set_points(self, points: list[ChartPoint]):
+        series = ChartSeries()
+        series.name = self.sensor.name
+        series.type = ChartType.LINE
+        series.data = [[time, round(val, 2)] for time, val in points]
+        self.series.append(series)
@@ -25,6 +25,7 @@ from config.settings import settings
 
 class Crypto:
     _fernet = None
+    _key: str | None = None
     _key_env_var = 'ENCRYPTION_KEY'
 
     @classmethod
@@ -87,6 +88,8 @@ class Crypto:
                     os.fsync(f.fileno())
 
                 Logger.info(f"Generated new encryption key and saved to .env file", LoggerType.APP)
+                cls._key = new_key
+                cls._fernet = None
                 return new_key
 
             except Exception as e:
@@ -97,7 +100,7 @@ class Crypto:
     @classmethod
     def _get_fernet(cls):
         if cls._fernet is None:
-            key = cls._get_key_from_env()
+            key = cls.get_key_string()
 
             key = bytes.fromhex(key)
 
@@ -132,8 +135,10 @@ class Crypto:
 
     @classmethod
     def get_key_string(cls):
-        """Возвращает текущий ключ"""
-        return cls._get_key_from_env()
+        """Возвращает текущий ключ (читается один раз, сбрасывается при смене ключа)"""
+        if cls._key is None:
+            cls._key = cls._get_key_from_env()
+        return cls._key
 
     @classmethod
     def rotate_key(cls) -> bool:
@@ -160,6 +165,7 @@ class Crypto:
                     f.writelines(lines)
 
             cls._fernet = None
+            cls._key = None
 
             Logger.warn(
                 f"Encryption key rotated! All previously encrypted data is now INACCESSIBLE!",
@@ -0,0 +1,338 @@
+# Copyright (C) 2026 Mikhail Sazanov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import threading
+import time
+from typing import Optional, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select, col
+
+from classes.logger.logger import Logger
+from classes.logger.logger_types import LoggerType
+from database.session import read_session
+from entities.device import DeviceEntity
+from entities.sensor_entity import SensorEntity
+from models.device_model import DeviceModelMain
+from models.device_model_relations import DeviceModelWithPlugin
+from models.sensor_model import SensorModelWithDevice
+
+
+class DeviceIndex:
+    """Индекс устройств и сенсоров в памяти.
+
+    Ключи: устройство по id, external_id и имени; сенсор по id, (устройство, identifier)
+    и (устройство, имя). Загружается целиком двумя запросами при первом обращении.
+    Записи через ORM сбрасывают затронутые устройства после commit (см. события сессии ниже),
+    массовые UPDATE/INSERT вызывают invalidate_* явно. Промах по ключу читается из БД и
+    добавляется в индекс, поэтому устройства, созданные после загрузки, тоже находятся.
+    """
+
+    # Полная перезагрузка не реже этого интервала - страховка от записей в обход ORM
+    max_age: float = 600.0
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Растет при каждом сбросе: загрузка, начатая до сброса, в индекс не попадает
+        self._version: int = 0
+        self._loaded_at: Optional[float] = None
+
+        self._devices: dict[int, DeviceModelWithPlugin] = {}
+        self._by_external_id: dict[str, int] = {}
+        self._by_name: dict[str, int] = {}
+
+        self._sensors: dict[int, SensorModelWithDevice] = {}
+        self._by_identifier: dict[tuple[int, str], int] = {}
+        self._by_sensor_name: dict[tuple[int, str], int] = {}
+        self._device_sensors: dict[int, set[int]] = {}
+
+    # ========== Загрузка ==========
+
+    def _ensure_loaded(self):
+        with self.lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.max_age:
+                return
+            version = self._version
+        try:
+            devices, sensors = self._read()
+        except Exception as e:
+            Logger.err(f'DeviceIndex load error: {e}', LoggerType.DEVICES)
+            return
+
+        with self.lock:
+            if version != self._version:
+                # Пока читали, что-то изменилось - следующее обращение перечитает заново
+                return
+            self._clear()
+            for device in devices:
+                self._put_device(device)
+            for sensor in sensors:
+                self._put_sensor(sensor)
+            self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _read(
+            device_ids: Optional[Iterable[int]] = None
+    ) -> tuple[list[DeviceModelWithPlugin], list[SensorModelWithDevice]]:
+        with read_session() as sess:
+            query = select(DeviceEntity).options(selectinload(DeviceEntity.plugin))
+            if device_ids is not None:
+                query = query.where(col(DeviceEntity.id).in_(list(device_ids)))
+            devices = [
+                DeviceModelWithPlugin.model_validate(
+                    {**device.to_dict(), 'plugin': device.plugin.to_dict() if device.plugin else None}
+                )
+                for device in sess.exec(query).all()
+            ]
+            if not devices:
+                return [], []
+            mains = {
+                device.id: DeviceModelMain.model_validate(device.model_dump())
+                for device in devices
+            }
+            sensors = []
+            for sensor in sess.exec(
+                    select(SensorEntity).where(col(SensorEntity.device_id).in_(list(mains)))
+            ).all():
+                try:
+                    sensors.append(SensorModelWithDevice.model_validate(
+                        {**sensor.to_dict(), 'device': mains[sensor.device_id]}
+                    ))
+                except ValueError as e:
+                    # Некорректная строка не должна ломать весь индекс
+                    Logger.warn(f'DeviceIndex: sensor #{sensor.id} skipped: {e}', LoggerType.DEVICES)
+            return devices, sensors
+
+    def _load_devices(self, device_ids: set[int]) -> bool:
+        """Дочитывает устройства (вместе с сенсорами) после промаха"""
+        with self.lock:
+            version = self._version
+        try:
+            devices, sensors = self._read(device_ids)
+        except Exception as e:
+            Logger.err(f'DeviceIndex load error: {e}', LoggerType.DEVICES)
+            return False
+        with self.lock:
+            if version != self._version:
+                return bool(devices)
+            for device_id in device_ids:
+                self._drop_device(device_id)
+            for device in devices:
+                self._put_device(device)
+            for sensor in sensors:
+                self._put_sensor(sensor)
+        return bool(devices)
+
+    def _clear(self):
+        self._devices.clear()
+        self._by_external_id.clear()
+        self._by_name.clear()
+        self._sensors.clear()
+        self._by_identifier.clear()
+        self._by_sensor_name.clear()
+        self._device_sensors.clear()
+
+    def _put_device(self, device: DeviceModelWithPlugin):
+        self._devices[device.id] = device
+        if device.external_id is not None:
+            self._by_external_id[device.external_id] = device.id
+        if device.name is not None:
+            self._by_name[device.name] = device.id
+        self._device_sensors.setdefault(device.id, set())
+
+    def _put_sensor(self, sensor: SensorModelWithDevice):
+        self._sensors[sensor.id] = sensor
+        self._by_identifier[(sensor.device_id, sensor.identifier)] = sensor.id
+        if sensor.name is not None:
+            self._by_sensor_name[(sensor.device_id, sensor.name)] = sensor.id
+        self._device_sensors.setdefault(sensor.device_id, set()).add(sensor.id)
+
+    def _drop_sensor(self, sensor_id: int):
+        sensor = self._sensors.pop(sensor_id, None)
+        if sensor is None:
+            return
+        if self._by_identifier.get((sensor.device_id, sensor.identifier)) == sensor_id:
+            del self._by_identifier[(sensor.device_id, sensor.identifier)]
+        if self._by_sensor_name.get((sensor.device_id, sensor.name)) == sensor_id:
+            del self._by_sensor_name[(sensor.device_id, sensor.name)]
+        self._device_sensors.get(sensor.device_id, set()).discard(sensor_id)
+
+    def _drop_device(self, device_id: int):
+        for sensor_id in list(self._device_sensors.pop(device_id, ())):
+            self._drop_sensor(sensor_id)
+        device = self._devices.pop(device_id, None)
+        if device is None:
+            return
+        if self._by_external_id.get(device.external_id) == device_id:
+            del self._by_external_id[device.external_id]
+        if self._by_name.get(device.name) == device_id:
+            del self._by_name[device.name]
+
+    # ========== Сброс ==========
+
+    def invalidate(self):
+        """Полный сброс: индекс перечитается при следующем обращении"""
+        with self.lock:
+            self._version += 1
+            self._loaded_at = None
+
+    def invalidate_devices(self, device_ids: Iterable[int]):
+        """Сбрасывает устройства вместе с их сенсорами"""
+        with self.lock:
+            self._version += 1
+            for device_id in device_ids:
+                self._drop_device(device_id)
+
+    def invalidate_sensors(self, sensor_ids: Iterable[int]):
+        with self.lock:
+            self._version += 1
+            for sensor_id in sensor_ids:
+                self._drop_sensor(sensor_id)
+
+    def set_online(self, external_ids: Iterable[str], online: bool):
+        """Статус меняется массовым UPDATE - правим модели на месте"""
+        with self.lock:
+            for external_id in external_ids:
+                device_id = self._by_external_id.get(external_id)
+                device = self._devices.get(device_id) if device_id is not None else None
+                if device is None:
+                    continue
+                self._devices[device_id] = device.model_copy(update={'online': online})
+                # У каждого сенсора своя копия устройства
+                for sensor_id in self._device_sensors.get(device_id, ()):
+                    sensor = self._sensors.get(sensor_id)
+                    if sensor is not None and sensor.device is not None:
+                        self._sensors[sensor_id] = sensor.model_copy(
+                            update={'device': sensor.device.model_copy(update={'online': online})}
+                        )
+
+    # ========== Поиск ==========
+
+    def get_device(self, device_id: int) -> Optional[DeviceModelWithPlugin]:
+        self._ensure_loaded()
+        with self.lock:
+            device = self._devices.get(device_id)
+        if device is None and self._load_devices({device_id}):
+            with self.lock:
+                device = self._devices.get(device_id)
+        return device
+
+    def get_device_id(self, name: str) -> Optional[int]:
+        """Id устройства по имени или external_id (как DeviceRepository.get_device_by_name)"""
+        self._ensure_loaded()
+        with self.lock:
+            device_id = self._by_name.get(name) or self._by_external_id.get(name)
+        if device_id is not None:
+            return device_id
+        return self._find_device_id(
+            (col(DeviceEntity.name) == name) | (col(DeviceEntity.external_id) == name)
+        )
+
+    def get_device_by_external_id(self, external_id: str) -> Optional[DeviceModelWithPlugin]:
+        self._ensure_loaded()
+        with self.lock:
+            device_id = self._by_external_id.get(external_id)
+        if device_id is None:
+            device_id = self._find_device_id(col(DeviceEntity.external_id) == external_id)
+        return self.get_device(device_id) if device_id is not None else None
+
+    def _find_device_id(self, condition) -> Optional[int]:
+        """Промах по ключу: устройство могло появиться после загрузки индекса"""
+        with read_session() as sess:
+            device_id = sess.exec(select(DeviceEntity.id).where(condition)).first()
+        if device_id is not None:
+            self._load_devices({device_id})
+        return device_id
+
+    def get_sensor(self, sensor_id: int) -> Optional[SensorModelWithDevice]:
+        self._ensure_loaded()
+        with self.lock:
+            sensor = self._sensors.get(sensor_id)
+        if sensor is not None:
+            return sensor
+
+        with read_session() as sess:
+            device_id = sess.exec(
+                select(SensorEntity.device_id).where(SensorEntity.id == sensor_id)
+            ).first()
+        if device_id is not None and self._load_devices({device_id}):
+            with self.lock:
+                return self._sensors.get(sensor_id)
+        return None
+
+    def get_sensor_by_identifier(self, device_id: int, identifier: str) -> Optional[SensorModelWithDevice]:
+        return self._get_sensor_by_key(self._by_identifier, device_id, identifier)
+
+    def get_sensor_by_name(self, device_id: int, name: str) -> Optional[SensorModelWithDevice]:
+        return self._get_sensor_by_key(self._by_sensor_name, device_id, name)
+
+    def _get_sensor_by_key(self, index: dict, device_id: int, key: str) -> Optional[SensorModelWithDevice]:
+        self._ensure_loaded()
+        with self.lock:
+            sensor_id = index.get((device_id, key))
+            if sensor_id is not None:
+                return self._sensors.get(sensor_id)
+        # Сенсор мог появиться после загрузки - перечитываем устройство
+        if self._load_devices({device_id}):
+            with self.lock:
+                sensor_id = index.get((device_id, key))
+                return self._sensors.get(sensor_id) if sensor_id is not None else None
+        return None
+
+    def get_device_sensors(self, device_id: int) -> list[SensorModelWithDevice]:
+        self._ensure_loaded()
+        with self.lock:
+            loaded = device_id in self._devices
+        if not loaded:
+            self._load_devices({device_id})
+        with self.lock:
+            return [self._sensors[sensor_id] for sensor_id in self._device_sensors.get(device_id, ())]
+
+
+device_index = DeviceIndex()
+
+
+# ========== Согласованность с записями через ORM ==========
+# Затронутые устройства и сенсоры собираются при flush и сбрасываются только после commit,
+# чтобы параллельное чтение не закэшировало незафиксированные данные.
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    devices = session.info.setdefault('device_index_devices', set())
+    sensors = session.info.setdefault('device_index_sensors', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, DeviceEntity) and obj.id is not None:
+            devices.add(obj.id)
+        elif isinstance(obj, SensorEntity) and obj.id is not None:
+            sensors.add(obj.id)
+            if obj.device_id is not None and obj in session.new:
+                # Новый сенсор: перечитываем устройство, чтобы он появился в индексе
+                devices.add(obj.device_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    devices = session.info.pop('device_index_devices', None)
+    sensors = session.info.pop('device_index_sensors', None)
+    if devices:
+        device_index.invalidate_devices(devices)
+    if sensors:
+        device_index.invalidate_sensors(sensors)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('device_index_devices', None)
+    session.info.pop('device_index_sensors', None)
@@ -17,14 +17,15 @@ from typing import Optional, Any, List, TYPE_CHECKING, Union
 
 from attr.validators import is_callable
 
+from classes.devices.device_index import device_index
 from classes.devices.device_registry import device_registry
 from classes.devices.device_sensor_type_enum import DeviceSensorTypeEnum
 from classes.devices.device_source_enum import DeviceSource, DeviceFeature
+from classes.devices.sensor_ingest_buffer import sensor_ingest_buffer
 from models.device_model_relations import DeviceModelWithRelations
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from config.dependencies import get_ecosystem
-from database.session import write_session
 from models.device_model import DeviceModel, DeviceModelMain
 from models.sensor_model import SensorModel, SensorModelWithDevice
 from models.sensors.config.sensor_opentherm_config import BoundItem
@@ -77,8 +78,7 @@ class DeviceManager:
 
     def get_device_sensors(self, device_id: int) -> List[SensorModel]:
         """Получить все сенсоры устройства"""
-        with write_session() as session:
-            return session.query(SensorModel).filter_by(device_id=device_id).all()
+        return device_index.get_device_sensors(device_id)
 
     def sensor_is_opentherm(self, sensor: SensorModelWithDevice):
         return sensor.capability == "opentherm"
@@ -115,7 +115,7 @@ class DeviceManager:
 
     def _get_plugin_for_device(self, device_id: int):
         """Получить плагин, который управляет устройством"""
-        device = self.get_device(device_id)
+        device = device_index.get_device(device_id)
         if not device:
             raise ValueError(f"Device {device_id} not found")
 
@@ -134,17 +134,11 @@ class DeviceManager:
         Установить значение сенсора (включить, изменить яркость и т.д.)
         Делегирует плагину.
         """
-
-        device_model = DeviceRepository.get_device_by_name(
-            name=device_name
-        )
-        if device_model is None:
+        device_id = device_index.get_device_id(device_name)
+        if device_id is None:
             return False
 
-        sensor = SensorRepository.get_sensor_by_device_and_identifier(
-            device_id=device_model.id,
-            identifier=sensor_identifier
-        )
+        sensor = device_index.get_sensor_by_identifier(device_id, sensor_identifier)
 
         if sensor is None:
             return False
@@ -169,16 +163,11 @@ class DeviceManager:
         """
         Обновление значения сенсора в базе данных
         """
-        device_model = DeviceRepository.get_device_by_name(
-            name=device_name
-        )
-        if device_model is None:
+        device_id = device_index.get_device_id(device_name)
+        if device_id is None:
             return False
 
-        sensor = SensorRepository.get_sensor_by_device_and_identifier(
-            device_id=device_model.id,
-            identifier=sensor_identifier
-        )
+        sensor = device_index.get_sensor_by_identifier(device_id, sensor_identifier)
 
         if sensor is None:
             return False
@@ -194,10 +183,11 @@ class DeviceManager:
 
     def toggle(self, sensor_id: int) -> bool:
         """Переключить состояние устройства (сенсор переключателя)"""
-        sensor = self.get_sensor(sensor_id)
+        sensor = device_index.get_sensor(sensor_id)
         if not sensor or not sensor.device:
             return False
-        return self._set_sensor_bool(sensor_id, not self._value_as_bool(sensor.value))
+        value = sensor_ingest_buffer.current_value(sensor_id, sensor.value)
+        return self._set_sensor_bool(sensor_id, not self._value_as_bool(value))
 
     @staticmethod
     def _value_as_bool(value: Any) -> bool:
@@ -212,7 +202,7 @@ class DeviceManager:
 
     def _set_sensor_bool(self, sensor_id: int, value: bool) -> bool:
         """Отправить bool-команду через плагин, управляющий сенсором."""
-        sensor = self.get_sensor(sensor_id)
+        sensor = device_index.get_sensor(sensor_id)
         if not isinstance(sensor, SensorModelWithDevice) or not sensor.device:
             return False
         if not isinstance(sensor.device, DeviceModelMain):
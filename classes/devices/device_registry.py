@@ -17,8 +17,9 @@ from datetime import datetime
 from time import sleep
 from typing import Any, Optional, List, Dict
 
-from sqlmodel import col
+from sqlmodel import col, update
 
+from classes.devices.device_index import device_index
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from database.session import write_session
@@ -360,34 +361,7 @@ class DeviceRegistry:
         :param name: Имя устройства
         :return: True если устройство найдено и обновлено
         """
-        with write_session() as session:
-            try:
-                device = session.query(DeviceEntity).where(col(DeviceEntity.external_id) == name).first()
-
-                if not device:
-                    Logger.warn(
-                        f"Device not found for set_offline: name={name}",
-                        LoggerType.DEVICES
-                    )
-                    return False
-
-                device.online = False
-
-                session.commit()
-
-                Logger.debug(
-                    f"Device set offline: {name} (id={device.id})",
-                    LoggerType.DEVICES
-                )
-                return True
-
-            except Exception as e:
-                Logger.err(
-                    f"Failed to set device offline by name {name}: {e}",
-                    LoggerType.DEVICES
-                )
-                session.rollback()
-                return False
+        return self._set_status(name, False)
 
     def set_online(self, name: str) -> bool:
         """
@@ -396,35 +370,77 @@ class DeviceRegistry:
         :param name: Имя устройства
         :return: True если устройство найдено и обновлено
         """
-        with write_session() as session:
-            try:
-                device = session.query(DeviceEntity).where(col(DeviceEntity.external_id) == name).first()
-
-                if not device:
-                    Logger.warn(
-                        f"Device not found for set_online: name={name}",
-                        LoggerType.DEVICES
-                    )
-                    return False
-
-                device.online = True
-                device.last_sync = datetime.now()
+        return self._set_status(name, True)
+
+    def _set_status(self, name: str, online: bool) -> bool:
+        # Устройство ищется в индексе, в БД - один UPDATE по первичному ключу
+        device = device_index.get_device_by_external_id(name)
+        if device is None:
+            Logger.warn(
+                f"Device not found for set_{'online' if online else 'offline'}: name={name}",
+                LoggerType.DEVICES
+            )
+            return False
+
+        values = {'online': online}
+        if online:
+            values['last_sync'] = datetime.now()
+        try:
+            with write_session() as session:
+                session.execute(
+                    update(DeviceEntity)
+                    .where(col(DeviceEntity.id) == device.id)
+                    .values(**values)
+                )
+        except Exception as e:
+            Logger.err(
+                f"Failed to set device {'online' if online else 'offline'} by name {name}: {e}",
+                LoggerType.DEVICES
+            )
+            return False
 
-                session.commit()
+        device_index.set_online([name], online)
+        Logger.debug(
+            f"Device set {'online' if online else 'offline'}: {name} (id={device.id})",
+            LoggerType.DEVICES
+        )
+        return True
 
-                Logger.debug(
-                    f"Device set online: {name} (id={device.id})",
-                    LoggerType.DEVICES
-                )
-                return True
+    def set_status_many(self, online: List[str], offline: List[str]) -> int:
+        """
+        Пакетно переключить статус устройств одной транзакцией
 
-            except Exception as e:
-                Logger.err(
-                    f"Failed to set device online by name {name}: {e}",
-                    LoggerType.DEVICES
-                )
-                session.rollback()
-                return False
+        :param online: external_id устройств, ставших онлайн
+        :param offline: external_id устройств, ставших офлайн
+        :return: Количество обновленных строк
+        """
+        if not online and not offline:
+            return 0
+        try:
+            with write_session() as session:
+                updated = 0
+                if online:
+                    updated += session.execute(
+                        update(DeviceEntity)
+                        .where(col(DeviceEntity.external_id).in_(online))
+                        .values(online=True, last_sync=datetime.now())
+                    ).rowcount
+                if offline:
+                    updated += session.execute(
+                        update(DeviceEntity)
+                        .where(col(DeviceEntity.external_id).in_(offline))
+                        .values(online=False)
+                    ).rowcount
+            device_index.set_online(online, True)
+            device_index.set_online(offline, False)
+            Logger.debug(
+                f"Devices status updated: online={online}, offline={offline}",
+                LoggerType.DEVICES
+            )
+            return updated
+        except Exception as e:
+            Logger.err(f"Failed to update devices status: {e}", LoggerType.DEVICES)
+            return 0
 
     def add_sensor(
             self,
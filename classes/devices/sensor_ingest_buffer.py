@@ -0,0 +1,105 @@
+# Copyright (C) 2026 Mikhail Sazanov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from classes.devices.device_index import device_index
+from classes.devices.sensor_value import to_db_value, to_numeric
+from classes.events.event_bus import event_bus
+from classes.events.event_types import EventType
+from config.settings import settings
+from models.sensor_model import SensorModelWithDevice
+
+
+class SensorIngestBuffer:
+    """Значения сенсоров в памяти до записи в БД.
+
+    Последнее значение каждого сенсора хранится в памяти: повторы отбрасываются без запроса к БД,
+    событие SENSOR_CHANGE_STATE публикуется сразу из памяти. Текущие значения (последнее на сенсор)
+    и строки истории копятся до следующей пачки, которую забирает SensorIngestService.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Будит сервис записи, когда пачка истории набрана раньше интервала
+        self.wakeup = threading.Event()
+        self.last_values: Dict[int, Optional[str]] = {}
+        self.pending_values: Dict[int, Optional[str]] = {}
+        self.pending_history: List[Dict[str, Any]] = []
+
+    def submit(self, sensor_id: int, value: Any) -> Optional[SensorModelWithDevice]:
+        """Принимает значение сенсора, возвращает модель сенсора с новым значением"""
+        db_value = to_db_value(value)
+        sensor = self._get_sensor(sensor_id)
+        if sensor is None:
+            return None
+
+        with self.lock:
+            if sensor_id in self.last_values and self.last_values[sensor_id] == db_value:
+                return sensor
+
+            now = datetime.now()
+            self.last_values[sensor_id] = db_value
+            self.pending_values[sensor_id] = db_value
+            self.pending_history.append({
+                'sensor_id': sensor_id,
+                'value': db_value,
+                'value_num': to_numeric(value),
+                'created': now,
+                'updated': now,
+            })
+            sensor = sensor.model_copy(update={'value': db_value})
+            if len(self.pending_history) >= (settings.SENSOR_INGEST_BATCH_SIZE or 500):
+                self.wakeup.set()
+
+        event_bus.publish(
+            event_type=EventType.SENSOR_CHANGE_STATE,
+            sensor=sensor
+        )
+        return sensor
+
+    def current_value(self, sensor_id: int, default: Optional[str] = None) -> Optional[str]:
+        """Последнее принятое значение сенсора (может быть еще не записано в БД)"""
+        with self.lock:
+            return self.last_values.get(sensor_id, default)
+
+    def take(self) -> tuple[Dict[int, Optional[str]], List[Dict[str, Any]]]:
+        """Забирает накопленную пачку: текущие значения и строки истории"""
+        with self.lock:
+            values = self.pending_values
+            history = self.pending_history
+            self.pending_values = {}
+            self.pending_history = []
+        return values, history
+
+    def forget(self, sensor_id: int):
+        """Значение сенсора не записано (например, сенсор удален) - следующее читается из БД"""
+        with self.lock:
+            self.last_values.pop(sensor_id, None)
+
+    def _get_sensor(self, sensor_id: int) -> Optional[SensorModelWithDevice]:
+        # Метаданные сенсора берутся из индекса, значение - из памяти
+        sensor = device_index.get_sensor(sensor_id)
+        with self.lock:
+            if sensor is None:
+                self.last_values.pop(sensor_id, None)
+                return None
+            # Значение в памяти новее значения в БД, если пачка еще не записана
+            value = self.last_values.setdefault(sensor_id, sensor.value)
+        return sensor.model_copy(update={'value': value})
+
+
+sensor_ingest_buffer = SensorIngestBuffer()
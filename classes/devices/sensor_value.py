@@ -0,0 +1,53 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+from typing import Any, Optional
+
+# Строковые значения логических сенсоров
+TRUE_VALUES = frozenset({'true', 'on', 'yes'})
+FALSE_VALUES = frozenset({'false', 'off', 'no'})
+
+
+def to_db_value(value: Any) -> Optional[str]:
+    """Строковое представление значения, как его хранит колонка value"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def to_numeric(value: Any) -> Optional[float]:
+    """Числовое представление значения сенсора для колонки value_num.
+    Логические значения - 1/0, перечисления и прочие строки - None
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = str(value).strip().lower()
+        if text in TRUE_VALUES:
+            return 1.0
+        if text in FALSE_VALUES:
+            return 0.0
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+    return number if math.isfinite(number) else None
@@ -18,6 +18,7 @@ from typing import Optional, Dict, List
 
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
+from classes.permissions.permission_manager import permission_manager
 from database.session import write_session
 from entities.permission import PermissionEntity
 from sqlmodel import select
@@ -181,6 +182,8 @@ def _create_permission(code: str, name: str, description: str, category: str):
 
             # Добавляем в кэш
             _created_permissions.add(code)
+            # Новое разрешение сразу доступно супер-админам
+            permission_manager.invalidate()
 
             Logger.debug(f"✅ Permission created: {code} ({name})", LoggerType.USERS)
 
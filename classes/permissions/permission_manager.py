@@ -13,8 +13,14 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import time
+from dataclasses import dataclass
+from functools import wraps
+from threading import Lock
+
 from sqlmodel import select, delete, col, update
-from typing import Set, List, Optional
+from typing import Set, List, Optional, Dict, FrozenSet, Callable
+from classes.auth.principal_cache import principal_cache
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from database.session import write_session, read_session
@@ -35,50 +41,105 @@ from models.permission_model import (
 )
 
 
-class PermissionManager:
-    """Простой менеджер прав без групп"""
+@dataclass(frozen=True)
+class PermissionSnapshot:
+    """Снимок разрешений пользователя на момент чтения из БД"""
+    version: int
+    codes: FrozenSet[str]
+    created: float
+
+
+def invalidates_permissions(func: Callable) -> Callable:
+    """Сбрасывает снимки разрешений после выполнения метода (и commit его сессии)"""
+
+    @wraps(func)
+    def wrapper(self: "PermissionManager", *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.invalidate()
 
-    def get_user_permissions(self, user_id: int) -> Set[str]:
+    return wrapper
+
+
+class PermissionManager:
+    """Простой менеджер прав без групп.
+    Разрешения пользователя кэшируются в памяти процесса как frozenset кодов
+    и сбрасываются при изменении ролей, разрешений ролей и назначений ролей.
+    """
+
+    # Страховка для нескольких процессов: снимок перечитывается не реже этого интервала
+    snapshot_ttl: float = 60
+
+    def __init__(self):
+        self._snapshots: Dict[int, PermissionSnapshot] = {}
+        self._version: int = 0
+        self._lock = Lock()
+
+    def invalidate(self, user_id: int | None = None):
+        """Сбрасывает снимок пользователя или все снимки"""
+        with self._lock:
+            self._version += 1
+            if user_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(user_id, None)
+        # Роли пользователя входят и в кэшированного пользователя авторизации
+        principal_cache.invalidate(user_id)
+
+    def get_user_permissions(self, user_id: int) -> FrozenSet[str]:
         """
         Получить ВСЕ разрешения пользователя.
-        Возвращает set с кодами разрешений.
+        Возвращает frozenset с кодами разрешений.
         """
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            version = self._version
+        if snapshot is not None and time.monotonic() - snapshot.created < self.snapshot_ttl:
+            return snapshot.codes
+
+        codes = self._load_user_permissions(user_id)
+        if codes is None:
+            return frozenset()
+
+        with self._lock:
+            # Если пока мы читали, права изменились - снимок не сохраняем
+            if version == self._version:
+                self._snapshots[user_id] = PermissionSnapshot(
+                    version=version,
+                    codes=codes,
+                    created=time.monotonic()
+                )
+        return codes
+
+    def _load_user_permissions(self, user_id: int) -> FrozenSet[str] | None:
+        """Читает разрешения пользователя из БД, None - при ошибке"""
         with read_session() as session:
             try:
                 # 1. Проверяем, супер-админ ли пользователь
-                user = session.exec(
-                    select(UserEntity).where(UserEntity.id == user_id)
+                is_superuser = session.exec(
+                    select(UserEntity.is_superuser).where(UserEntity.id == user_id)
                 ).first()
 
-                if not user:
-                    return set()
+                if is_superuser is None:
+                    return frozenset()
 
                 # Если пользователь супер-админ - возвращаем все разрешения
-                if user.is_superuser:
-                    all_permissions = session.exec(
-                        select(PermissionEntity.code)
-                    ).all()
-                    return set(all_permissions)
-
-                # 2. Обычный пользователь - собираем разрешения из ролей
-                permissions = set()
-
-                # Находим все роли пользователя
-                user_roles = session.exec(
-                    select(UserRoleEntity).where(UserRoleEntity.user_id == user_id)
+                if is_superuser:
+                    return frozenset(session.exec(select(PermissionEntity.code)).all())
+
+                # 2. Обычный пользователь - разрешения всех его ролей одним запросом
+                codes = session.exec(
+                    select(PermissionEntity.code)
+                    .join(RolePermissionEntity, col(RolePermissionEntity.permission_id) == PermissionEntity.id)
+                    .join(UserRoleEntity, col(UserRoleEntity.role_id) == RolePermissionEntity.role_id)
+                    .where(UserRoleEntity.user_id == user_id)
+                    .distinct()
                 ).all()
-
-                for user_role in user_roles:
-                    role = user_role.role
-
-                    # Добавляем все разрешения роли
-                    for role_perm in role.role_permissions:
-                        permissions.add(role_perm.permission.code)
-
-                return permissions
+                return frozenset(codes)
             except Exception as e:
                 Logger.err(str(e), LoggerType.USERS)
-                return set()
+                return None
 
     def has_permission(self, user_id: int, permission_code: str) -> bool:
         """Проверить, есть ли у пользователя конкретное разрешение"""
@@ -90,6 +151,7 @@ class PermissionManager:
         permissions = self.get_user_permissions(user_id)
         return any(code in permissions for code in permission_codes)
 
+    @invalidates_permissions
     def assign_role_to_user(self, user_id: int, role_id: int) -> bool:
         """Назначить роль пользователю"""
         with write_session() as session:
@@ -115,6 +177,7 @@ class PermissionManager:
                 Logger.err(str(e), LoggerType.USERS)
                 return False
 
+    @invalidates_permissions
     def remove_role_from_user(self, user_id: int, role_id: int) -> bool:
         """Удалить роль у пользователя"""
         with write_session() as session:
@@ -151,6 +214,7 @@ class PermissionManager:
             except Exception as e:
                 Logger.err(str(e), LoggerType.USERS)
 
+    @invalidates_permissions
     def add_permission_to_role(self, role_id: int, permission_code: str) -> bool:
         """Добавить разрешение в роль"""
         with write_session() as session:
@@ -185,6 +249,7 @@ class PermissionManager:
                 Logger.err(str(e), LoggerType.USERS)
                 return False
 
+    @invalidates_permissions
     def remove_permission_from_role(
             self,
             role_id:int,
@@ -238,6 +303,7 @@ class PermissionManager:
 
     # === ROLES MANAGEMENT ===
 
+    @invalidates_permissions
     def create_role(self, role_data: RoleCreate) -> Optional[RoleEntity]:
         """Создать новую роль"""
         with write_session() as session:
@@ -276,6 +342,7 @@ class PermissionManager:
                 session.rollback()
                 return None
 
+    @invalidates_permissions
     def update_role(self, role_data: RoleUpdate) -> Optional[RoleEntity]:
         """Обновить существующую роль"""
         with write_session() as session:
@@ -320,6 +387,7 @@ class PermissionManager:
                 session.rollback()
                 return None
 
+    @invalidates_permissions
     def delete_role(self, role_id: int) -> bool:
         """Удалить роль"""
         with write_session() as session:
@@ -438,6 +506,7 @@ class PermissionManager:
 
     # === PERMISSIONS MANAGEMENT ===
 
+    @invalidates_permissions
     def create_permission(self, perm: PermissionCreate) -> Optional[PermissionEntity]:
         """Создать новое разрешение"""
         with write_session() as session:
@@ -464,6 +533,7 @@ class PermissionManager:
                 session.rollback()
                 return None
 
+    @invalidates_permissions
     def update_permission(self, perm: PermissionModel) -> bool:
         with write_session() as session:
             try:
@@ -481,6 +551,7 @@ class PermissionManager:
                 return False
         return False
 
+    @invalidates_permissions
     def delete_permission(self, permission_id: int) -> bool:
         with write_session() as session:
             try:
@@ -15,6 +15,7 @@
 
 import operator
 
+from classes.devices.sensor_value import to_numeric
 from classes.rules.rule_base_executor import RuleBaseExecutor
 from classes.rules.rule_conditions import (
     RuleAvailability,
@@ -217,26 +218,37 @@ class RuleConditionExecutor(RuleBaseExecutor):
         if operand == RuleOperand.AND.value:
             for item in items:
                 sensor = SensorRepository.get_sensor(item.id)
-                if not operators[action.operator](float(sensor.value), float(action.value)):
+                if not cls._compare_sensor(sensor, action):
                     return False
             return True
 
         elif operand == RuleOperand.OR.value:
             for item in items:
                 sensor = SensorRepository.get_sensor(item.id)
-                if operators[action.operator](float(sensor.value), float(action.value)):
+                if cls._compare_sensor(sensor, action):
                     return True
             return False
 
         elif operand == RuleOperand.NOT.value:
             for item in items:
                 sensor = SensorRepository.get_sensor(item.id)
-                if operators[action.operator](float(sensor.value), float(action.value)):
+                if cls._compare_sensor(sensor, action):
                     return False
             return True
         else:
             return False
 
+    @classmethod
+    def _compare_sensor(cls, sensor, action: NodeConditionComparison) -> bool:
+        """Сравнение числовых значений, логические значения сравниваются как 1/0.
+        Нечисловое значение сенсора не удовлетворяет условию
+        """
+        value = to_numeric(sensor.value) if sensor is not None else None
+        target = to_numeric(action.value)
+        if value is None or target is None:
+            return False
+        return operators[action.operator](value, target)
+
     """
     Comparison storage condition
     """
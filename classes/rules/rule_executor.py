@@ -21,6 +21,7 @@ from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from classes.rules.rule_action_executor import RuleActionExecutor
 from classes.rules.rule_condition_executor import RuleConditionExecutor
+from classes.rules.rule_graph import CompiledRuleGraph
 from classes.rules.rules_store import rules_triggers_store
 from models.rule_model import RuleModel, NodeVisualize, EdgeStyle
 
@@ -51,9 +52,11 @@ class RuleExecutor:
     test: bool = False
     trigger_entity_id: int | None = None
 
-    def __init__(self, rule: RuleModel, test: bool = False):
+    def __init__(self, rule: RuleModel, test: bool = False, graph: CompiledRuleGraph | None = None):
         self.trigger_kwargs = None
         self.rule: RuleModel = rule
+        # Индексы узлов и связей; rule должен быть копией graph.rule (или самим правилом)
+        self.graph: CompiledRuleGraph = graph if graph is not None else CompiledRuleGraph(rule)
         self.start_node = None
         self.test = test
 
@@ -73,18 +76,15 @@ class RuleExecutor:
         event_bus.publish(EventType.RULE_EXECUTED, rule_id=self.rule.id, nodes=self.nodes, edges=self.edges)
 
     def find_node_by_id(self, id: str):
-        n = [(index, node) for index, node in enumerate(self.nodes) if node.id == id]
-        if n:
-            return n[0]
-        else:
+        index = self.graph.node_index.get(id)
+        if index is None:
             return None
+        return index, self.nodes[index]
 
     def find_start_node(self):
-        for node in self.nodes:
-            if node.type == 'start':
-                # Logger.debug(f'Founded start node: {node.id}', LoggerType.RULES)
-                return node
-        return None
+        if self.graph.start_index is None:
+            return None
+        return self.nodes[self.graph.start_index]
 
     def parse_recursive(self, node: NodeVisualize):
         node.children = []
@@ -107,7 +107,7 @@ class RuleExecutor:
 
         # Logger.debug(f"Parsing node: {node.id} {node.data.flow.el.key}", LoggerType.RULES)
 
-        _edges = [(i, e) for i, e in enumerate(self.edges) if e.source == node.id]
+        _edges = [(i, self.edges[i]) for i in self.graph.adjacency.get(node.id, ())]
         # Logger.debug(f'Found {len(_edges)} edges from node {node.id}', LoggerType.RULES)
 
         for edge in _edges:
@@ -148,7 +148,8 @@ class RuleExecutor:
             if should_process:
                 # Logger.debug(f'Processing {edge_type} edge: {edge_data.source_handle}', LoggerType.RULES)
 
-                index, founded_node_by_edge = self.find_node_by_id(edge_data.target)
+                founded = self.find_node_by_id(edge_data.target)
+                founded_node_by_edge = founded[1] if founded is not None else None
                 if isinstance(founded_node_by_edge, NodeVisualize):
                     # print(f'[{node.type.upper()} {node.data.flow.el.key}] Found next node: {founded_node_by_edge.id}')
                     parse_recursive = self.parse_recursive(founded_node_by_edge)
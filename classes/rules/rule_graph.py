@@ -0,0 +1,86 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from threading import Lock
+from typing import Dict, List, Optional
+
+from models.rule_model import RuleModel
+
+
+class CompiledRuleGraph:
+    """Скомпилированный граф правила: индекс узлов по id и списки смежности по исходящим связям.
+    Индексы ссылаются на позиции в rule.nodes и rule.edges, поэтому подходят и для копии правила.
+    """
+
+    def __init__(self, rule: RuleModel):
+        self.rule = rule
+        self.node_index: Dict[str, int] = {}
+        self.adjacency: Dict[str, List[int]] = {}
+        self.start_index: Optional[int] = None
+
+        for index, node in enumerate(rule.nodes):
+            # Как и при линейном поиске, приоритет у первого узла с таким id
+            self.node_index.setdefault(node.id, index)
+            if self.start_index is None and node.type == 'start':
+                self.start_index = index
+
+        for index, edge in enumerate(rule.edges):
+            self.adjacency.setdefault(edge.source, []).append(index)
+
+    def instance(self) -> RuleModel:
+        """Копия правила для одного выполнения: исполнитель меняет узлы и связи (children, стили)"""
+        return self.rule.model_copy(deep=True)
+
+
+class RuleGraphCache:
+    """Кэш скомпилированных правил, сбрасывается при сохранении или удалении правила"""
+
+    def __init__(self):
+        self._graphs: Dict[int, CompiledRuleGraph] = {}
+        self._lock = Lock()
+        # Растет при каждом сбросе: граф, прочитанный до сброса, не попадает в кэш
+        self._version: int = 0
+
+    def get(self, rule_id: int) -> Optional[CompiledRuleGraph]:
+        with self._lock:
+            graph = self._graphs.get(rule_id)
+            version = self._version
+        if graph is not None:
+            return graph
+
+        # Импорт здесь, чтобы не тянуть репозитории в модули исполнителей
+        from repositories.rules_repository import RulesRepository
+        rule = RulesRepository.get_rule(rule_id)
+        if rule is None:
+            return None
+
+        graph = CompiledRuleGraph(rule)
+        with self._lock:
+            if version == self._version:
+                self._graphs[rule_id] = graph
+        return graph
+
+    def invalidate(self, rule_id: int):
+        with self._lock:
+            self._graphs.pop(rule_id, None)
+            self._version += 1
+
+    def clear(self):
+        with self._lock:
+            self._graphs.clear()
+            self._version += 1
+
+
+rule_graph_cache = RuleGraphCache()
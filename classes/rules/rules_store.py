@@ -17,11 +17,15 @@ class RuleTriggerModel(BaseModel):
 class EntityIdsCollection:
     def __init__(self):
         self._rules: Dict[int, Set[int]] = {}  # {rule_id: set(entity_ids)}
+        self._entities: Dict[int, Set[int]] = {}  # {entity_id: set(rule_ids)} - обратный индекс
 
     def add(self, rule_id: int, entity_id: int) -> None:
         if rule_id not in self._rules:
             self._rules[rule_id] = set()
         self._rules[rule_id].add(entity_id)
+        if entity_id not in self._entities:
+            self._entities[entity_id] = set()
+        self._entities[entity_id].add(rule_id)
 
     def remove(self, rule_id: int, entity_id: int) -> bool:
         if rule_id in self._rules and entity_id in self._rules[rule_id]:
@@ -29,23 +33,22 @@ class EntityIdsCollection:
             # Если после удаления set пустой, удаляем rule_id
             if not self._rules[rule_id]:
                 del self._rules[rule_id]
+            self._entities[entity_id].discard(rule_id)
+            if not self._entities[entity_id]:
+                del self._entities[entity_id]
             return True
         return False
 
     def exists(self, entity_id: int) -> bool:
         """Проверяет существование entity_id в любом rule_id"""
-        for rule_entities in self._rules.values():
-            if entity_id in rule_entities:
-                return True
-        return False
+        return entity_id in self._entities
 
     def find(self, entity_id: int) -> List[RuleTriggerModel]:
         """Находит все rule_id, где есть entity_id"""
-        result = []
-        for rule_id, entities in self._rules.items():
-            if entity_id in entities:
-                result.append(RuleTriggerModel(rule_id=rule_id, ids=list(entities)))
-        return result
+        return [
+            RuleTriggerModel(rule_id=rule_id, ids=list(self._rules[rule_id]))
+            for rule_id in sorted(self._entities.get(entity_id, ()))
+        ]
 
     def get_all(self) -> List[RuleTriggerModel]:
         """Возвращает все rule_id с их entity_ids"""
@@ -56,14 +59,12 @@ class EntityIdsCollection:
 
     def get_rule_ids_for_entity(self, entity_id: int) -> List[int]:
         """Возвращает список rule_id для конкретного entity_id"""
-        return [
-            rule_id for rule_id, entities in self._rules.items()
-            if entity_id in entities
-        ]
+        return sorted(self._entities.get(entity_id, ()))
 
     def reload(self, rule_models: List[RuleTriggerModel]) -> None:
         """Полная перезагрузка данных"""
         self._rules.clear()
+        self._entities.clear()
         for rule_model in rule_models:
             for entity_id in rule_model.ids:
                 self.add(rule_model.rule_id, entity_id)
@@ -77,14 +78,20 @@ class EntityIdsCollection:
 
 # Модель для хранения триггеров
 class RuleTriggersStore:
+    # Пустая коллекция для ключей без триггеров (не создаем новую на каждое событие)
+    _empty = EntityIdsCollection()
+
     def __init__(self, nodes: List["NodeVisualize"] = None):
         self._storage: Dict[RuleNodeTypeKeys, EntityIdsCollection] = {}
         if nodes:
             self.reread(nodes)
 
     def reread(self, nodes: List['NodeVisualize']) -> None:
-        """Полностью переинициализирует хранилище из списка NodeVisualize"""
-        self._storage.clear()
+        """Полностью переинициализирует хранилище из списка NodeVisualize.
+        Новое хранилище собирается отдельно и подменяется целиком, чтобы обработчики событий
+        в других потоках не видели его наполовину заполненным.
+        """
+        storage: Dict[RuleNodeTypeKeys, EntityIdsCollection] = {}
 
         # Фильтруем только trigger-ноды
         trigger_nodes = [node for node in nodes if node.type == 'trigger']
@@ -100,17 +107,19 @@ class RuleTriggersStore:
                 # Конвертируем строковый ключ в enum
                 key = self._get_key_enum(key_str)
                 if key and ids:
-                    if key not in self._storage:
-                        self._storage[key] = EntityIdsCollection()
+                    if key not in storage:
+                        storage[key] = EntityIdsCollection()
 
                     # Добавляем все ids для этого rule_id
                     for entity_id in ids:
-                        self._storage[key].add(rule_id, entity_id)
+                        storage[key].add(rule_id, entity_id)
 
             except Exception as e:
                 Logger.err(f"Error processing node {node.id}: {e}", LoggerType.RULES)
                 continue
 
+        self._storage = storage
+
     def _parse_ids_from_options(self, data: "NodeDataWithList") -> List[int]:
         """Парсит IDs из NodeDataWithList"""
         try:
@@ -130,7 +139,8 @@ class RuleTriggersStore:
 
     def find(self, key: RuleNodeTypeKeys) -> EntityIdsCollection:
         """Возвращает коллекцию идентификаторов для ключа"""
-        return self._storage.get(key, EntityIdsCollection())
+        collection = self._storage.get(key)
+        return collection if collection is not None else self._empty
 
     def has(self, key: RuleNodeTypeKeys) -> bool:
         """Проверяет наличие ключа в хранилище"""
@@ -24,8 +24,7 @@ from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from classes.storages.filesystem import Filesystem
 from classes.storages.storage import StorageBase
-from database.session import write_session
-from entities.camera import CameraEntity
+from repositories.camera_repository import CameraRepository
 from services.cameras.utils.cameras_helpers import get_no_signal_frame
 
 if TYPE_CHECKING:
@@ -59,16 +58,13 @@ class CameraStorage(StorageBase):
 
                 cls.remove_cover_file(camera)
 
-                with write_session() as session:
-                    try:
-                        cam = session.get(CameraEntity, camera.id)
-                        cam.cover = rel_path
-                        session.add(cam)
-                        Logger.debug(f"[{camera.name}] upload_cover to {image_path}", LoggerType.STORAGES)
-                    except Exception as e:
-                        Logger.err(f"[{camera.name}]  error upload_cover to {image_path} code: {str(e)}",
-                                   LoggerType.STORAGES)
-                return camera
+                # Запись через репозиторий обновляет кэш конфигурации камер
+                updated = CameraRepository.set_cover(camera.id, rel_path)
+                if updated is None:
+                    Logger.err(f"[{camera.name}]  error upload_cover to {image_path}", LoggerType.STORAGES)
+                    return camera
+                Logger.debug(f"[{camera.name}] upload_cover to {image_path}", LoggerType.STORAGES)
+                return updated
         except Exception as e:
             Logger.err(f"[{camera.name}] upload_cover error - {e}", LoggerType.STORAGES)
             raise e
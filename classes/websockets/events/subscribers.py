@@ -16,8 +16,10 @@
 from classes.events.event_bus import event_handler, event_bus
 from classes.events.event_types import EventType
 from classes.websockets.messages.ws_message_rule_executed import WebsocketMessageRuleExecuted
+from classes.websockets.messages.ws_message_sensor_value import WebsocketMessageSensorValue
 from classes.websockets.websockets import WebSockets
 from models.rule_model import NodeVisualize, EdgeCreate
+from models.sensor_model import SensorModelWithDevice
 
 
 def on_rule_executed(rule_id: int, nodes: list[NodeVisualize], edges: list[EdgeCreate]):
@@ -30,5 +32,17 @@ def on_rule_executed(rule_id: int, nodes: list[NodeVisualize], edges: list[EdgeC
     )
 
 
+def on_sensor_change_state(sensor: SensorModelWithDevice):
+    WebSockets.send_broadcast(
+        WebsocketMessageSensorValue(
+            sensor_id=sensor.id,
+            device_id=sensor.device_id,
+            identifier=sensor.identifier,
+            value=sensor.value
+        )
+    )
+
+
 def register_non_auto_subscribers():
     event_bus.subscribe(EventType.RULE_EXECUTED, on_rule_executed)
+    event_bus.subscribe(EventType.SENSOR_CHANGE_STATE, on_sensor_change_state)
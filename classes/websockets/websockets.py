@@ -14,33 +14,195 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import asyncio
-from threading import Thread
+import json
+from typing import Iterable, Optional, Callable
+
 from fastapi import WebSocket
 
+from classes.logger.logger import Logger
+from classes.logger.logger_types import LoggerType
 from classes.websockets.messages.ws_message_base import WebsocketMessageBase
+from classes.websockets.ws_message_topic import WebsocketMessageTopicEnum
+
+
+class WebsocketClient:
+    """Подключенный клиент с ограниченной очередью исходящих сообщений и подписками на топики"""
+
+    def __init__(self, ws: WebSocket, maxsize: int, topics: Optional[Iterable[str]] = None):
+        self.ws = ws
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=maxsize)
+        # None - клиент получает все топики, кроме WebsocketMessageTopicEnum.opt_in_groups()
+        self.topics: Optional[set[str]] = None
+        self.sender: Optional[asyncio.Task] = None
+        # Время последней успешной отправки или начала заполнения пустой очереди (loop.time())
+        self.last_progress: float = asyncio.get_running_loop().time()
+        self.dropped: int = 0
+        if topics is not None:
+            self.subscribe(topics)
+
+    def subscribe(self, topics: Iterable[str]):
+        valid = {topic for topic in topics if WebsocketMessageTopicEnum.is_subscribable(topic)}
+        self.topics = valid if self.topics is None else self.topics | valid
+
+    def unsubscribe(self, topics: Iterable[str]):
+        removed = set(topics)
+        if self.topics is None:
+            self.topics = WebsocketMessageTopicEnum.groups() - WebsocketMessageTopicEnum.opt_in_groups()
+        # Отписка от одного топика группы: заменяем группу остальными ее топиками
+        for topic in removed:
+            group = WebsocketMessageTopicEnum.group_of(topic)
+            if group != topic and group in self.topics:
+                self.topics.discard(group)
+                self.topics |= WebsocketMessageTopicEnum.topics_of(group)
+        self.topics -= removed
+
+    def accepts(self, topic: Optional[str]) -> bool:
+        if topic is None:
+            return True
+        if self.topics is None:
+            return WebsocketMessageTopicEnum.group_of(topic) not in WebsocketMessageTopicEnum.opt_in_groups()
+        return topic in self.topics or WebsocketMessageTopicEnum.group_of(topic) in self.topics
 
 
 class WebSockets:
-    clients: set[WebSocket] = set()
+    """Рассылка сообщений клиентам WebSocket.
+    Вся отправка выполняется в event loop сервера: у каждого клиента своя ограниченная очередь
+    и одна задача-отправитель. Методы send/send_broadcast можно вызывать из любых потоков.
+    """
+    clients: dict[WebSocket, WebsocketClient] = {}
+    loop: Optional[asyncio.AbstractEventLoop] = None
+
+    queue_size: int = 100
+    # Клиент отключается, если очередь переполнена и он ничего не принял дольше этого времени
+    send_timeout: float = 5.0
 
     @classmethod
-    async def add_client(cls, ws: WebSocket):
+    async def add_client(cls, ws: WebSocket, topics: Optional[Iterable[str]] = None) -> WebsocketClient:
         await ws.accept()
-        cls.clients.add(ws)
+        cls.loop = asyncio.get_running_loop()
+        client = WebsocketClient(ws, cls.queue_size, topics)
+        client.sender = cls.loop.create_task(cls._sender(client))
+        cls.clients[ws] = client
+        return client
 
     @classmethod
     def remove_client(cls, ws: WebSocket):
-        cls.clients.remove(ws)
+        client = cls.clients.pop(ws, None)
+        if client is not None and client.sender is not None and not client.sender.done():
+            client.sender.cancel()
+
+    @classmethod
+    def subscribe(cls, ws: WebSocket, topics: Iterable[str]):
+        client = cls.clients.get(ws)
+        if client is not None:
+            client.subscribe(topics)
+
+    @classmethod
+    def unsubscribe(cls, ws: WebSocket, topics: Iterable[str]):
+        client = cls.clients.get(ws)
+        if client is not None:
+            client.unsubscribe(topics)
 
     @classmethod
     def send(cls, ws: WebSocket, data: dict | str | WebsocketMessageBase):
-        if isinstance(data, WebsocketMessageBase):
-            data = data.model_dump_json()
-        thread: Thread = Thread(target=asyncio.run, args=[ws.send_text(data)])
-        thread.start()
-        # await ws.send_json(data)
+        cls._call_in_loop(cls._deliver, ws, cls._serialize(data))
 
     @classmethod
     def send_broadcast(cls, data: dict | str | WebsocketMessageBase):
-        for cl in cls.clients:
-            cls.send(cl, data)
+        if not cls.clients:
+            return
+        topic = data.topic if isinstance(data, WebsocketMessageBase) else None
+        # Сообщение сериализуется один раз для всех клиентов
+        cls._call_in_loop(cls._broadcast, cls._serialize(data), topic)
+
+    @classmethod
+    def _serialize(cls, data: dict | str | WebsocketMessageBase) -> str:
+        if isinstance(data, WebsocketMessageBase):
+            return data.model_dump_json()
+        if isinstance(data, dict):
+            return json.dumps(data, default=str)
+        return data
+
+    @classmethod
+    def _call_in_loop(cls, callback: Callable, *args):
+        loop = cls.loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            callback(*args)
+        else:
+            try:
+                loop.call_soon_threadsafe(callback, *args)
+            except RuntimeError:
+                # Event loop уже остановлен
+                pass
+
+    @classmethod
+    def _deliver(cls, ws: WebSocket, text: str):
+        client = cls.clients.get(ws)
+        if client is not None:
+            cls._enqueue(client, text)
+
+    @classmethod
+    def _broadcast(cls, text: str, topic: Optional[str]):
+        for client in list(cls.clients.values()):
+            if client.accepts(topic):
+                cls._enqueue(client, text)
+
+    @classmethod
+    def _enqueue(cls, client: WebsocketClient, text: str):
+        if client.queue.empty():
+            # Простаивающий клиент ничего не должен: отсчет задержки начинается заново
+            client.last_progress = cls.loop.time()
+        elif client.queue.full():
+            # Медленный клиент: вытесняем самое старое сообщение
+            try:
+                client.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            client.dropped += 1
+            if cls.loop.time() - client.last_progress > cls.send_timeout:
+                cls._evict(client, reason=f'queue overflow, dropped {client.dropped}')
+                return
+        client.queue.put_nowait(text)
+
+    @classmethod
+    def _evict(cls, client: WebsocketClient, reason: str):
+        if cls.clients.get(client.ws) is not client:
+            return
+        cls.remove_client(client.ws)
+        Logger.warn(f'Slow websocket client evicted: {reason}', LoggerType.WEBSOCKETS)
+        if cls.loop is not None:
+            cls.loop.create_task(cls._close(client.ws))
+
+    @classmethod
+    async def _close(cls, ws: WebSocket):
+        try:
+            # 1013 - Try Again Later
+            await ws.close(code=1013)
+        except Exception:
+            pass
+
+    @classmethod
+    async def _sender(cls, client: WebsocketClient):
+        """Задача-отправитель клиента: по одному сообщению из очереди"""
+        try:
+            while True:
+                text = await client.queue.get()
+                try:
+                    await asyncio.wait_for(client.ws.send_text(text), timeout=cls.send_timeout)
+                    client.last_progress = cls.loop.time()
+                except asyncio.TimeoutError:
+                    cls._evict(client, reason=f'send timeout {cls.send_timeout} sec')
+                    return
+                except Exception as e:
+                    Logger.debug(f'Websocket send error: {e}', LoggerType.WEBSOCKETS)
+                    cls.remove_client(client.ws)
+                    return
+        except asyncio.CancelledError:
+            pass
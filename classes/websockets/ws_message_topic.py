@@ -21,3 +21,29 @@ class WebsocketMessageTopicEnum(StrEnum):
     DETECTION_END = 'detection.end'
     STORAGE_SIZE = 'storage.size'
     RULE_EXECUTED = 'rule.executed'
+    SENSOR_VALUE = 'sensor.value'
+
+    @staticmethod
+    def group_of(topic: str) -> str:
+        """Группа топика - часть до первой точки (detection.start -> detection)"""
+        return topic.split('.', 1)[0]
+
+    @classmethod
+    def groups(cls) -> set[str]:
+        """Все группы топиков, на которые может подписаться клиент"""
+        return {cls.group_of(item.value) for item in cls}
+
+    @staticmethod
+    def opt_in_groups() -> set[str]:
+        """Частые топики: клиент без подписок их не получает, только по явной подписке"""
+        return {'sensor'}
+
+    @classmethod
+    def topics_of(cls, group: str) -> set[str]:
+        """Топики группы (detection -> detection.start, detection.end)"""
+        return {item.value for item in cls if cls.group_of(item.value) == group}
+
+    @classmethod
+    def is_subscribable(cls, value: str) -> bool:
+        """Топик или группа топиков, на которые можно подписаться"""
+        return value in cls._value2member_map_ or value in cls.groups()
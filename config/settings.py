@@ -33,7 +33,15 @@ class Settings(BaseSettings):
     LOG_DIR: str = 'logs'
     LOG_BATCH_SIZE: int = 50
     LOG_FLUSH_INTERVAL: int = 5
+    LOG_SPOOL_REPLAY_INTERVAL: int = 30
     LOG_DB_DELETE_AFTER_DAYS: int = 90
+    SENSOR_INGEST_FLUSH_INTERVAL: float = 1.0
+    SENSOR_INGEST_BATCH_SIZE: int = 500
+    CAMERA_ANALYSIS_FPS: float = 10
+    CAMERA_ANALYSIS_IDLE_FPS: float = 2
+    CAMERA_ANALYSIS_IDLE_AFTER: float = 15
+    CAMERA_ANALYSIS_CPU_BUDGET: float = 85
+    CAMERA_PRE_EVENT_SECONDS: float = 5
     DEBUG_MODE: str = ''
     ENCRYPTION_KEY: str = ''
 
@@ -19,6 +19,7 @@ from entities.configuration import ConfigurationEntity
 from entities.device import DeviceEntity
 from entities.sensor_entity import SensorEntity
 from entities.sensor_history import SensorHistory
+from entities.sensor_history_rollup import SensorHistoryRollup
 from entities.device_network_interfaces import DeviceNetworkInterface
 
 from entities.camera import CameraEntity
@@ -0,0 +1,29 @@
+"""Add record_passthrough to cameras
+
+Revision ID: c42fbb9c9e9d
+Revises: 2e9c7f41a8b5
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c42fbb9c9e9d'
+down_revision: Union[str, None] = '2e9c7f41a8b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cameras', sa.Column('record_passthrough', sa.Boolean(),
+                                       server_default=sa.text('false'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('cameras', 'record_passthrough')
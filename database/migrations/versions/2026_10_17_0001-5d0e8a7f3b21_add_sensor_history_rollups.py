@@ -0,0 +1,44 @@
+"""Add sensor history rollups
+
+Revision ID: 5d0e8a7f3b21
+Revises: c42fbb9c9e9d
+Create Date: 2026-10-17 00:01:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0e8a7f3b21'
+down_revision: Union[str, None] = 'c42fbb9c9e9d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('device_sensors_history_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sensor_id', sa.Integer(), nullable=False),
+    sa.Column('resolution', sa.String(length=4), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('sum', sa.Float(), nullable=False),
+    sa.Column('min', sa.Float(), nullable=True),
+    sa.Column('max', sa.Float(), nullable=True),
+    sa.Column('last', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['sensor_id'], ['device_sensors.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sensor_id', 'resolution', 'bucket', name='uq_sensor_rollup_bucket')
+    )
+    op.create_index(op.f('ix_device_sensors_history_rollups_sensor_id'), 'device_sensors_history_rollups',
+                    ['sensor_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_device_sensors_history_rollups_sensor_id'), table_name='device_sensors_history_rollups')
+    op.drop_table('device_sensors_history_rollups')
@@ -0,0 +1,30 @@
+"""Add keyset pagination indexes
+
+Revision ID: 8b3f0c6d9e12
+Revises: 5d0e8a7f3b21
+Create Date: 2026-10-17 00:02:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3f0c6d9e12'
+down_revision: Union[str, None] = '5d0e8a7f3b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_logs_timestamp_id', 'logs', ['timestamp', 'id'], unique=False)
+    op.create_index('ix_camera_events_camera_id_start_id', 'camera_events', ['camera_id', 'start', 'id'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_camera_events_camera_id_start_id', table_name='camera_events')
+    op.drop_index('ix_logs_timestamp_id', table_name='logs')
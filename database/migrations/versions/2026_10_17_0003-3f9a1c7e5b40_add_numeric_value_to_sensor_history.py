@@ -0,0 +1,43 @@
+"""Add numeric value to sensor history
+
+Revision ID: 3f9a1c7e5b40
+Revises: 8b3f0c6d9e12
+Create Date: 2026-10-17 00:03:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c7e5b40'
+down_revision: Union[str, None] = '8b3f0c6d9e12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Заполнение value_num из строкового value: логические значения - 1/0, числа - как есть
+BACKFILL_SQL = sa.text(r"""
+    UPDATE device_sensors_history SET value_num = CASE
+        WHEN lower(trim(value)) IN ('true', 'on', 'yes') THEN 1
+        WHEN lower(trim(value)) IN ('false', 'off', 'no') THEN 0
+        ELSE CAST(trim(value) AS double precision)
+    END
+    WHERE lower(trim(value)) IN ('true', 'on', 'yes', 'false', 'off', 'no')
+       OR value ~ '^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]{1,2})?\s*$'
+""")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('device_sensors_history', sa.Column('value_num', sa.Float(), nullable=True))
+    op.execute(BACKFILL_SQL)
+    op.create_index('ix_device_sensors_history_sensor_id_created', 'device_sensors_history',
+                    ['sensor_id', 'created'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_device_sensors_history_sensor_id_created', table_name='device_sensors_history')
+    op.drop_column('device_sensors_history', 'value_num')
@@ -0,0 +1,33 @@
+"""Add decoder settings to cameras
+
+Revision ID: 7d2e4a9c1f63
+Revises: 3f9a1c7e5b40
+Create Date: 2026-10-17 00:04:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e4a9c1f63'
+down_revision: Union[str, None] = '3f9a1c7e5b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cameras', sa.Column('decode_threads', sa.Integer(), nullable=True))
+    op.add_column('cameras', sa.Column('decode_thread_type', sa.String(length=8), nullable=True))
+    op.add_column('cameras', sa.Column('decode_low_delay', sa.Boolean(),
+                                       server_default=sa.text('false'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('cameras', 'decode_low_delay')
+    op.drop_column('cameras', 'decode_thread_type')
+    op.drop_column('cameras', 'decode_threads')
@@ -55,6 +55,19 @@ class CameraEntityBase:
     record_duration: Optional[int] = Field(
         default=None
     )
+    record_passthrough: bool = Field(
+        default=False
+    )
+    decode_threads: Optional[int] = Field(
+        default=None
+    )
+    decode_thread_type: Optional[str] = Field(
+        default=None,
+        max_length=8
+    )
+    decode_low_delay: bool = Field(
+        default=False
+    )
     delete_after: Optional[int] = Field(
         default=None
     )
@@ -116,6 +129,11 @@ class CameraEntity(
 ):
     __tablename__ = 'cameras'
 
+    # Профили жадной загрузки (см. BaseModelMixin)
+    __eager_profiles__ = {
+        'relations': ('storage', 'areas'),
+    }
+
     location: LocationEntity | None = Relationship(
         # sa_relationship_kwargs=dict(lazy="selectin"),
         back_populates="cameras"
@@ -21,6 +21,7 @@ from entities.camera_area import CameraAreaEntity
 from entities.camera_recording import CameraRecordingEntity
 from entities.mixins.created_updated import TimeStampMixin
 from entities.mixins.id_column import IdColumnMixin
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 
 from entities.mixins.pagination_mixin import PaginationMixin
@@ -75,6 +76,10 @@ class CameraEventEntity(
     table=True
 ):
     __tablename__ = 'camera_events'
+    __table_args__ = (
+        # Keyset пагинация событий камеры по (start, id)
+        Index('ix_camera_events_camera_id_start_id', 'camera_id', 'start', 'id'),
+    )
 
     camera: CameraEntity | None = Relationship(
         # sa_relationship_kwargs=dict(lazy="selectin"),
@@ -0,0 +1,39 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from enum import Enum
+
+
+class SensorHistoryResolutionEnum(Enum):
+    MINUTE = '1m'
+    HOUR = '1h'
+    DAY = '1d'
+
+    @property
+    def seconds(self) -> int:
+        return {
+            SensorHistoryResolutionEnum.MINUTE: 60,
+            SensorHistoryResolutionEnum.HOUR: 3600,
+            SensorHistoryResolutionEnum.DAY: 86400,
+        }[self]
+
+    @property
+    def trunc(self) -> str:
+        """Аргумент date_trunc в PostgreSQL"""
+        return {
+            SensorHistoryResolutionEnum.MINUTE: 'minute',
+            SensorHistoryResolutionEnum.HOUR: 'hour',
+            SensorHistoryResolutionEnum.DAY: 'day',
+        }[self]
@@ -1,5 +1,6 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, JSON, Column, DateTime
 
 from entities.mixins.created_updated import TimeStampMixin
@@ -43,3 +44,7 @@ class LogEntryBase:
 
 class LogEntity(TimeStampMixin, LogEntryBase, IdColumnMixin, table=True):
     __tablename__ = 'logs'
+    __table_args__ = (
+        # Keyset пагинация логов по (timestamp, id)
+        Index('ix_logs_timestamp_id', 'timestamp', 'id'),
+    )
@@ -13,15 +13,79 @@
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Any, Dict, List, Set
-from sqlalchemy.orm import class_mapper
+from dataclasses import dataclass
+from typing import Any, Dict, List, Set, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import class_mapper, selectinload, joinedload
+
+
+@dataclass(frozen=True)
+class SerializationPlan:
+    """Состав сущности для сериализации, вычисляется один раз на класс"""
+    columns: Tuple[str, ...]
+    # (имя отношения, список ли это)
+    relationships: Tuple[Tuple[str, bool], ...]
+
+
+_serialization_plans: Dict[type, SerializationPlan] = {}
 
 
 class BaseModelMixin:
-    """Миксин для универсальной сериализации SQLAlchemy объектов с отношениями"""
+    """Миксин для универсальной сериализации SQLAlchemy объектов с отношениями.
+
+    Сущность может объявить профили жадной загрузки отношений для разных сценариев:
+
+        __eager_profiles__ = {
+            'relations': ('storage', 'areas'),
+        }
+
+    Репозиторий загружает сущности с Entity.eager_options('relations') и сериализует
+    их через to_dict(profile='relations') - только нужные отношения, без N+1 запросов.
+    """
+
+    __eager_profiles__: Dict[str, Tuple[str, ...]] = {}
+
+    @classmethod
+    def serialization_plan(cls) -> SerializationPlan:
+        plan = _serialization_plans.get(cls)
+        if plan is None:
+            mapper = class_mapper(cls)
+            plan = SerializationPlan(
+                columns=tuple(column.key for column in mapper.columns),
+                relationships=tuple((rel.key, rel.uselist) for rel in mapper.relationships)
+            )
+            _serialization_plans[cls] = plan
+        return plan
+
+    @classmethod
+    def eager_profile(cls, name: str) -> Tuple[str, ...]:
+        """Отношения профиля жадной загрузки"""
+        try:
+            return cls.__eager_profiles__[name]
+        except KeyError:
+            raise KeyError(f"{cls.__name__} has no eager profile '{name}'")
+
+    @classmethod
+    def eager_options(cls, name: str) -> List[Any]:
+        """Опции загрузки для select(...).options(*options):
+        коллекции - selectinload (один запрос на отношение), ссылки - joinedload
+        """
+        mapper = class_mapper(cls)
+        options = []
+        for key in cls.eager_profile(name):
+            relationship = mapper.relationships[key]
+            attr = getattr(cls, key)
+            options.append(selectinload(attr) if relationship.uselist else joinedload(attr))
+        return options
 
-    def to_dict(self, include_relationships: bool = False, exclude: List[str] = None, visited: Set[int] = None) -> Dict[
-        str, Any]:
+    def to_dict(
+            self,
+            include_relationships: bool = False,
+            exclude: List[str] = None,
+            visited: Set[int] = None,
+            profile: Optional[str] = None,
+            relationships: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
         """
         Преобразует SQLAlchemy объект в словарь
 
@@ -29,6 +93,8 @@ class BaseModelMixin:
             include_relationships: Включать ли связанные объекты
             exclude: Список полей для исключения
             visited: Множество посещенных объектов (для защиты от циклических ссылок)
+            profile: Профиль жадной загрузки: включаются только его отношения
+            relationships: Явный список включаемых отношений (None - все)
 
         Returns:
             Словарь с данными объекта
@@ -37,6 +103,10 @@ class BaseModelMixin:
             exclude = []
         if visited is None:
             visited = set()
+        if profile is not None:
+            include_relationships = True
+            relationships = self.eager_profile(profile)
+        allowed = set(relationships) if relationships is not None else None
 
         # Защита от циклических ссылок
         obj_id = id(self)
@@ -44,33 +114,31 @@ class BaseModelMixin:
             return {"__cycle__": f"{self.__class__.__name__}_{obj_id}"}
         visited.add(obj_id)
 
-        result = {}
-        mapper = class_mapper(self.__class__)
+        plan = self.serialization_plan()
 
         # Базовые атрибуты
-        for column in mapper.columns:
-            if column.key not in exclude:
-                result[column.key] = getattr(self, column.key)
+        result = {key: getattr(self, key) for key in plan.columns if key not in exclude}
 
         # Отношения
         if include_relationships:
-            for relationship in mapper.relationships:
-                if relationship.key not in exclude:
-                    related_obj = getattr(self, relationship.key)
-                    if related_obj is not None:
-                        if relationship.uselist:  # One-to-Many или Many-to-Many
-                            result[relationship.key] = [
-                                item.to_dict(include_relationships=False, exclude=exclude, visited=visited)
-                                if hasattr(item, 'to_dict') else
-                                self._simple_convert(item)
-                                for item in related_obj
-                            ]
-                        else:  # One-to-One или Many-to-One
-                            result[relationship.key] = (
-                                related_obj.to_dict(include_relationships=False, exclude=exclude, visited=visited)
-                                if hasattr(related_obj, 'to_dict') else
-                                self._simple_convert(related_obj)
-                            )
+            for key, uselist in plan.relationships:
+                if key in exclude or (allowed is not None and key not in allowed):
+                    continue
+                related_obj = getattr(self, key)
+                if related_obj is not None:
+                    if uselist:  # One-to-Many или Many-to-Many
+                        result[key] = [
+                            item.to_dict(include_relationships=False, exclude=exclude, visited=visited)
+                            if hasattr(item, 'to_dict') else
+                            self._simple_convert(item)
+                            for item in related_obj
+                        ]
+                    else:  # One-to-One или Many-to-One
+                        result[key] = (
+                            related_obj.to_dict(include_relationships=False, exclude=exclude, visited=visited)
+                            if hasattr(related_obj, 'to_dict') else
+                            self._simple_convert(related_obj)
+                        )
 
         visited.remove(obj_id)
         return result
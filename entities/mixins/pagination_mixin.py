@@ -13,12 +13,16 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import TypeVar, List, Any
+import base64
+import json
+from datetime import datetime, date
+from typing import TypeVar, List, Any, Optional
 
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Relationship, selectinload
 from sqlmodel import select, func, SQLModel
 
-from models.pagination_model import PaginatedResponse
+from models.pagination_model import PaginatedResponse, PageCountMode
 
 T = TypeVar('T', bound=SQLModel)
 
@@ -26,6 +30,74 @@ T = TypeVar('T', bound=SQLModel)
 class PaginationMixin:
     """Миксин для добавления пагинации к моделям SQLModel"""
 
+    @classmethod
+    def _paginate_queries(
+            cls,
+            where_conditions: List[Any] = None,
+            joins: List[Any] = None,
+            profile: str | None = None,
+    ):
+        """Базовые запросы данных и подсчета с условиями, join и профилем жадной загрузки"""
+        query = select(cls)
+        if profile is not None:
+            query = query.options(*cls.eager_options(profile))
+        count_query = select(func.count(cls.id))
+
+        if isinstance(joins, list):
+            for item in joins:
+                query = query.join(item)
+                count_query = count_query.join(item)
+
+        if where_conditions:
+            for condition in where_conditions:
+                query = query.where(condition)
+                count_query = count_query.where(condition)
+
+        return query, count_query
+
+    @classmethod
+    def _serialize_items(
+            cls,
+            items: List[Any],
+            model_class: Any,
+            include_relationships: bool,
+            profile: str | None = None
+    ) -> List[Any]:
+        """Один проход сериализации: сущность -> словарь -> модель (если указана)"""
+        if model_class is None:
+            return [item.to_dict(include_relationships=include_relationships, profile=profile) for item in items]
+        return [
+            model_class.model_validate(item.to_dict(include_relationships=include_relationships, profile=profile))
+            for item in items
+        ]
+
+    @classmethod
+    def _count(cls, session, count_query, count_mode: PageCountMode) -> tuple[int, bool]:
+        """Количество записей: (total, estimated). Для NONE возвращает -1"""
+        if count_mode == PageCountMode.NONE:
+            return -1, False
+        if count_mode == PageCountMode.ESTIMATED:
+            estimated = cls._estimate_count(session, count_query)
+            if estimated is not None:
+                return estimated, True
+        return session.exec(count_query).first() or 0, False
+
+    @classmethod
+    def _estimate_count(cls, session, count_query) -> Optional[int]:
+        """Оценка количества строк по плану запроса PostgreSQL (без сканирования таблицы)"""
+        try:
+            rows_query = count_query.with_only_columns(cls.id)
+            compiled = rows_query.compile(dialect=session.bind.dialect)
+            plan = session.connection().exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {compiled.string}",
+                compiled.params
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception:
+            return None
+
     @classmethod
     def paginate(
             cls,
@@ -36,7 +108,10 @@ class PaginationMixin:
             order_by: Any = None,
             include_relationships: bool = False,
             joins: List[Any] = None,
-    ) -> "PaginatedResponse[dict]":
+            model_class: Any = None,
+            count_mode: PageCountMode = PageCountMode.EXACT,
+            profile: str | None = None,
+    ) -> "PaginatedResponse[Any]":
         """
         Пагинирует результаты запроса
 
@@ -48,43 +123,30 @@ class PaginationMixin:
             order_by: Поле для сортировки
             include_relationships: Включать ли связанные объекты
             joins: Включать отношения сущностей для поиска по полям этих отношений (передаются в where_conditions)
+            model_class: Pydantic модель элементов (None - словари)
+            count_mode: Точный, оценочный подсчет или без подсчета
+            profile: Профиль жадной загрузки отношений (см. BaseModelMixin)
         """
-        # Базовый запрос для данных
-        query = select(cls)
-
-        # Базовый запрос для подсчета
-        count_query = select(func.count(cls.id))
-
-        if isinstance(joins, list):
-            for item in joins:
-                query = query.join(item)
-                count_query = count_query.join(item)
-
-        # Применяем условия WHERE если есть
-        if where_conditions:
-            for condition in where_conditions:
-                query = query.where(condition)
-                count_query = count_query.where(condition)
+        query, count_query = cls._paginate_queries(where_conditions, joins, profile)
 
         # Применяем сортировку если указана
         if order_by is not None:
             query = query.order_by(order_by)
 
         # Получаем общее количество
-        total = session.exec(count_query).first() or 0
+        total, estimated = cls._count(session, count_query, count_mode)
 
         # Применяем пагинацию
         query = query.offset((page - 1) * size).limit(size)
 
-        # Выполняем запрос и преобразуем в словари
         items = session.exec(query).all()
-        dict_items = [item.to_dict(include_relationships=include_relationships) for item in items]
 
-        return PaginatedResponse[dict].create(
-            items=dict_items,
+        return PaginatedResponse[model_class or dict].create(
+            items=cls._serialize_items(items, model_class, include_relationships, profile),
             total=total,
             page=page,
-            size=size
+            size=size,
+            estimated=estimated
         )
 
     @classmethod
@@ -97,26 +159,102 @@ class PaginationMixin:
             where_conditions: List[Any] = None,
             order_by: Any = None,
             include_relationships: bool = False,
-            joins: List[Any] = None
+            joins: List[Any] = None,
+            count_mode: PageCountMode = PageCountMode.EXACT,
+            profile: str | None = None,
     ) -> "PaginatedResponse[Any]":
         """
         Пагинирует и преобразует в Pydantic модель
         """
-        dict_response = cls.paginate(
+        return cls.paginate(
             session=session,
             page=page,
             size=size,
             where_conditions=where_conditions,
             order_by=order_by,
             include_relationships=include_relationships,
-            joins=joins
+            joins=joins,
+            model_class=model_class,
+            count_mode=count_mode,
+            profile=profile
         )
-        # Преобразуем словари в модели
-        model_items = [model_class.model_validate(item) for item in dict_response.items]
-
-        return PaginatedResponse[model_class].create(
-            items=model_items,
-            total=dict_response.total,
-            page=dict_response.page,
-            size=dict_response.size
+
+    @classmethod
+    def paginate_keyset(
+            cls,
+            session,
+            sort_column: Any,
+            model_class: Any = None,
+            cursor: str | None = None,
+            descending: bool = True,
+            page: int = 1,
+            size: int = 10,
+            where_conditions: List[Any] = None,
+            include_relationships: bool = False,
+            joins: List[Any] = None,
+            count_mode: PageCountMode = PageCountMode.EXACT,
+            profile: str | None = None,
+    ) -> "PaginatedResponse[Any]":
+        """
+        Keyset (seek) пагинация по (sort_column, id): следующая страница начинается
+        сразу после последней записи предыдущей, поэтому стоимость не зависит от глубины.
+
+        Args:
+            sort_column: Колонка сортировки (NOT NULL)
+            cursor: Курсор из next_cursor предыдущей страницы (None - первая страница)
+            descending: Сортировка по убыванию
+            page: Номер страницы (только для ответа)
+        """
+        query, count_query = cls._paginate_queries(where_conditions, joins, profile)
+
+        if cursor:
+            value, last_id = cls.decode_cursor(cursor)
+            key = tuple_(sort_column, cls.id)
+            bound = tuple_(value, last_id)
+            query = query.where(key < bound if descending else key > bound)
+
+        if descending:
+            query = query.order_by(sort_column.desc(), cls.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), cls.id.asc())
+
+        # Лишняя запись показывает, есть ли следующая страница
+        items = session.exec(query.limit(size + 1)).all()
+        next_cursor = None
+        if len(items) > size:
+            items = items[:size]
+            last = items[-1]
+            next_cursor = cls.encode_cursor(getattr(last, sort_column.key), last.id)
+
+        total, estimated = cls._count(session, count_query, count_mode)
+
+        return PaginatedResponse[model_class or dict].create(
+            items=cls._serialize_items(items, model_class, include_relationships, profile),
+            total=total,
+            page=page,
+            size=size,
+            next_cursor=next_cursor,
+            estimated=estimated
         )
+
+    @staticmethod
+    def encode_cursor(value: Any, last_id: int) -> str:
+        """Непрозрачный курсор из значения сортировки и id"""
+        if isinstance(value, (datetime, date)):
+            payload = {'t': 'dt', 'v': value.isoformat(), 'id': last_id}
+        else:
+            payload = {'v': value, 'id': last_id}
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[Any, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            value = payload['v']
+            if payload.get('t') == 'dt':
+                value = datetime.fromisoformat(value)
+            return value, int(payload['id'])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError('Invalid pagination cursor')
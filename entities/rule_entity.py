@@ -124,6 +124,11 @@ class RuleEntityBase(SQLModel):
 class RuleEntity(TimeStampMixin, RuleEntityBase, IdColumnMixin, table=True):
     __tablename__ = "rules"
 
+    # Профили жадной загрузки (см. BaseModelMixin)
+    __eager_profiles__ = {
+        'graph': ('nodes', 'edges'),
+    }
+
     nodes: List[RuleNode] = Relationship(
         sa_relationship_kwargs=dict(
             # lazy="selectin",
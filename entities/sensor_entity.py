@@ -96,6 +96,11 @@ class SensorEntity(
         UniqueConstraint('device_id', 'capability', 'identifier', name='uq_device_id_cap_ident'),
     )
 
+    # Профили жадной загрузки (см. BaseModelMixin)
+    __eager_profiles__ = {
+        'device': ('device',),
+    }
+
     device: Optional["DeviceEntity"] = Relationship(
         back_populates="sensors"
     )
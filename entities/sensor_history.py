@@ -14,6 +14,7 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from typing import Optional, TYPE_CHECKING
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 
 from entities.mixins.created_updated import TimeStampMixin
@@ -33,6 +34,11 @@ class SensorHistoryBase:
     value: str = Field(
         nullable=True
     )
+    # Числовое значение (логические - 1/0), None для перечислений и нечисловых строк
+    value_num: Optional[float] = Field(
+        default=None,
+        nullable=True
+    )
 
 
 class SensorHistory(
@@ -43,6 +49,11 @@ class SensorHistory(
 ):
     __tablename__ = 'device_sensors_history'
 
+    __table_args__ = (
+        # История сенсора за период: графики, агрегаты, пороговые выборки
+        Index('ix_device_sensors_history_sensor_id_created', 'sensor_id', 'created'),
+    )
+
     sensor: Optional["SensorEntity"] = Relationship(
         back_populates="history"
     )
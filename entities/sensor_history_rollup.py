@@ -0,0 +1,58 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from datetime import datetime
+
+from sqlmodel import Field, UniqueConstraint
+
+from entities.mixins.id_column import IdColumnMixin
+
+
+class SensorHistoryRollupBase:
+    sensor_id: int = Field(
+        index=True,
+        foreign_key="device_sensors.id",
+        ondelete="CASCADE"
+    )
+    # Разрешение агрегата: 1m, 1h, 1d (SensorHistoryResolutionEnum)
+    resolution: str = Field(
+        nullable=False,
+        max_length=4
+    )
+    # Начало интервала
+    bucket: datetime = Field(
+        nullable=False
+    )
+    count: int = Field(default=0)
+    sum: float = Field(default=0)
+    min: float | None = Field(default=None, nullable=True)
+    max: float | None = Field(default=None, nullable=True)
+    last: float | None = Field(default=None, nullable=True)
+
+
+class SensorHistoryRollup(
+    SensorHistoryRollupBase,
+    IdColumnMixin,
+    table=True
+):
+    """Агрегаты истории сенсора (min/max/avg/last) по минутам, часам и дням"""
+    __tablename__ = 'device_sensors_history_rollups'
+    __table_args__ = (
+        UniqueConstraint('sensor_id', 'resolution', 'bucket', name='uq_sensor_rollup_bucket'),
+    )
+
+    @property
+    def avg(self) -> float | None:
+        return self.sum / self.count if self.count else None
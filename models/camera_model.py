@@ -15,6 +15,7 @@
 
 from pydantic import BaseModel, Field, computed_field
 
+from entities.enums.camera_decode_thread_type_enum import CameraDecodeThreadTypeEnum
 from entities.enums.camera_protocol_enum import CameraProtocolEnum
 from entities.enums.camera_record_type_enum import CameraRecordTypeEnum
 from models.camera_area_model import CameraAreaBaseModel
@@ -33,6 +34,11 @@ class CameraBaseModel(CameraGetModel):
     alerts: bool = True
     record: bool = False
     record_duration: int | None = None
+    record_passthrough: bool = False
+    # Настройки декодера: число потоков (None - по числу ядер), тип многопоточности, режим низкой задержки
+    decode_threads: int | None = Field(default=None, ge=0, le=16)
+    decode_thread_type: CameraDecodeThreadTypeEnum | None = None
+    decode_low_delay: bool = False
     record_mode: CameraRecordTypeEnum | None = None
     delete_after: int | None = None
     cover: str | None = None
@@ -16,9 +16,28 @@
 from pydantic import BaseModel, Field
 
 
+class CameraPipelineStageModel(BaseModel):
+    """Состояние стадии конвейера кадров камеры"""
+    name: str = Field(...)
+    policy: str | None = Field(default=None)
+    capacity: int = Field(default=0)
+    queued: int = Field(default=0)
+    processed: int = Field(default=0)
+    dropped: int = Field(default=0)
+    # Средние за последние элементы: ожидание в очереди и обработка (мс)
+    wait_ms: float = Field(default=0)
+    process_ms: float = Field(default=0)
+    # Полная задержка (ожидание + обработка) за последние элементы (мс)
+    latency_p95_ms: float = Field(default=0)
+    latency_max_ms: float = Field(default=0)
+
+
 class CameraStreamModel(BaseModel):
     name: str = Field(...)
     camera_id: int = Field(...)
     stopped: bool = Field(...)
     need_restart: bool = Field(...)
     capture_error: bool = Field(default=False)
+    pipeline: list[CameraPipelineStageModel] = Field(default_factory=list)
+    analysis_mode: str | None = Field(default=None)
+    analysis_fps: float = Field(default=0)
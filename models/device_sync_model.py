@@ -0,0 +1,63 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class DeviceSyncSensor(BaseModel):
+    """Сенсор в том виде, в котором его сообщает устройство"""
+    capability: str
+    identifier: str
+    name: str | None = None
+    type: int
+    active: bool = True
+    options: dict[str, Any] | None = None
+    value: str | float | int | bool | None = None
+
+
+class DeviceSyncInterface(BaseModel):
+    name: str
+    mac: str
+    ip: str
+    mask: str
+    gw: str
+
+
+class DeviceSyncState(BaseModel):
+    """Состояние устройства, полученное при синхронизации"""
+    external_id: str
+    name: str
+    capabilities: list[str] = []
+    free_heap: int | None = None
+    total_heap: int | None = None
+    sensors: list[DeviceSyncSensor] = []
+    interfaces: list[DeviceSyncInterface] = []
+
+    def fingerprint(self) -> str:
+        """Хэш конфигурации: без значений сенсоров и свободной памяти, которые меняются постоянно"""
+        data = self.model_dump_json(exclude={'free_heap': True, 'sensors': {'__all__': {'value'}}})
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class DeviceSyncResult(BaseModel):
+    device_id: int
+    created: int = 0
+    updated: list[int] = []
+    interfaces: int = 0
+    # (capability, identifier) -> id сенсора
+    sensor_ids: dict[tuple[str, str], int] = {}
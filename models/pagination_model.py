@@ -24,6 +24,12 @@ from pydantic import BaseModel
 T = TypeVar('T')
 
 
+class PageCountMode(StrEnum):
+    EXACT = 'exact'
+    ESTIMATED = 'estimated'
+    NONE = 'none'
+
+
 class PageParams(BaseModel):
     page: int = 1
     size: int = 10
@@ -33,6 +39,11 @@ class PageParams(BaseModel):
             'examples': [None],
         }
     )
+    # Keyset пагинация: курсор из next_cursor предыдущей страницы
+    cursor: str | None = Field(default=None)
+    # Keyset пагинация для первой страницы (без курсора)
+    keyset: bool = Field(default=False)
+    count: PageCountMode = Field(default=PageCountMode.EXACT)
 
 
 class EventsPageType(StrEnum):
@@ -63,6 +74,8 @@ class PaginatedResponse(BaseModel, Generic[T]):
     page: int
     size: int
     pages: int
+    next_cursor: str | None = None
+    estimated: bool = False
 
     class Config:
         arbitrary_types_allowed = True
@@ -74,13 +87,17 @@ class PaginatedResponse(BaseModel, Generic[T]):
             total: int,
             page: int,
             size: int,
+            next_cursor: str | None = None,
+            estimated: bool = False
     ) -> "PaginatedResponse[T]":
         """Создает пагинированный ответ с автоматическим расчетом pages"""
-        pages = ceil(total / size) if size > 0 else 0
+        pages = ceil(total / size) if size > 0 and total > 0 else 0
         return cls(
             items=items,
             total=total,
             page=page,
             size=size,
-            pages=pages
+            pages=pages,
+            next_cursor=next_cursor,
+            estimated=estimated
         )
@@ -14,16 +14,26 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from classes.charts.chart_downsample import ChartDownsample
 
 
 class SensorHistoryModel(BaseModel):
     id: int
     sensor_id: int
     value: str
+    value_num: float | None = None
     created: datetime
 
 
+class SensorHistoryStatsModel(BaseModel):
+    count: int = 0
+    min: float | None = None
+    max: float | None = None
+    avg: float | None = None
+
+
 class SensorHistoryChartModel(BaseModel):
     value: str
     created: datetime
@@ -32,3 +42,6 @@ class SensorHistoryChartModel(BaseModel):
 class SearchHistoryModel(BaseModel):
     id: int
     range: list[datetime, datetime]
+    # Максимум точек в ответе, None - вся сырая история
+    points: int | None = Field(default=1000, ge=3)
+    downsample: ChartDownsample = ChartDownsample.LTTB
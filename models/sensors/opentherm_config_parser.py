@@ -107,9 +107,11 @@ class OpenthermConfigParser:
             return False
         try:
             from entities.sensor_history import SensorHistory
+            from classes.devices.sensor_value import to_numeric
             history = SensorHistory()
             history.sensor_id = sensor.id
             history.value = sensor.value
+            history.value_num = to_numeric(sensor.value)
             session.add(history)
             session.commit()
             return True
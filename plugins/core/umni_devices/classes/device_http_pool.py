@@ -0,0 +1,171 @@
+# Copyright (C) 2026 Mikhail Sazanov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+# Методы, которые можно повторить после таймаута чтения (запрос мог дойти до устройства)
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'})
+
+
+@dataclass(frozen=True)
+class DeviceHttpSettings:
+    """Параметры пула HTTP соединений с контроллерами"""
+    connect_timeout: float = 3.0
+    read_timeout: float = 10.0
+    # Одновременных запросов к одному контроллеру (у ESP мало сокетов)
+    per_host: int = 2
+    max_connections: int = 200
+    max_keepalive: int = 100
+    keepalive_expiry: float = 5.0
+    # Повторы при ошибках соединения, пауза - случайная в пределах экспоненциальной границы
+    retries: int = 2
+    backoff: float = 0.2
+    max_backoff: float = 2.0
+
+
+class DeviceHttpPool:
+    """Общий keep-alive пул HTTP соединений с контроллерами.
+
+    Синхронный и асинхронный клиенты httpx переиспользуют TCP соединения между запросами,
+    число одновременных запросов к одному хосту ограничено семафором.
+    """
+
+    def __init__(self, settings: DeviceHttpSettings = DeviceHttpSettings()):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._async_host_slots: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Semaphore] = {}
+
+    def timeout(self, read_timeout: Optional[float] = None) -> httpx.Timeout:
+        return httpx.Timeout(
+            read_timeout if read_timeout is not None else self.settings.read_timeout,
+            connect=self.settings.connect_timeout
+        )
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.settings.max_connections,
+            max_keepalive_connections=self.settings.max_keepalive,
+            keepalive_expiry=self.settings.keepalive_expiry
+        )
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(limits=self._limits(), timeout=self.timeout())
+            return self._client
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # AsyncClient привязан к event loop, в котором создан
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for stale in [item for item in self._async_clients if item.is_closed()]:
+                del self._async_clients[stale]
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(limits=self._limits(), timeout=self.timeout())
+                self._async_clients[loop] = client
+            return client
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.settings.per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def _async_slot(self, host: str) -> asyncio.Semaphore:
+        key = (asyncio.get_running_loop(), host)
+        with self._lock:
+            slot = self._async_host_slots.get(key)
+            if slot is None:
+                slot = asyncio.Semaphore(self.settings.per_host)
+                self._async_host_slots[key] = slot
+            return slot
+
+    def _should_retry(self, method: str, error: httpx.TransportError, attempt: int) -> bool:
+        if attempt >= self.settings.retries:
+            return False
+        # Соединение не установлено или закрыто устройством до ответа (устаревший keep-alive)
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)):
+            return True
+        return method.upper() in IDEMPOTENT_METHODS
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.settings.max_backoff, self.settings.backoff * (2 ** attempt)))
+
+    def request(
+            self,
+            method: str,
+            url: str,
+            host: str,
+            read_timeout: Optional[float] = None,
+            **kwargs
+    ) -> httpx.Response:
+        """Синхронный запрос с повторами при ошибках соединения"""
+        client = self._sync_client()
+        attempt = 0
+        while True:
+            try:
+                with self._slot(host):
+                    return client.request(method, url, timeout=self.timeout(read_timeout), **kwargs)
+            except httpx.TransportError as e:
+                if not self._should_retry(method, e, attempt):
+                    raise
+                time.sleep(self._delay(attempt))
+                attempt += 1
+
+    async def arequest(
+            self,
+            method: str,
+            url: str,
+            host: str,
+            read_timeout: Optional[float] = None,
+            **kwargs
+    ) -> httpx.Response:
+        """Асинхронный запрос с повторами при ошибках соединения"""
+        client = self._async_client()
+        attempt = 0
+        while True:
+            try:
+                async with self._async_slot(host):
+                    return await client.request(method, url, timeout=self.timeout(read_timeout), **kwargs)
+            except httpx.TransportError as e:
+                if not self._should_retry(method, e, attempt):
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                attempt += 1
+
+    def close(self):
+        """Закрывает синхронный клиент. Асинхронные клиенты забываются после закрытия своего event loop"""
+        with self._lock:
+            client = self._client
+            self._client = None
+            self._host_slots.clear()
+        if client is not None:
+            client.close()
+
+
+device_http_pool = DeviceHttpPool()
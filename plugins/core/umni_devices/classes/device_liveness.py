@@ -0,0 +1,231 @@
+# Copyright (C) 2026 Mikhail Sazanov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import errno
+import random
+import selectors
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Hashable
+
+
+@dataclass
+class DeviceLiveness:
+    """Состояние живости одного устройства"""
+    external_id: str
+    online: bool
+    # time.monotonic() последнего признака жизни (syslog, mDNS, успешная проба)
+    last_seen: float
+    next_probe: float = 0.0
+    failures: int = 0
+
+
+def probe_many(
+        targets: dict[Hashable, tuple[str, int]],
+        timeout: float = 1.5,
+        limit: int = 256
+) -> dict[Hashable, bool]:
+    """Проверка TCP-портов без блокировки на каждом устройстве.
+    Все соединения открываются сразу и дожидаются одним selector, пачками не больше limit,
+    поэтому время проверки не зависит от количества устройств.
+    """
+    result: dict[Hashable, bool] = {}
+    items = list(targets.items())
+    for start in range(0, len(items), limit):
+        selector = selectors.DefaultSelector()
+        try:
+            for key, (ip, port) in items[start:start + limit]:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                try:
+                    code = sock.connect_ex((ip, port))
+                except OSError:
+                    code = errno.EHOSTUNREACH
+                if code == 0:
+                    result[key] = True
+                    sock.close()
+                elif code in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                    selector.register(sock, selectors.EVENT_WRITE, key)
+                else:
+                    result[key] = False
+                    sock.close()
+
+            deadline = time.monotonic() + timeout
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for selector_key, _ in selector.select(remaining):
+                    sock = selector_key.fileobj
+                    result[selector_key.data] = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+                    selector.unregister(sock)
+                    sock.close()
+        finally:
+            # Не ответившие за timeout - недоступны
+            for selector_key in list(selector.get_map().values()):
+                result[selector_key.data] = False
+                selector_key.fileobj.close()
+            selector.close()
+    return result
+
+
+class DeviceLivenessTracker:
+    """Отслеживание доступности устройств по событиям.
+    Сообщения syslog и анонсы mDNS считаются признаками жизни; активно проверяются только
+    устройства, которые молчат дольше silence_timeout. Недоступные устройства проверяются
+    с растущим интервалом, смены статуса копятся и применяются пачкой в tick().
+    """
+
+    def __init__(
+            self,
+            resolve: Callable[[str], Optional[tuple[str, int]]],
+            apply_status: Callable[[list[str], list[str]], None],
+            silence_timeout: float = 30.0,
+            max_backoff: float = 300.0,
+            retry_delay: float = 5.0,
+            probe_timeout: float = 1.5,
+            failures_to_offline: int = 2
+    ):
+        # external_id -> (ip, port) для активной проверки или None
+        self.resolve = resolve
+        # Пакетное применение смен статуса: (онлайн, офлайн)
+        self.apply_status = apply_status
+        self.silence_timeout = silence_timeout
+        self.max_backoff = max_backoff
+        self.retry_delay = retry_delay
+        self.probe_timeout = probe_timeout
+        self.failures_to_offline = failures_to_offline
+
+        self.devices: dict[str, DeviceLiveness] = {}
+        self.lock = threading.Lock()
+        # Накопленные смены статуса: external_id -> online
+        self.transitions: dict[str, bool] = {}
+
+        self.heartbeats: int = 0
+        self.probes: int = 0
+
+    def track(self, external_id: str, online: bool):
+        """Добавляет устройство под наблюдение; известные устройства не сбрасываются"""
+        now = time.monotonic()
+        with self.lock:
+            if external_id not in self.devices:
+                self.devices[external_id] = DeviceLiveness(
+                    external_id=external_id,
+                    online=online,
+                    last_seen=now if online else 0.0
+                )
+
+    def untrack(self, external_id: str):
+        with self.lock:
+            self.devices.pop(external_id, None)
+            self.transitions.pop(external_id, None)
+
+    def heartbeat(self, external_id: str):
+        """Признак жизни устройства (syslog, mDNS). Вызывается из любых потоков"""
+        now = time.monotonic()
+        with self.lock:
+            state = self.devices.get(external_id)
+            if state is None:
+                return
+            self.heartbeats += 1
+            self._alive(state, now)
+
+    def online_ids(self) -> list[str]:
+        with self.lock:
+            return [state.external_id for state in self.devices.values() if state.online]
+
+    def is_online(self, external_id: str) -> bool:
+        with self.lock:
+            state = self.devices.get(external_id)
+            return state is not None and state.online
+
+    def tick(self) -> tuple[list[str], list[str]]:
+        """Проверяет замолчавшие устройства и применяет накопленные смены статуса.
+        Возвращает (ставшие онлайн, ставшие офлайн)
+        """
+        now = time.monotonic()
+        with self.lock:
+            due = [
+                state.external_id
+                for state in self.devices.values()
+                if now - state.last_seen >= self.silence_timeout and now >= state.next_probe
+            ]
+
+        if due:
+            targets = {}
+            unresolved = []
+            for external_id in due:
+                address = self.resolve(external_id)
+                if address is None or address[0] == '0.0.0.0':
+                    unresolved.append(external_id)
+                else:
+                    targets[external_id] = address
+            results = probe_many(targets, timeout=self.probe_timeout) if targets else {}
+            results.update({external_id: False for external_id in unresolved})
+
+            now = time.monotonic()
+            with self.lock:
+                self.probes += len(targets)
+                for external_id, success in results.items():
+                    state = self.devices.get(external_id)
+                    if state is None:
+                        continue
+                    if success:
+                        self._alive(state, now)
+                    else:
+                        self._failed(state, now)
+
+        with self.lock:
+            transitions, self.transitions = self.transitions, {}
+        online = [external_id for external_id, value in transitions.items() if value]
+        offline = [external_id for external_id, value in transitions.items() if not value]
+        if online or offline:
+            self.apply_status(online, offline)
+        return online, offline
+
+    def _alive(self, state: DeviceLiveness, now: float):
+        state.last_seen = now
+        state.failures = 0
+        state.next_probe = 0.0
+        if not state.online:
+            state.online = True
+            self._transition(state.external_id, True)
+
+    def _failed(self, state: DeviceLiveness, now: float):
+        state.failures += 1
+        # Экспоненциальная задержка следующей проверки с разбросом, чтобы проверки не шли залпом
+        delay = min(self.retry_delay * 2 ** (state.failures - 1), self.max_backoff)
+        state.next_probe = now + delay * random.uniform(0.9, 1.1)
+        if state.online and state.failures >= self.failures_to_offline:
+            state.online = False
+            self._transition(state.external_id, False)
+
+    def _transition(self, external_id: str, online: bool):
+        # Противоположные смены в пределах одного tick взаимно гасятся
+        if self.transitions.get(external_id) is (not online):
+            self.transitions.pop(external_id)
+        else:
+            self.transitions[external_id] = online
+
+    def get_status(self) -> dict:
+        with self.lock:
+            return {
+                'tracked': len(self.devices),
+                'online': sum(1 for state in self.devices.values() if state.online),
+                'backoff': sum(1 for state in self.devices.values() if state.failures),
+                'heartbeats': self.heartbeats,
+                'probes': self.probes,
+            }
@@ -14,13 +14,14 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import json
-import urllib.error
-import urllib.request
-import urllib.parse
 from typing import Optional, Dict, Any, List, Literal
+
+import httpx
 from pydantic import BaseModel, Field, AnyHttpUrl, field_validator
 from enum import IntEnum, Enum
 
+from plugins.core.umni_devices.classes.device_http_pool import DeviceHttpPool, device_http_pool
+
 
 # ============ Enum Definitions ============
 
@@ -734,14 +735,16 @@ class AutomationDeleteResponse(ResponseBase):
 # ============ Main Client Class ============
 
 class DeviceRestCommands:
-    def __init__(self, ip_address: str, timeout: int = 10, protocol: str = 'http', token: Optional[str] = None):
+    def __init__(self, ip_address: str, timeout: int = 10, protocol: str = 'http', token: Optional[str] = None,
+                 pool: Optional[DeviceHttpPool] = None):
         """
         Инициализация клиента
 
         :param ip_address: IP адрес контроллера
-        :param timeout: Таймаут запроса в секундах
+        :param timeout: Таймаут чтения ответа в секундах (таймаут соединения задается пулом)
         :param protocol: Протокол (http или https)
         :param token: Токен авторизации (если установлен)
+        :param pool: Пул соединений, по умолчанию общий для всех контроллеров
         """
         self.ip = ip_address
         self.protocol = protocol
@@ -749,65 +752,83 @@ class DeviceRestCommands:
         # Todo - where to store token?
         self.token = token
         self.base_url = f"{protocol}://{ip_address}"
+        self.pool = pool or device_http_pool
 
-    def _request(self, method: str, endpoint: str, data: Optional[Dict] = None,
+    def _prepare(self, endpoint: str, data: Optional[Dict] = None,
                  params: Optional[Dict] = None) -> Dict[str, Any]:
-        """
-        Внутренний метод для выполнения запросов
-        :return: Ответ от API в виде словаря
-        :raises: APIError, ConnectionError, HTTPError, ParseError
-        """
-        url = f"{self.base_url}{endpoint}"
-        if params:
-            url += "?" + urllib.parse.urlencode(params)
-
+        """Аргументы запроса для пула соединений"""
         headers = {
-            'Content-Type': 'application/json',
-            'Connection': 'close'
+            'Content-Type': 'application/json'
         }
         if self.token:
             headers['Authorization'] = f'Bearer {self.token}'
 
-        # Подготовка данных
+        kwargs: Dict[str, Any] = {
+            'url': f"{self.base_url}{endpoint}",
+            'host': self.ip,
+            'read_timeout': self.timeout,
+            'headers': headers,
+        }
+        if params:
+            kwargs['params'] = params
         if data is not None:
-            json_data = json.dumps(data, default=lambda x: x.value if isinstance(x, Enum) else x).encode('utf-8')
-            req = urllib.request.Request(url, data=json_data, headers=headers, method=method)
-        else:
-            req = urllib.request.Request(url, headers=headers, method=method)
-
-        try:
-            with urllib.request.urlopen(req, timeout=self.timeout) as response:
-                response_data = response.read().decode('utf-8')
-                result = json.loads(response_data)
-                result['status_code'] = response.getcode()
-                return result
+            kwargs['content'] = json.dumps(data, default=lambda x: x.value if isinstance(x, Enum) else x).encode(
+                'utf-8')
+        return kwargs
 
-        except urllib.error.HTTPError as e:
+    def _parse_response(self, response: httpx.Response) -> Dict[str, Any]:
+        if response.status_code >= 400:
             try:
-                error_body = e.read().decode('utf-8')
-                error_json = json.loads(error_body)
-                raise HTTPError(
-                    message=error_json.get('error', str(e)),
-                    status_code=e.code,
-                    response_data=error_json
-                )
-            except json.JSONDecodeError:
+                error_json = response.json()
+            except ValueError:
                 raise HTTPError(
-                    message=f"HTTP {e.code}: {e.reason}",
-                    status_code=e.code
+                    message=f"HTTP {response.status_code}: {response.reason_phrase}",
+                    status_code=response.status_code
                 )
+            raise HTTPError(
+                message=error_json.get('error', f"HTTP {response.status_code}")
+                if isinstance(error_json, dict) else f"HTTP {response.status_code}",
+                status_code=response.status_code,
+                response_data=error_json if isinstance(error_json, dict) else None
+            )
 
-        except urllib.error.URLError as e:
+        try:
+            result = response.json()
+        except ValueError as e:
+            raise ParseError(
+                message=f"Invalid JSON response: {e}",
+                status_code=None
+            )
+        result['status_code'] = response.status_code
+        return result
+
+    def _request(self, method: str, endpoint: str, data: Optional[Dict] = None,
+                 params: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Внутренний метод для выполнения запросов
+        :return: Ответ от API в виде словаря
+        :raises: APIError, ConnectionError, HTTPError, ParseError
+        """
+        try:
+            response = self.pool.request(method, **self._prepare(endpoint, data, params))
+        except httpx.TransportError as e:
             raise ConnectionError(
                 message=f"Connection error with {self.ip}: {e}",
                 status_code=None
             )
+        return self._parse_response(response)
 
-        except json.JSONDecodeError as e:
-            raise ParseError(
-                message=f"Invalid JSON response: {e}",
+    async def _arequest(self, method: str, endpoint: str, data: Optional[Dict] = None,
+                        params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Асинхронный вариант _request"""
+        try:
+            response = await self.pool.arequest(method, **self._prepare(endpoint, data, params))
+        except httpx.TransportError as e:
+            raise ConnectionError(
+                message=f"Connection error with {self.ip}: {e}",
                 status_code=None
             )
+        return self._parse_response(response)
 
     # ============ GET Methods ============
 
@@ -1001,3 +1022,34 @@ class DeviceRestCommands:
             return result.success
         except Exception:
             return False
+
+    # ============ Async Methods ============
+
+    async def aget_system_info(self) -> SystemInfoResponse:
+        """Получение системной информации (async)"""
+        return SystemInfoResponse(**await self._arequest('GET', '/api/systeminfo'))
+
+    async def aget_configuration(self, section: str) -> ConfigurationResponse:
+        """Получение конфигурации устройства или секции (async)"""
+        params = {}
+        if section:
+            params['section'] = section
+        return ConfigurationResponse(**await self._arequest('GET', '/api/conf', params=params))
+
+    async def aget_state(self, capability: str) -> StateResponse:
+        """Получение состояния сенсора (async)"""
+        data = {"capability": capability}
+        return StateResponse(**await self._arequest('POST', '/api/state', data=data))
+
+    async def aupdate_settings(self, setting: str, values: Dict[str, Any]) -> SettingsResponse:
+        """Обновление настроек контроллера (async)"""
+        data = {"setting": setting, "values": values}
+        return SettingsResponse(**await self._arequest('POST', '/api/settings', data=data))
+
+    async def acheck_connection(self) -> bool:
+        """Проверка соединения с контроллером (async)"""
+        try:
+            result = await self.aget_system_info()
+            return result.success
+        except Exception:
+            return False
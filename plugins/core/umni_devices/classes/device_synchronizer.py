@@ -12,17 +12,16 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import threading
 import time
-from datetime import datetime
-from typing import Union, Any
+from typing import Optional
 
 from classes.devices.device_registry import device_registry
 from classes.devices.device_sensor_type_enum import DeviceSensorTypeEnum
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from models.device_model_relations import DeviceModelWithRelations
-from models.device_netif import DeviceNetifBase
-from models.sensor_model import SensorModelWithDevice, SensorUpdateModel, SensorCreateModel
+from models.device_sync_model import DeviceSyncState, DeviceSyncSensor, DeviceSyncInterface, DeviceSyncResult
 from plugins.core.umni_devices.classes.device_rest_commands import DeviceRestCommands, SettingCapability
 from plugins.core.umni_devices.models.mdns_models import MDNSDevice
 from repositories.device_repository import DeviceRepository
@@ -30,6 +29,16 @@ from repositories.sensor_repository import SensorRepository
 
 
 class DeviceSynchronizer:
+    """Синхронизация устройства с БД.
+    Состояние устройства сравнивается с сохраненным и применяется одной транзакцией;
+    если конфигурация не менялась (тот же отпечаток), запись в БД пропускается.
+    """
+    # device external_id -> (отпечаток, время последней полной синхронизации, (capability, identifier) -> id сенсора)
+    fingerprints: dict[str, tuple[str, float, dict[tuple[str, str], int]]] = {}
+    fingerprints_lock = threading.Lock()
+    # Полная синхронизация выполняется не реже этого интервала, даже без изменений
+    full_sync_interval: float = 3600.0
+
     def __init__(self, mdns_info: MDNSDevice, device: DeviceModelWithRelations):
         self.mdns_info = mdns_info
         self.device = device
@@ -38,200 +47,223 @@ class DeviceSynchronizer:
             protocol=mdns_info.protocol
         )
 
+    @classmethod
+    def reset(cls, external_id: str | None = None):
+        """Сбрасывает отпечаток, следующая синхронизация будет полной"""
+        with cls.fingerprints_lock:
+            if external_id is None:
+                cls.fingerprints.clear()
+            else:
+                cls.fingerprints.pop(external_id, None)
+
     def sync_device(self):
-        res = self.save_systeminfo()
-        if res:
-            self.save_sensors()
+        try:
+            state = self.fetch_state()
+        except Exception as e:
+            Logger.err(
+                f'DeviceSynchronizer ({self.device.id}, {self.device.external_id}) failed to fetch state: {e}',
+                LoggerType.PLUGINS)
+            return
+        if state is None:
+            return
+
+        fingerprint = state.fingerprint()
+        now = time.monotonic()
+        with self.fingerprints_lock:
+            cached = self.fingerprints.get(state.external_id)
+        if (
+                cached is not None
+                and cached[0] == fingerprint
+                and now - cached[1] < self.full_sync_interval
+                and self.device.online
+        ):
+            # Конфигурация не менялась - только значения сенсоров
+            self.push_values(state, cached[2])
+            return
+
+        result = self.save_state(state)
+        if result is None:
+            return
+
+        with self.fingerprints_lock:
+            self.fingerprints[state.external_id] = (fingerprint, now, result.sensor_ids)
+        self.push_values(state, result.sensor_ids)
 
     def get_system_info(self):
         return self.api.get_system_info()
 
-    def save_systeminfo(self) -> bool:
+    def fetch_state(self) -> Optional[DeviceSyncState]:
+        """Читает системную информацию и все поддерживаемые разделы устройства"""
+        system_info = self.get_system_info()
+        if system_info.success is not True:
+            return None
+        data = system_info.data
+        capabilities = [str(capability.value) for capability in data.capabilities]
+
+        sensors: list[DeviceSyncSensor] = []
+        for setting in SettingCapability:
+            if setting.value not in capabilities:
+                continue
+            section = self._fetch_section(setting)
+            if section is None:
+                # Неполное состояние не применяем, иначе отпечаток будет неверным
+                Logger.warn(
+                    f'DeviceSynchronizer ({self.device.id}, {self.device.external_id}) '
+                    f'failed to read {setting.value}, sync skipped',
+                    LoggerType.PLUGINS)
+                return None
+            sensors.extend(section)
+
+        return DeviceSyncState(
+            external_id=data.hostname,
+            name=data.hostname,
+            capabilities=capabilities,
+            free_heap=data.heap.free,
+            total_heap=data.heap.total,
+            sensors=sensors,
+            interfaces=[
+                DeviceSyncInterface(
+                    name=net.name,
+                    mac=net.mac,
+                    ip=net.ip,
+                    mask=net.mask,
+                    gw=net.gw
+                )
+                for net in data.networks or []
+            ]
+        )
+
+    def _fetch_section(self, setting: SettingCapability) -> Optional[list[DeviceSyncSensor]]:
+        match setting:
+            case SettingCapability.OUTPUTS:
+                res = self.api.get_outputs_info()
+                if not res.success:
+                    return None
+                return [
+                    DeviceSyncSensor(
+                        capability=setting.value,
+                        identifier=f'out{s.index}',
+                        name=s.label,
+                        type=DeviceSensorTypeEnum.SWITCH.value,
+                        active=s.active,
+                        value=s.state,
+                        options={'index': s.index, 'port': s.port}
+                    )
+                    for s in res.data.outputs
+                ]
+            case SettingCapability.INPUTS:
+                res = self.api.get_inputs_info()
+                if not res.success:
+                    return None
+                return [
+                    DeviceSyncSensor(
+                        capability=setting.value,
+                        identifier=f'inp{s.index}',
+                        name=s.label,
+                        type=DeviceSensorTypeEnum.INPUT.value,
+                        active=s.active,
+                        value=s.state,
+                        options={'index': s.index, 'port': s.port}
+                    )
+                    for s in res.data.inputs
+                ]
+            case SettingCapability.AI:
+                res = self.api.get_adc_info()
+                if not res.success:
+                    return None
+                return [
+                    DeviceSyncSensor(
+                        capability=setting.value,
+                        identifier=f'ai{(s.id + 1)}',  # case starts from 0
+                        name=s.label,
+                        type=DeviceSensorTypeEnum.NUMBER.value,
+                        active=s.active,
+                        options={'id': s.id}
+                    )
+                    for s in res.data.channels
+                ]
+            case SettingCapability.NTC:
+                res = self.api.get_ntc_info()
+                if not res.success:
+                    return None
+                return [
+                    DeviceSyncSensor(
+                        capability=setting.value,
+                        identifier=f'ntc{(s.id + 1)}',
+                        name=s.label,
+                        type=DeviceSensorTypeEnum.FLOAT.value,
+                        active=s.active,
+                        options={'id': s.id}
+                    )
+                    for s in res.data.channels
+                ]
+            case SettingCapability.OPENCOLLECTORS:
+                res = self.api.get_opencollectors_info()
+                if not res.success:
+                    return None
+                return [
+                    DeviceSyncSensor(
+                        capability=setting.value,
+                        identifier=f'oc{(s.index + 1)}',
+                        name=s.label,
+                        type=DeviceSensorTypeEnum.SWITCH.value,
+                        active=s.active,
+                        options={'index': s.index}
+                    )
+                    for s in res.data.opencollectors
+                ]
+            case SettingCapability.RF433:
+                res = self.api.get_rf433_info()
+                if not res.success:
+                    return None
+                return [
+                    DeviceSyncSensor(
+                        capability=setting.value,
+                        identifier=s.serial,
+                        name=s.label,
+                        type=DeviceSensorTypeEnum.NUMBER.value,
+                        active=s.alarm,
+                        value=s.value,
+                        options=s.model_dump(mode='json')
+                    )
+                    for s in res.data.devices
+                ]
+        return []
+
+    def save_state(self, state: DeviceSyncState) -> Optional[DeviceSyncResult]:
+        """Применяет отличия одной транзакцией; новое устройство сначала регистрируется"""
         try:
-            system_info = self.get_system_info()
-            systeminfo_data = system_info.data
-            if system_info.success is True:
+            result = DeviceRepository.apply_sync(state)
+            if result is None:
                 device_registry.register_device(
                     plugin_id=self.device.plugin_id,
-                    name=systeminfo_data.hostname,
-                    external_id=systeminfo_data.hostname,
-                    capabilities=systeminfo_data.capabilities,
-                    free_heap=systeminfo_data.heap.free,
-                    total_heap=systeminfo_data.heap.total
+                    name=state.name,
+                    external_id=state.external_id,
+                    capabilities=state.capabilities,
+                    free_heap=state.free_heap,
+                    total_heap=state.total_heap
                 )
-                if systeminfo_data.networks:
-                    for net in systeminfo_data.networks:
-                        ni = DeviceNetifBase(
-                            device_id=self.device.id,
-                            name=net.name,
-                            mac=net.mac,
-                            ip=net.ip,
-                            mask=net.mask,
-                            gw=net.gw,
-                            last_sync=datetime.now()
-                        )
-                        DeviceRepository.save_network_interface(ni)
-                Logger.debug(
-                    f'DeviceSynchronizer ({self.device.id}, {self.device.external_id}) finished register device',
-                    LoggerType.PLUGINS)
-                return True
-            return False
+                result = DeviceRepository.apply_sync(state)
+            if result is None:
+                return None
         except Exception as e:
             Logger.err(
-                f'DeviceSynchronizer ({self.device.id}, {self.device.external_id}) failed to register device: {e}',
+                f'DeviceSynchronizer ({self.device.id}, {self.device.external_id}) failed to sync device: {e}',
                 LoggerType.PLUGINS)
-            return False
-
-    def _update_or_create_sensor(
-            self,
-            identifier: str,
-            name: str,
-            capability: str,
-            stype: DeviceSensorTypeEnum,
-            active: bool = True,
-            value: Union[str | float | int | bool | None] = None,
-            options: dict[str, Any] = None
-    ):
-        try:
-            sensor = SensorRepository.get_sensor_by_device_and_identifier(
-                device_id=self.device.id,
-                identifier=identifier,
-            )
-            # Update sensor
-            if isinstance(sensor, SensorModelWithDevice):
-                model = SensorUpdateModel.model_validate(
-                    sensor.model_dump(exclude_none=True)
-                )
-                model.name = name
-                model.capability = capability
-                model.type = stype
-                model.active = active
-                model.last_sync = datetime.now()
-                model.options = options
-                if value is not None:
-                    model.value = value
-                return SensorRepository.update_sensor(model)
-            else:
-                model = SensorCreateModel(
-                    device_id=self.device.id,
-                    type=stype.value,
-                    capability=capability,
-                    identifier=identifier,
-                    active=active,
-                    name=name,
-                    last_sync=datetime.now(),
-                    visible_name=name,
-                    options=options,
-                    photo=None,
-                    unit=None,
-                    icon=None
-                )
-                if value is not None:
-                    model.value = str(value)
-                return SensorRepository.create_sensor(model)
-        except Exception as e:
-            print(e)
+            return None
 
-    def save_sensors(self):
-        caps = self.device.capabilities  # Список строк: ['ntc', 'onewire', ...]
+        Logger.debug(
+            f'DeviceSynchronizer ({result.device_id}, {state.external_id}) synced: '
+            f'{result.created} created, {len(result.updated)} updated, {result.interfaces} interfaces',
+            LoggerType.PLUGINS)
+        return result
 
-        for setting in SettingCapability:
-            # Проверяем строку в списке строк
-            if setting in caps:
-
-                # Сопоставляем строку со строкой
-                match setting:
-                    case SettingCapability.OUTPUTS:
-                        res = self.api.get_outputs_info()
-                        if not res.success:
-                            return
-                        for s in res.data.outputs:
-                            identifier = f'out{s.index}'
-                            self._update_or_create_sensor(
-                                identifier=identifier,
-                                name=s.label,
-                                capability=SettingCapability.OUTPUTS.value,
-                                stype=DeviceSensorTypeEnum.SWITCH,
-                                active=s.active,
-                                value=s.state,
-                                options={'index': s.index, 'port': s.port}
-                            )
-
-                        time.sleep(1)
-                    case SettingCapability.INPUTS:
-                        res = self.api.get_inputs_info()
-                        if not res.success:
-                            return
-                        for s in res.data.inputs:
-                            identifier = f'inp{s.index}'
-                            self._update_or_create_sensor(
-                                identifier=identifier,
-                                name=s.label,
-                                capability=SettingCapability.INPUTS.value,
-                                stype=DeviceSensorTypeEnum.INPUT,
-                                active=s.active,
-                                value=s.state,
-                                options={'index': s.index, 'port': s.port}
-                            )
-                        time.sleep(1)
-                    case SettingCapability.AI:
-                        res = self.api.get_adc_info()
-                        if not res.success:
-                            return
-                        for s in res.data.channels:
-                            identifier = f'ai{(s.id + 1)}'  # case starts from 0
-                            self._update_or_create_sensor(
-                                identifier=identifier,
-                                name=s.label,
-                                capability=SettingCapability.AI.value,
-                                stype=DeviceSensorTypeEnum.NUMBER,
-                                active=s.active,
-                                options={'id': s.id}
-                            )
-                        time.sleep(1)
-                    case SettingCapability.NTC:
-                        res = self.api.get_ntc_info()
-                        if not res.success:
-                            return
-                        for s in res.data.channels:
-                            identifier = f'ntc{(s.id + 1)}'
-                            self._update_or_create_sensor(
-                                identifier=identifier,
-                                name=s.label,
-                                capability=SettingCapability.NTC.value,
-                                stype=DeviceSensorTypeEnum.FLOAT,
-                                active=s.active,
-                                options={'id': s.id}
-                            )
-                        time.sleep(1)
-                    case SettingCapability.OPENCOLLECTORS:
-                        res = self.api.get_opencollectors_info()
-                        if not res.success:
-                            return
-                        for s in res.data.opencollectors:
-                            identifier = f'oc{(s.index + 1)}'
-                            self._update_or_create_sensor(
-                                identifier=identifier,
-                                name=s.label,
-                                capability=SettingCapability.OPENCOLLECTORS.value,
-                                stype=DeviceSensorTypeEnum.SWITCH,
-                                active=s.active,
-                                options={'index': s.index}
-                            )
-                        time.sleep(1)
-                    case SettingCapability.RF433:
-                        res = self.api.get_rf433_info()
-                        if not res.success:
-                            return
-                        for s in res.data.devices:
-                            identifier = s.serial
-                            self._update_or_create_sensor(
-                                identifier=identifier,
-                                name=s.label,
-                                capability=SettingCapability.RF433.value,
-                                stype=DeviceSensorTypeEnum.NUMBER,
-                                active=s.alarm,
-                                value=s.value,
-                                options=s.model_dump()
-                            )
-                        time.sleep(1)
+    @staticmethod
+    def push_values(state: DeviceSyncState, sensor_ids: dict[tuple[str, str], int]):
+        """Значения сенсоров идут через общий конвейер: неизменные отбрасываются там же"""
+        for item in state.sensors:
+            if item.value is None:
+                continue
+            sensor_id = sensor_ids.get((item.capability, item.identifier))
+            if sensor_id is not None:
+                SensorRepository.update_sensor_value(sensor_id, item.value)
@@ -0,0 +1,118 @@
+# Copyright (C) 2026 Mikhail Sazanov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Optional, Iterable, Coroutine
+
+from classes.logger.logger import logger
+from plugins.core.umni_devices.classes.device_rest_commands import DeviceRestCommands, SystemInfoData
+from plugins.core.umni_devices.models.mdns_models import MDNSDevice
+
+
+class MDNSProber:
+    """Асинхронная проверка устройств mDNS.
+
+    Работает в собственном потоке с event loop: колбэки Zeroconf и потоки плагина только ставят
+    задачи, проверки идут одновременно (не больше concurrency) и каждая ограничена timeout,
+    поэтому проверка N устройств занимает порядка одного таймаута, а не N.
+    """
+
+    def __init__(self, concurrency: int = 32, timeout: float = 3.0):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='MDNSProber')
+            self._thread.start()
+        self._ready.wait(timeout=5)
+
+    def stop(self):
+        with self._lock:
+            loop, thread = self.loop, self._thread
+            self._thread = None
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.loop = loop
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            # Незавершенные проверки отменяются вместе с loop
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.close()
+            self.loop = None
+
+    def submit(self, coro: Coroutine) -> Optional[Future]:
+        """Ставит корутину в loop проверок из любого потока"""
+        loop = self.loop
+        if loop is None or not loop.is_running():
+            coro.close()
+            return None
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    async def probe(self, ip: str) -> Optional[SystemInfoData]:
+        """Системная информация устройства или None, если оно не ответило за timeout"""
+        async with self._slots:
+            try:
+                client = DeviceRestCommands(
+                    ip_address=ip,
+                    timeout=self.timeout,
+                    protocol='http'
+                )
+                result = await asyncio.wait_for(client.aget_system_info(), timeout=self.timeout)
+                return result.data if result.success else None
+            except Exception as e:
+                logger.debug(f"Device {ip} is OFFLINE: {e}")
+                return None
+
+    async def _probe_all(self, devices: list[MDNSDevice]) -> dict[str, Optional[SystemInfoData]]:
+        results = await asyncio.gather(*(self.probe(device.ip) for device in devices))
+        return {device.unique_id: result for device, result in zip(devices, results)}
+
+    def probe_many(self, devices: Iterable[MDNSDevice]) -> dict[str, Optional[SystemInfoData]]:
+        """Синхронная одновременная проверка устройств: unique_id -> системная информация или None"""
+        devices = list(devices)
+        if not devices:
+            return {}
+        future = self.submit(self._probe_all(devices))
+        if future is None:
+            return {device.unique_id: None for device in devices}
+        # Запас на ожидание свободного слота при числе устройств больше concurrency
+        batches = (len(devices) + self.concurrency - 1) // self.concurrency
+        try:
+            return future.result(timeout=self.timeout * batches + 1)
+        except Exception as e:
+            future.cancel()
+            logger.error(f"mDNS probe failed: {e}")
+            return {device.unique_id: None for device in devices}
@@ -1,27 +1,44 @@
 # mds_scanner.py
+import asyncio
 import socket
-from typing import Any, Optional, List, Callable
+import threading
+from typing import Any, Optional, List, Callable, Dict
 from datetime import datetime
 from zeroconf import ServiceBrowser, ServiceListener, Zeroconf
+from zeroconf.asyncio import AsyncServiceInfo
 
 from classes.logger.logger import logger
+from plugins.core.umni_devices.classes.device_rest_commands import SystemInfoData
+from plugins.core.umni_devices.classes.mdns_prober import MDNSProber
 from plugins.core.umni_devices.models.mdns_models import MDNSScanResult, MDNSDevice
-from plugins.core.umni_devices.classes.device_rest_commands import DeviceRestCommands
 
 
 class MDNSScanner(ServiceListener):
-    """Сканер mDNS с проверкой доступности через REST API"""
+    """Сканер mDNS с проверкой доступности через REST API.
 
-    def __init__(self, service_type: str = "_umni_api._tcp.local."):
+    Колбэки Zeroconf только ставят сервис в очередь: разрешение записи, проверка через REST
+    и обновление таблицы устройств выполняются в MDNSProber одновременно для всех сервисов.
+    """
+
+    # Таймаут ожидания записей сервиса, если их нет в кэше Zeroconf (мс)
+    resolve_timeout: int = 3000
+
+    def __init__(self, service_type: str = "_umni_api._tcp.local.", prober: Optional[MDNSProber] = None):
         self.service_type = service_type
         self.scan_result = MDNSScanResult()
         self.logger = logger
+        self.prober = prober or MDNSProber()
+        self._lock = threading.RLock()
+        # Сервисы в обработке: имя -> нужно ли повторить после текущей проверки
+        self._pending: Dict[str, bool] = {}
+        # Системная информация последней успешной проверки: unique_id -> данные
+        self._system_info: Dict[str, SystemInfoData] = {}
 
         # ServiceBrowser будет запущен один раз
         self._browser: Optional[ServiceBrowser] = None
         self._is_running = False
 
-        # Колбэки для событий
+        # Колбэки для событий (вызываются вне потока Zeroconf и loop проверок)
         self.on_device_added: Optional[Callable[[MDNSDevice], None]] = None
         self.on_device_removed: Optional[Callable[[str], None]] = None
         self.on_device_updated: Optional[Callable[[MDNSDevice, MDNSDevice], None]] = None
@@ -33,6 +50,7 @@ class MDNSScanner(ServiceListener):
             self.logger.warning("ServiceBrowser already running")
             return
 
+        self.prober.start()
         self._browser = ServiceBrowser(zeroconf, self.service_type, self)
         self._is_running = True
         self.logger.debug(f"ServiceBrowser started for {self.service_type}")
@@ -44,47 +62,23 @@ class MDNSScanner(ServiceListener):
             self._browser = None
             self._is_running = False
             self.logger.debug("ServiceBrowser stopped")
+        self.prober.stop()
 
     def add_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        """Обработчик добавления нового сервиса"""
+        """Обработчик добавления нового сервиса: только ставит его в очередь проверки"""
         if type_ != self.service_type:
             return
 
-        try:
-            info = zc.get_service_info(type_, name)
-            if not info:
-                return
-
-            device_data = self._parse_service_info(info, type_, name)
-            if not device_data:
+        with self._lock:
+            if name in self._pending:
+                # Сервис уже проверяется - повторим после, с новыми данными
+                self._pending[name] = True
                 return
+            self._pending[name] = False
 
-            # Проверяем доступность устройства через REST API
-            if self._check_device_online(device_data):
-                device_data.update_timestamp()
-                existing_device = self.scan_result.get_device(device_data.unique_id)
-
-                if existing_device:
-                    old_device = existing_device.model_copy()
-                    device_data.first_seen = existing_device.first_seen
-                    self.scan_result.add_device(device_data)
-
-                    self.logger.debug(f"Device UPDATE: {device_data.name} -> {device_data.ip}:{device_data.port}")
-                    if self.on_device_updated:
-                        self.on_device_updated(old_device, device_data)
-                else:
-                    self.scan_result.add_device(device_data)
-                    self.logger.debug(
-                        f"Device ONLINE: {device_data.name} ({device_data.unique_id}) -> {device_data.ip}:{device_data.port}")
-
-                    if self.on_device_added:
-                        self.on_device_added(device_data)
-            else:
-                self.logger.debug(f"Device {device_data.name} ({device_data.ip}) not reachable via HTTP")
-
-        except Exception as e:
-            self.logger.error(f"Error add device {name}: {e}")
-            self.scan_result.errors.append(f"Error add device {name}: {str(e)}")
+        if self.prober.submit(self._discover(zc, type_, name)) is None:
+            with self._lock:
+                self._pending.pop(name, None)
 
     def update_service(self, zc: Zeroconf, type_: str, name: str) -> None:
         """Обработчик обновления сервиса"""
@@ -98,20 +92,76 @@ class MDNSScanner(ServiceListener):
             return
 
         try:
-            for device in self.scan_result.devices:
-                if device.service_name == name:
-                    unique_id = device.unique_id
-                    self.scan_result.remove_device(unique_id)
-                    self.logger.debug(f"Device REMOVED: {device.name} ({unique_id})")
+            with self._lock:
+                device = self.scan_result.get_device_by_service(name)
+                if device is None:
+                    return
+                self.scan_result.remove_device(device.unique_id)
+                self._system_info.pop(device.unique_id, None)
+            self.logger.debug(f"Device REMOVED: {device.name} ({device.unique_id})")
 
-                    if self.on_device_removed:
-                        self.on_device_removed(unique_id)
-                    break
+            if self.on_device_removed:
+                self.on_device_removed(device.unique_id)
 
         except Exception as e:
             self.logger.error(f"Error deleting device {name}: {e}")
             self.scan_result.errors.append(f"Error deleting device {name}: {str(e)}")
 
+    async def _discover(self, zc: Zeroconf, type_: str, name: str):
+        """Обработка сервиса в loop проверок; повторяется, если пока шла проверка пришло обновление"""
+        rerun = True
+        while rerun:
+            try:
+                await self._discover_once(zc, type_, name)
+            except Exception as e:
+                self.logger.error(f"Error add device {name}: {e}")
+                self.scan_result.errors.append(f"Error add device {name}: {str(e)}")
+            with self._lock:
+                rerun = self._pending.get(name, False)
+                if rerun:
+                    self._pending[name] = False
+                else:
+                    self._pending.pop(name, None)
+
+    async def _discover_once(self, zc: Zeroconf, type_: str, name: str):
+        info = AsyncServiceInfo(type_, name)
+        if not info.load_from_cache(zc):
+            # Запрос записей выполняется в loop Zeroconf, здесь только ожидание
+            found = await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(info.async_request(zc, self.resolve_timeout), zc.loop)
+            )
+            if not found:
+                return
+
+        device_data = self._parse_service_info(info, type_, name)
+        if not device_data:
+            return
+
+        # Проверяем доступность устройства через REST API
+        system_info = await self.prober.probe(device_data.ip)
+        if system_info is None:
+            self.logger.debug(f"Device {device_data.name} ({device_data.ip}) not reachable via HTTP")
+            return
+
+        device_data.update_timestamp()
+        with self._lock:
+            existing_device = self.scan_result.get_device(device_data.unique_id)
+            old_device = existing_device.model_copy() if existing_device else None
+            self.scan_result.add_device(device_data)
+            self._system_info[device_data.unique_id] = system_info
+
+        loop = asyncio.get_running_loop()
+        if old_device is not None:
+            self.logger.debug(f"Device UPDATE: {device_data.name} -> {device_data.ip}:{device_data.port}")
+            if self.on_device_updated:
+                await loop.run_in_executor(None, self.on_device_updated, old_device, device_data)
+        else:
+            self.logger.debug(
+                f"Device ONLINE: {device_data.name} ({device_data.unique_id}) -> {device_data.ip}:{device_data.port}")
+            if self.on_device_added:
+                # Колбэк может писать в БД - не занимаем loop проверок
+                await loop.run_in_executor(None, self.on_device_added, device_data)
+
     def _parse_service_info(self, info: Any, type_: str, name: str) -> Optional[MDNSDevice]:
         """Парсит информацию о сервисе в модель MDNSDevice"""
         try:
@@ -144,91 +194,98 @@ class MDNSScanner(ServiceListener):
             self.logger.error(f"Error parsing service {name}: {e}")
             return None
 
+    def probe_devices(self, devices: List[MDNSDevice]) -> Dict[str, Optional[SystemInfoData]]:
+        """Одновременная проверка устройств через REST API: unique_id -> системная информация или None"""
+        results = self.prober.probe_many(devices)
+        with self._lock:
+            for device in devices:
+                system_info = results.get(device.unique_id)
+                if system_info is not None:
+                    device.update_timestamp()
+                    self._system_info[device.unique_id] = system_info
+        return results
+
     def _check_device_online(self, device: MDNSDevice) -> bool:
         """Проверяет доступность устройства через REST API"""
-        try:
-            # Создаем клиент для REST API
-            client = DeviceRestCommands(
-                ip_address=device.ip,
-                timeout=3,
-                protocol='http'
-            )
-
-            # Пробуем получить системную информацию
-            result = client.get_system_info()
-
-            # Проверяем, что ответ успешный
-            return result.success
-
-        except Exception as e:
-            self.logger.debug(f"Device {device.name} ({device.ip}) is OFFLINE: {e}")
-            return False
+        return self.probe_devices([device]).get(device.unique_id) is not None
 
     # ========== Публичные методы ==========
 
     def get_devices(self) -> List[MDNSDevice]:
         """Возвращает список всех устройств"""
-        return self.scan_result.devices.copy()
+        with self._lock:
+            return self.scan_result.all_devices()
 
     def get_device_by_unique_id(self, unique_id: str) -> Optional[MDNSDevice]:
         """Возвращает устройство по unique_id"""
-        return self.scan_result.get_device(unique_id)
+        with self._lock:
+            return self.scan_result.get_device(unique_id)
 
     def get_devices_by_ip(self, ip: str) -> List[MDNSDevice]:
         """Возвращает устройства по IP"""
-        return self.scan_result.get_devices_by_ip(ip)
+        with self._lock:
+            return self.scan_result.get_devices_by_ip(ip)
+
+    def get_system_info(self, unique_id: str) -> Optional[SystemInfoData]:
+        """Системная информация последней успешной проверки устройства"""
+        with self._lock:
+            return self._system_info.get(unique_id)
+
+    def add_device(self, device: MDNSDevice):
+        """Добавляет устройство в таблицу (например, восстановленное из БД)"""
+        with self._lock:
+            self.scan_result.add_device(device)
 
     def get_online_devices(self) -> List[MDNSDevice]:
         """Возвращает онлайн устройства (проверяет через HTTP)"""
-        online_devices = []
-        for device in self.scan_result.devices:
-            if self._check_device_online(device):
-                device.update_timestamp()
-                online_devices.append(device)
-        return online_devices
+        devices = self.get_devices()
+        results = self.probe_devices(devices)
+        return [device for device in devices if results.get(device.unique_id) is not None]
 
     def get_offline_devices(self) -> List[MDNSDevice]:
         """Возвращает оффлайн устройства"""
-        offline_devices = []
-        for device in self.scan_result.devices:
-            if not self._check_device_online(device):
-                offline_devices.append(device)
-        return offline_devices
+        devices = self.get_devices()
+        results = self.probe_devices(devices)
+        return [device for device in devices if results.get(device.unique_id) is None]
 
     def cleanup_stale_devices(self, timeout_seconds: int = 60):
         """Удаляет устройства, которые не отвечают дольше timeout_seconds"""
         removed = []
-        for device in self.scan_result.devices[:]:  # копия списка
-            if not self._check_device_online(device):
-                # Проверяем, сколько времени устройство оффлайн
-                if (datetime.now() - device.last_seen).total_seconds() > timeout_seconds:
+        devices = self.get_devices()
+        results = self.probe_devices(devices)
+        for device in devices:
+            if results.get(device.unique_id) is not None:
+                continue
+            # Проверяем, сколько времени устройство оффлайн
+            if (datetime.now() - device.last_seen).total_seconds() > timeout_seconds:
+                with self._lock:
                     self.scan_result.remove_device(device.unique_id)
-                    removed.append(device.unique_id)
-                    self.logger.debug(f"Device cleaned (stale): {device.name}")
-                    if self.on_device_removed:
-                        self.on_device_removed(device.unique_id)
+                    self._system_info.pop(device.unique_id, None)
+                removed.append(device.unique_id)
+                self.logger.debug(f"Device cleaned (stale): {device.name}")
+                if self.on_device_removed:
+                    self.on_device_removed(device.unique_id)
         return removed
 
     def clear_devices(self):
         """Очищает список устройств"""
-        self.scan_result = MDNSScanResult()
+        with self._lock:
+            self.scan_result = MDNSScanResult()
+            self._system_info.clear()
         self.logger.debug("Devices cleared")
 
     def update_status(self) -> MDNSScanResult:
-        """Обновляет статус всех устройств"""
-        online = 0
-        offline = 0
-
-        for device in self.scan_result.devices:
-            if self._check_device_online(device):
-                device.update_timestamp()
-                online += 1
-            else:
-                offline += 1
+        """Обновляет статус всех устройств (одновременно)"""
+        devices = self.get_devices()
+        results = self.probe_devices(devices)
+        online = sum(1 for result in results.values() if result is not None)
+        offline = len(devices) - online
 
-        self.scan_result.scan_finished = datetime.now()
-        self.scan_result.total_count = len(self.scan_result.devices)
+        with self._lock:
+            self.scan_result.scan_finished = datetime.now()
+            self.scan_result.total_count = len(self.scan_result.devices)
+            snapshot = self.scan_result.model_copy(deep=True)
 
-        self.logger.debug(f"Status: Online={online}, Offline={offline}, Total={self.scan_result.total_count}")
+        self.logger.debug(f"Status: Online={online}, Offline={offline}, Total={snapshot.total_count}")
 
-        return self.scan_result.model_copy()
+        return snapshot
@@ -1,3 +1,5 @@
+import queue
+import select
 import socket
 import threading
 import json
@@ -34,9 +36,24 @@ class SyslogMessage:
 
 
 class SyslogListener:
-    """Простой syslog слушатель на UDP"""
-
-    def __init__(self, host: str = '0.0.0.0', port: int = 514):
+    """Syslog слушатель на UDP.
+
+    Поток приема вычитывает сокет пачками и разбирает каждое сообщение один раз.
+    Обработчики выполняются в пуле воркеров: сообщения одного устройства всегда попадают
+    в одну ограниченную очередь, поэтому порядок по устройству сохраняется,
+    а медленный обработчик не останавливает прием.
+    """
+
+    def __init__(
+            self,
+            host: str = '0.0.0.0',
+            port: int = 514,
+            workers: int = 4,
+            queue_size: int = 1000,
+            burst_size: int = 256,
+            buffer_size: int = 4096,
+            receive_buffer: int = 1024 * 1024
+    ):
         self.host = host
         self.port = port
         self.socket = None
@@ -44,6 +61,23 @@ class SyslogListener:
         self.thread = None
         self.handlers = []
 
+        self.workers_count = max(1, workers)
+        self.queue_size = queue_size
+        self.burst_size = burst_size
+        self.buffer_size = buffer_size
+        self.receive_buffer = receive_buffer
+        self.queues: list[queue.Queue] = []
+        self.workers: list[threading.Thread] = []
+
+        # Счетчики
+        self.stats_lock = threading.Lock()
+        self.received: int = 0
+        self.parsed: int = 0
+        self.invalid: int = 0
+        self.dropped: int = 0
+        self.handled: int = 0
+        self.handler_errors: int = 0
+
     def start(self):
         """Запуск слушателя"""
         if self.running:
@@ -53,10 +87,25 @@ class SyslogListener:
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                # Запас ядра на время, пока поток приема занят
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer)
+            except OSError:
+                pass
             self.socket.bind((self.host, self.port))
+            # Сокет неблокирующий: ожидание пакетов - через select, затем вычитывание пачки
+            self.socket.setblocking(False)
             self.running = True
 
-            self.thread = threading.Thread(target=self._listen, daemon=True)
+            self.queues = [queue.Queue(maxsize=self.queue_size) for _ in range(self.workers_count)]
+            self.workers = [
+                threading.Thread(target=self._work, args=(q,), daemon=True, name=f"SyslogWorker-{i}")
+                for i, q in enumerate(self.queues)
+            ]
+            for worker in self.workers:
+                worker.start()
+
+            self.thread = threading.Thread(target=self._listen, daemon=True, name="SyslogListener")
             self.thread.start()
 
             Logger.debug(f"The Syslog listener is running on {self.host}:{self.port}", LoggerType.PLUGINS)
@@ -77,6 +126,17 @@ class SyslogListener:
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=1)
 
+        # Воркеры дорабатывают уже принятые сообщения и завершаются
+        for q in self.queues:
+            try:
+                q.put(None, timeout=1)
+            except queue.Full:
+                pass
+        for worker in self.workers:
+            worker.join(timeout=1)
+        self.queues = []
+        self.workers = []
+
         Logger.debug("Syslog listener stopped", LoggerType.PLUGINS)
 
     def restart(self):
@@ -99,8 +159,7 @@ class SyslogListener:
             if not validated:
                 return None
 
-            device, topic, json_str = validated
-            data_dict = json.loads(json_str)
+            device, topic, data_dict = validated
 
             try:
                 identifier = Capability(data_dict['identifier']).value
@@ -130,7 +189,7 @@ class SyslogListener:
     def _validate_message(self, raw: str) -> Optional[tuple]:
         """
         Валидация сообщения.
-        Возвращает (device, topic, json_str) или None
+        Возвращает (device, topic, data_dict) или None
         """
         try:
             # Убираем syslog префикс типа <14> если есть
@@ -160,10 +219,12 @@ class SyslogListener:
             device = dt_parts[0]
             topic = dt_parts[1]
 
-            # Проверяем JSON
-            json.loads(json_str)
+            # JSON разбирается один раз
+            data_dict = json.loads(json_str)
+            if not isinstance(data_dict, dict):
+                return None
 
-            return device, topic, json_str
+            return device, topic, data_dict
 
         except (json.JSONDecodeError, ValueError, IndexError):
             return None
@@ -174,35 +235,86 @@ class SyslogListener:
             try:
                 handler(message)
             except Exception as e:
+                with self.stats_lock:
+                    self.handler_errors += 1
                 Logger.err(f"Error in the handler: {e}", LoggerType.PLUGINS)
 
+    def _enqueue(self, message: SyslogMessage):
+        """Очередь воркера выбирается по устройству - порядок сообщений устройства сохраняется"""
+        q = self.queues[hash(message.device_name) % len(self.queues)]
+        try:
+            q.put_nowait(message)
+        except queue.Full:
+            with self.stats_lock:
+                self.dropped += 1
+
+    def _work(self, q: queue.Queue):
+        """Воркер: выполняет обработчики для сообщений своей очереди"""
+        while True:
+            message = q.get()
+            if message is None:
+                break
+            self._dispatch_message(message)
+            with self.stats_lock:
+                self.handled += 1
+
+    def _receive_burst(self, timeout: float = 0.5) -> list[tuple[bytes, tuple]]:
+        """Ждет пакеты не дольше timeout, затем без ожидания вычитывает то, что уже есть в сокете"""
+        readable, _, _ = select.select([self.socket], [], [], timeout)
+        packets = []
+        if not readable:
+            return packets
+        while len(packets) < self.burst_size:
+            try:
+                packets.append(self.socket.recvfrom(self.buffer_size))
+            except BlockingIOError:
+                break
+        return packets
+
     def _listen(self):
         """Основной цикл прослушивания"""
         Logger.debug("We start listening to syslog messages...", LoggerType.PLUGINS)
 
         while self.running:
             try:
-                self.socket.settimeout(0.5)
-                data, addr = self.socket.recvfrom(4096)
+                packets = self._receive_burst()
+            except Exception as e:
+                if self.running:
+                    Logger.err(f"Receive error: {e}", LoggerType.PLUGINS)
+                continue
 
+            if not packets:
+                continue
+
+            parsed = 0
+            for data, addr in packets:
                 message = self._parse_message(data, addr)
                 if message:
-                    self._dispatch_message(message)
+                    parsed += 1
+                    self._enqueue(message)
 
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if self.running:
-                    Logger.err(f"Receive error: {e}", LoggerType.PLUGINS)
+            with self.stats_lock:
+                self.received += len(packets)
+                self.parsed += parsed
+                self.invalid += len(packets) - parsed
 
     def get_status(self) -> dict:
         """Получение статуса слушателя"""
-        return {
-            'running': self.running,
-            'host': self.host,
-            'port': self.port,
-            'handlers_count': len(self.handlers)
-        }
+        with self.stats_lock:
+            return {
+                'running': self.running,
+                'host': self.host,
+                'port': self.port,
+                'handlers_count': len(self.handlers),
+                'workers': len(self.workers),
+                'received': self.received,
+                'parsed': self.parsed,
+                'invalid': self.invalid,
+                'dropped': self.dropped,
+                'handled': self.handled,
+                'handler_errors': self.handler_errors,
+                'queue_depth': sum(q.qsize() for q in self.queues),
+            }
 
 # ========== Пример использования ==========
 #
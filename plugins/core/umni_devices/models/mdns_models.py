@@ -14,7 +14,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from datetime import datetime
 
 
@@ -55,37 +55,48 @@ class MDNSDevice(BaseModel):
 
 
 class MDNSScanResult(BaseModel):
-    """Результат сканирования"""
-    devices: List[MDNSDevice] = Field(default_factory=list)
+    """Результат сканирования: таблица устройств по unique_id"""
+    devices: Dict[str, MDNSDevice] = Field(default_factory=dict)
     total_count: int = 0
     scan_started: datetime = Field(default_factory=datetime.now)
     scan_finished: Optional[datetime] = None
     errors: List[str] = Field(default_factory=list)
+    # Полное имя сервиса mDNS -> unique_id
+    _services: Dict[str, str] = PrivateAttr(default_factory=dict)
 
     def add_device(self, device: MDNSDevice):
         """Добавляет или обновляет устройство"""
-        for i, existing in enumerate(self.devices):
-            if existing.unique_id == device.unique_id:
-                device.first_seen = existing.first_seen
-                self.devices[i] = device
-                return
-        self.devices.append(device)
+        existing = self.devices.get(device.unique_id)
+        if existing is not None:
+            device.first_seen = existing.first_seen
+            if existing.service_name != device.service_name:
+                self._services.pop(existing.service_name, None)
+        self.devices[device.unique_id] = device
+        self._services[device.service_name] = device.unique_id
         self.total_count = len(self.devices)
 
     def remove_device(self, unique_id: str) -> bool:
         """Удаляет устройство по ID"""
-        original_count = len(self.devices)
-        self.devices = [d for d in self.devices if d.unique_id != unique_id]
+        device = self.devices.pop(unique_id, None)
+        if device is None:
+            return False
+        if self._services.get(device.service_name) == unique_id:
+            del self._services[device.service_name]
         self.total_count = len(self.devices)
-        return len(self.devices) < original_count
+        return True
 
     def get_device(self, unique_id: str) -> Optional[MDNSDevice]:
         """Получает устройство по ID"""
-        for device in self.devices:
-            if device.unique_id == unique_id:
-                return device
-        return None
+        return self.devices.get(unique_id)
+
+    def get_device_by_service(self, service_name: str) -> Optional[MDNSDevice]:
+        """Получает устройство по полному имени сервиса mDNS"""
+        unique_id = self._services.get(service_name)
+        return self.devices.get(unique_id) if unique_id is not None else None
 
     def get_devices_by_ip(self, ip: str) -> List[MDNSDevice]:
         """Получает устройства по IP"""
-        return [d for d in self.devices if d.ip == ip]
+        return [d for d in self.devices.values() if d.ip == ip]
+
+    def all_devices(self) -> List[MDNSDevice]:
+        return list(self.devices.values())
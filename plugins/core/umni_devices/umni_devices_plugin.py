@@ -1,4 +1,3 @@
-import socket
 import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
@@ -15,6 +14,7 @@ from models.device_scan_model import DeviceScanModelNetwork, DeviceScanModel
 from models.plugin_model import PluginModel
 from models.sensor_model import SensorModelWithDevice
 from plugins.base_plugin import BasePlugin, BasePluginConfig
+from plugins.core.umni_devices.classes.device_liveness import DeviceLivenessTracker
 from plugins.core.umni_devices.classes.device_rest_commands import DeviceRestCommands, Capability, PortOptionBase
 from plugins.core.umni_devices.classes.device_synchronizer import DeviceSynchronizer
 from plugins.core.umni_devices.classes.mds_scanner import MDNSScanner
@@ -49,17 +49,34 @@ class UmniDevicesPlugin(BasePlugin):
 
     def __init__(self, plugin_model: 'PluginModel'):
         super().__init__(plugin_model)
-        self.chunk_size = 20
         self._stop_event = threading.Event()
         self._health_thread = None
-        self._executor = ThreadPoolExecutor(max_workers=20)
+        # Пул только для синхронизации устройств, проверки доступности его не занимают
+        self._executor = ThreadPoolExecutor(max_workers=4)
+        # Шаг цикла проверки доступности (сек)
+        self._tick_interval = 1.0
 
-        # Кэш для отслеживания последней синхронизации
-        self._last_sync_cache: Dict[int, datetime] = {}
+        # Кэш для отслеживания последней синхронизации: external_id -> time.monotonic()
+        self._last_sync_cache: Dict[str, float] = {}
         self._sync_interval = 300  # 5 минут
+        self._syncing: set[str] = set()
+        self._sync_lock = threading.Lock()
+        # Устройства плагина из БД: external_id -> модель; перечитываются раз в offline_timeout
+        self._devices: Dict[str, DeviceModelWithRelations] = {}
+        self._devices_loaded: float = 0.0
+
+        self.liveness = DeviceLivenessTracker(
+            resolve=self._resolve_address,
+            apply_status=self.manager.registry.set_status_many,
+            silence_timeout=self.config.health_check_interval,
+            max_backoff=self.config.offline_timeout
+        )
 
         self.zeroconf = Zeroconf()
         self.scanner = MDNSScanner(self.config.service_type)
+        self.scanner.on_device_added = self._on_device_announced
+        self.scanner.on_device_updated = self._on_device_updated
+        self.scanner.on_device_removed = self._on_device_removed
         self.scanner.start(self.zeroconf)
 
     def run_syslog(self):
@@ -69,6 +86,8 @@ class UmniDevicesPlugin(BasePlugin):
         )
 
         def new_syslog_message(msg: SyslogMessage):
+            # Любое сообщение syslog - признак жизни устройства
+            self.liveness.heartbeat(msg.device_name)
             device = self.get_device(msg.device_name)
             identifier = msg.data.identifier
             value = msg.data.value
@@ -91,7 +110,10 @@ class UmniDevicesPlugin(BasePlugin):
 
         self._sync_devices_from_db()
 
-        self.scanner.update_status()
+        # Все устройства проверяются одновременно, один раз
+        started = datetime.now()
+        status = self.scanner.update_status()
+        online = sum(1 for device in status.devices.values() if device.last_seen >= started)
 
         self._start_health_check()
 
@@ -99,9 +121,10 @@ class UmniDevicesPlugin(BasePlugin):
 
         return {
             "status": "running",
-            "total_devices": len(self.scanner.get_devices()),
-            "online": len(self.scanner.get_online_devices()),
-            "offline": len(self.scanner.get_offline_devices())
+            "total_devices": status.total_count,
+            "online": online,
+            "offline": status.total_count - online,
+            "liveness": self.liveness.get_status()
         }
 
     def on_stop(self):
@@ -130,17 +153,14 @@ class UmniDevicesPlugin(BasePlugin):
         """
         devices = []
 
-        for mdns_device in self.scanner.get_devices():
-            # Проверяем доступность
-            if not self._check_port(
-                    ip=mdns_device.ip,
-                    port=mdns_device.port
-            ):
-                continue
+        # Проверяем доступность и получаем системную информацию всех устройств одновременно
+        mdns_devices = self.scanner.get_devices()
+        results = self.scanner.probe_devices(mdns_devices)
 
-            # Получаем системную информацию
-            controller = DeviceRestCommands(mdns_device.ip)
-            sys_info = controller.get_system_info()
+        for mdns_device in mdns_devices:
+            system_info = results.get(mdns_device.unique_id)
+            if system_info is None:
+                continue
 
             # Формируем модель устройства
             device = DeviceScanModel(
@@ -156,23 +176,22 @@ class UmniDevicesPlugin(BasePlugin):
                 }
             )
 
-            # Добавляем capabilities если есть
-            if sys_info.success and sys_info.data:
-                device.capabilities = [cap.value for cap in sys_info.data.capabilities]
-
-                # Добавляем сетевую информацию
-                device.networks = []
-                for net in sys_info.data.networks:
-                    device.networks.append(
-                        DeviceScanModelNetwork(
-                            device_id=mdns_device.unique_id,
-                            name=net.name,
-                            mac=net.mac,
-                            ip=net.ip,
-                            mask=net.mask,
-                            gw=net.gw
-                        )
+            # Добавляем capabilities
+            device.capabilities = [cap.value for cap in system_info.capabilities]
+
+            # Добавляем сетевую информацию
+            device.networks = []
+            for net in system_info.networks:
+                device.networks.append(
+                    DeviceScanModelNetwork(
+                        device_id=mdns_device.unique_id,
+                        name=net.name,
+                        mac=net.mac,
+                        ip=net.ip,
+                        mask=net.mask,
+                        gw=net.gw
                     )
+                )
 
             devices.append(device)
             Logger.info(f"Scanned device: {mdns_device.name} ({mdns_device.ip})")
@@ -258,7 +277,7 @@ class UmniDevicesPlugin(BasePlugin):
                     )
 
                     # Добавляем в сканер
-                    self.scanner.scan_result.add_device(mdns_device)
+                    self.scanner.add_device(mdns_device)
                     Logger.debug(f"Restored device from DB: {device.name} ({device.external_id})")
 
         except Exception as e:
@@ -290,115 +309,89 @@ class UmniDevicesPlugin(BasePlugin):
         Logger.debug("Health check stopped")
 
     def _health_check_worker(self):
-        """Рабочий поток для проверки статуса устройств"""
+        """Рабочий поток проверки статуса устройств.
+        Проверяются только замолчавшие устройства (см. DeviceLivenessTracker),
+        список устройств из БД перечитывается раз в offline_timeout.
+        """
         while not self._stop_event.is_set():
             try:
-                # Проверяем, не завершается ли интерпретатор
-                if self._executor._shutdown:
-                    Logger.debug("Executor shut down, exiting health check")
-                    break
-
-                # Восстанавливаем в сканер устройства, зарегистрированные через
-                # REST после старта плагина (раньше это делалось только в execute()).
-                self._sync_devices_from_db()
-
-                devices = self.get_plugin_devices()
-                self._check_devices_parallel(devices)
-
-                # Используем wait с таймаутом
-                self._stop_event.wait(self.config.health_check_interval)
+                if time.monotonic() - self._devices_loaded >= self.config.offline_timeout:
+                    # Восстанавливаем в сканер устройства, зарегистрированные через
+                    # REST после старта плагина (раньше это делалось только в execute()).
+                    self._sync_devices_from_db()
+                    self._load_devices()
+
+                online, offline = self.liveness.tick()
+                for external_id in offline:
+                    Logger.warn(f'[{external_id}] Device OFFLINE (no heartbeat, probe failed)', LoggerType.PLUGINS)
+                for external_id in online:
+                    Logger.debug(f'[{external_id}] Device ONLINE', LoggerType.PLUGINS)
+                    # После возврата в сеть - полная синхронизация
+                    self._last_sync_cache.pop(external_id, None)
+
+                self._schedule_syncs()
+                self._stop_event.wait(self._tick_interval)
 
             except RuntimeError as e:
                 if "interpreter shutdown" in str(e) or "cannot schedule new futures" in str(e):
                     Logger.debug("Interpreter shutdown detected, exiting")
                     break
                 Logger.err(f"Error in health check: {e}", LoggerType.PLUGINS)
-                time.sleep(self.config.health_check_interval)
+                self._stop_event.wait(self.config.health_check_interval)
             except Exception as e:
                 Logger.err(f"Error in health check: {e}", LoggerType.PLUGINS)
-                time.sleep(self.config.health_check_interval)
+                self._stop_event.wait(self.config.health_check_interval)
 
         Logger.debug("Health check worker stopped")
 
-    def _check_devices_parallel(self, devices: List[DeviceModelWithRelations]):
-        """Параллельная проверка устройств"""
-        # Проверяем, что executor еще работает
-        if not self._executor or self._executor._shutdown:
-            Logger.debug("Executor is shut down, skipping check")
-            return
-
-        chunk_size = self.chunk_size
-        chunks = [devices[i:i + chunk_size] for i in range(0, len(devices), chunk_size)]
-
-        for chunk in chunks:
-            # Проверяем stop_event
-            if self._stop_event.is_set():
-                Logger.debug("Stop event set, canceling checks")
-                return
-
-            futures = []
-            for device in chunk:
-                if self._stop_event.is_set():
-                    break
-                try:
-                    future = self._executor.submit(self._check_single_device, device)
-                    futures.append(future)
-                except RuntimeError as e:
-                    if "cannot schedule new futures" in str(e):
-                        Logger.debug("Cannot submit task (interpreter shutting down)")
-                        return
-                    raise
-
-            for future in futures:
-                if self._stop_event.is_set():
-                    break
-                try:
-                    future.result(timeout=10)
-                except Exception as e:
-                    Logger.debug(f"Device check error: {e}")
-
-    def _check_single_device(self, device: DeviceModelWithRelations):
-        mdns_device = self.scanner.get_device_by_unique_id(device.external_id)
-        # TODO make retries
-        if not mdns_device:
-            if device.online:
-                self.manager.registry.set_offline(device.external_id)
-                Logger.err(
-                    f'[ID{device.id}, {device.external_id}] Failed to check (not found in mdns scanner repository)',
-                    LoggerType.PLUGINS)
-            return
-
-        if not self._check_port(
-                ip=mdns_device.ip,
-                port=mdns_device.port
-        ):
-            if device.online:
-                self.manager.registry.set_offline(device.external_id)
-                Logger.err(f'[ID{device.id}, {device.external_id}] Failed to check (telnet error)', LoggerType.PLUGINS)
+    def _load_devices(self):
+        """Перечитывает устройства плагина и ставит новые под наблюдение"""
+        devices = self.get_plugin_devices() or []
+        self._devices = {device.external_id: device for device in devices}
+        self._devices_loaded = time.monotonic()
+        for device in devices:
+            self.liveness.track(device.external_id, bool(device.online))
+        for external_id in set(self.liveness.devices) - set(self._devices):
+            self.liveness.untrack(external_id)
+
+    def _resolve_address(self, external_id: str) -> Optional[tuple[str, int]]:
+        mdns_device = self.scanner.get_device_by_unique_id(external_id)
+        if mdns_device is None:
+            return None
+        return mdns_device.ip, mdns_device.port
+
+    def _schedule_syncs(self):
+        """Запускает синхронизацию онлайн-устройств не чаще _sync_interval"""
+        if self._executor._shutdown:
             return
-
-        Logger.debug(f'[ID{device.id}, {device.external_id}] Successfully checked by telnet', LoggerType.PLUGINS)
-        # TODO event_bus.publish(EventType.DEVICE_PING_OK, device=device)
-
-        # TODO other checks
-
-        saver = DeviceSynchronizer(
-            mdns_info=mdns_device,
-            device=device
-        )
-
-        saver.sync_device()
-
-    def _check_port(self, ip: str, port: int, timeout: float = 1.5) -> bool:
-        """Быстрая проверка порта (telnet)"""
+        now = time.monotonic()
+        for external_id in self.liveness.online_ids():
+            last = self._last_sync_cache.get(external_id)
+            if last is not None and now - last < self._sync_interval:
+                continue
+            device = self._devices.get(external_id)
+            mdns_device = self.scanner.get_device_by_unique_id(external_id)
+            if device is None or mdns_device is None:
+                continue
+            with self._sync_lock:
+                if external_id in self._syncing:
+                    continue
+                self._syncing.add(external_id)
+            self._last_sync_cache[external_id] = now
+            self._executor.submit(self._sync_single_device, device.model_copy(update={'online': True}), mdns_device)
+
+    def _sync_single_device(self, device: DeviceModelWithRelations, mdns_device: MDNSDevice):
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            result = sock.connect_ex((ip, port))
-            sock.close()
-            return result == 0
-        except:
-            return False
+            saver = DeviceSynchronizer(
+                mdns_info=mdns_device,
+                device=device
+            )
+            saver.sync_device()
+        except Exception as e:
+            Logger.err(f'[ID{device.id}, {device.external_id}] Sync error: {e}', LoggerType.PLUGINS)
+        finally:
+            with self._sync_lock:
+                self._syncing.discard(device.external_id)
 
     # ========== Колбэки ==========
 
@@ -422,12 +415,20 @@ class UmniDevicesPlugin(BasePlugin):
         except Exception as e:
             Logger.err(str(e), LoggerType.PLUGINS)
 
+    def _on_device_announced(self, device: MDNSDevice):
+        """Устройство появилось в mDNS: только признак жизни уже зарегистрированного устройства.
+        Регистрация в БД выполняется явно
+        """
+        self.liveness.heartbeat(device.unique_id)
+
     def _on_device_removed(self, unique_id: str):
         """Устройство удалено из mDNS"""
         Logger.info(f"Device REMOVED: {unique_id}")
 
     def _on_device_updated(self, old_device: MDNSDevice, new_device: MDNSDevice):
         """Данные устройства обновлены"""
+        # Анонс mDNS - признак жизни устройства
+        self.liveness.heartbeat(new_device.unique_id)
         if old_device.ip != new_device.ip:
             Logger.info(f"Device IP changed: {old_device.name} ({old_device.ip} -> {new_device.ip})")
         else:
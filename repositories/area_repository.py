@@ -19,6 +19,7 @@ from typing import List
 from fastapi import HTTPException
 from sqlmodel import select, col
 
+from classes.cameras.camera_config_cache import CameraChangeKind
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from database.session import write_session, read_session
@@ -38,8 +39,6 @@ class CameraAreaRepository(BaseRepository):
 
     @classmethod
     def save_areas_data(cls, areas: list["CameraAreaBaseModel"], camera: "CameraModelWithRelations"):
-        from services.cameras.classes.stream_registry import StreamRegistry
-
         try:
             result_areas = []
             # ВСЯ работа с БД в отдельном блоке
@@ -77,19 +76,8 @@ class CameraAreaRepository(BaseRepository):
                     )
                     result_areas.append(area_model)
 
-            area_ids = [a.id for a in result_areas]
-
-            # ✅ ВНЕ СЕССИИ обновляем трекер
-            stream = StreamRegistry.find_by_camera(camera)
-            if stream is not None:
-                if stream and hasattr(stream, 'tracker'):
-                    # Отложенное обновление без блокировки
-                    import threading
-                    threading.Thread(
-                        target=stream.tracker.update_rois_by_ids,
-                        args=(area_ids,),
-                        daemon=True
-                    ).start()
+            # После commit: кэш камер обновляется, поток камеры получает событие и перестраивает ROI
+            CameraRepository.reload_camera(camera.id, CameraChangeKind.AREAS)
 
             return result_areas
 
@@ -123,20 +111,19 @@ class CameraAreaRepository(BaseRepository):
 
     @classmethod
     def delete_area(cls, area_id: int) -> list[CameraAreaBaseModel] | None:
-        with write_session() as session:
-            try:
+        try:
+            with write_session() as session:
                 area = session.get(CameraAreaEntity, area_id)
                 if not area:
                     raise HTTPException(status_code=404, detail="Area not found")
 
+                camera_id = area.camera_id
                 session.delete(area)  # Events удалятся автоматически благодаря каскаду!
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
-                # session.refresh(camera)  # Обновляем камеру, чтобы получить актуальный список areas
-                camera = CameraRepository.get_camera(area.camera_id)
-                return camera.areas
-
-            except HTTPException:
-                raise
-            except Exception as e:
-                session.rollback()
-                raise HTTPException(status_code=500, detail=str(e))
+        # Перечитываем камеру после commit, чтобы получить актуальный список areas
+        camera = CameraRepository.reload_camera(camera_id, CameraChangeKind.AREAS)
+        return camera.areas if camera is not None else None
@@ -46,14 +46,16 @@ class BaseRepository:
             session,
             page_params: PageParams,
             order_by: Any = None,
-            include_relationships: bool = False
+            include_relationships: bool = False,
+            profile: str | None = None
     ) -> PaginatedResponse[M]:
         """Получить все записи с пагинацией"""
         return cls.paginate(
             session=session,
             page_params=page_params,
             order_by=order_by,
-            include_relationships=include_relationships
+            include_relationships=include_relationships,
+            profile=profile
         )
 
     @classmethod
@@ -84,11 +86,17 @@ class BaseRepository:
             search_term: str,
             search_fields: List[Any],
             include_relationships: bool = False,
-            joins: List[Any] = None
+            joins: List[Any] = None,
+            profile: str | None = None
     ) -> PaginatedResponse[M]:
         """Универсальный поиск с пагинацией"""
         if not search_term:
-            return cls.get_all_paginated(session, page_params, include_relationships=include_relationships)
+            return cls.get_all_paginated(
+                session,
+                page_params,
+                include_relationships=include_relationships,
+                profile=profile
+            )
 
         search_conditions = [field.ilike(f"%{search_term}%") for field in search_fields]
 
@@ -99,7 +107,8 @@ class BaseRepository:
             page_params=page_params,
             where_conditions=where_conditions,
             include_relationships=include_relationships,
-            joins=joins
+            joins=joins,
+            profile=profile
         )
 
     @classmethod
@@ -110,9 +119,30 @@ class BaseRepository:
             where_conditions: List[Any] = None,
             order_by: Any = None,
             include_relationships: bool = False,
-            joins: List[Any] = None
+            joins: List[Any] = None,
+            keyset_column: Any = None,
+            keyset_desc: bool = True,
+            profile: str | None = None
     ) -> PaginatedResponse[M]:
-        """Базовый метод пагинации для всех репозиториев"""
+        """Базовый метод пагинации для всех репозиториев.
+        Если репозиторий передал keyset_column, а клиент запросил keyset (или прислал cursor) -
+        используется keyset пагинация по (keyset_column, id), иначе OFFSET/LIMIT.
+        """
+        if keyset_column is not None and (page_params.keyset or page_params.cursor):
+            return cls.entity_class.paginate_keyset(
+                session=session,
+                sort_column=keyset_column,
+                model_class=cls.model_class,
+                cursor=page_params.cursor,
+                descending=keyset_desc,
+                page=page_params.page,
+                size=page_params.size,
+                where_conditions=where_conditions,
+                include_relationships=include_relationships,
+                joins=joins,
+                count_mode=page_params.count,
+                profile=profile
+            )
         return cls.entity_class.paginate_to_model(
             session=session,
             model_class=cls.model_class,
@@ -121,5 +151,7 @@ class BaseRepository:
             where_conditions=where_conditions,
             order_by=order_by,
             include_relationships=include_relationships,
-            joins=joins
+            joins=joins,
+            count_mode=page_params.count,
+            profile=profile
         )
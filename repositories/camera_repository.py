@@ -12,6 +12,7 @@
 #  #
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from classes.cameras.camera_config_cache import camera_config_cache, CameraChangeKind
 from classes.logger.logger_types import LoggerType
 from config.dependencies import get_ecosystem
 from classes.logger.logger import Logger
@@ -27,88 +28,141 @@ class CameraRepository(BaseRepository):
     entity_class = CameraEntity
     model_class = CameraModelWithRelations
 
+    @classmethod
+    def _to_model(cls, camera: CameraEntity) -> CameraModelWithRelations:
+        return CameraModelWithRelations.model_validate(
+            camera.to_dict(
+                profile='relations'
+            )
+        )
+
+    @classmethod
+    def _load_camera(cls, camera_id: int) -> CameraModelWithRelations | None:
+        with read_session() as sess:
+            camera = sess.exec(
+                select(CameraEntity)
+                .options(*CameraEntity.eager_options('relations'))
+                .where(CameraEntity.id == camera_id)
+            ).first()
+            return cls._to_model(camera) if camera is not None else None
+
     @classmethod
     def get_cameras(cls):
+        cameras = camera_config_cache.all()
+        if cameras is not None:
+            return cameras
+
+        version = camera_config_cache.version()
         with read_session() as sess:
             try:
-                cameras = sess.exec(
-                    select(CameraEntity).order_by(col(CameraEntity.name).asc())
-                ).all()
-
-                return [
-                    CameraModelWithRelations.model_validate(
-                        camera.to_dict(
-                            include_relationships=True
-                        )
-                    )
-                    for camera in cameras
+                cameras = [
+                    cls._to_model(camera)
+                    for camera in sess.exec(
+                        select(CameraEntity)
+                        .options(*CameraEntity.eager_options('relations'))
+                        .order_by(col(CameraEntity.name).asc())
+                    ).all()
                 ]
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
+                return None
+
+        camera_config_cache.fill(cameras, version)
+        return cameras
 
     @classmethod
     def get_camera(cls, camera_id: int) -> CameraModelWithRelations | None:
-        with read_session() as sess:
-            try:
-                camera = sess.exec(
-                    select(CameraEntity).where(CameraEntity.id == camera_id)
-                ).first()
-
-                return CameraModelWithRelations.model_validate(
-                    camera.to_dict(
-                        include_relationships=True
-                    )
-                )
-            except Exception as e:
-                Logger.err(str(e))
+        camera = camera_config_cache.get(camera_id)
+        if camera is not None:
+            return camera
+
+        version = camera_config_cache.version()
+        try:
+            camera = cls._load_camera(camera_id)
+        except Exception as e:
+            Logger.err(str(e))
+            return None
+
+        if camera is not None:
+            camera_config_cache.load(camera, version)
+        return camera
+
+    @classmethod
+    def reload_camera(cls, camera_id: int, kind: CameraChangeKind) -> CameraModelWithRelations | None:
+        """Перечитывает камеру из БД после изменения связанных данных (например, зон)
+        и уведомляет подписчиков кэша
+        """
+        try:
+            camera = cls._load_camera(camera_id)
+        except Exception as e:
+            Logger.err(str(e))
+            return None
+
+        if camera is not None:
+            camera_config_cache.put(camera, kind)
+        return camera
 
     @classmethod
     def add_camera(cls, model: CameraBaseModel):
-        with write_session() as sess:
-            try:
+        try:
+            with write_session() as sess:
                 camera = cls.prepare_camera(model, CameraEntity())
                 sess.add(camera)
-                ### sess.commit()
+                sess.flush()
+                result = cls._to_model(camera)
+        except Exception as e:
+            Logger.err(str(e))
+            return None
 
-                return CameraModelWithRelations.model_validate(
-                    camera.to_dict(
-                        include_relationships=True
-                    )
-                )
-            except Exception as e:
-                Logger.err(str(e))
+        # В кэш и подписчикам - только после commit
+        camera_config_cache.put(result, CameraChangeKind.ADDED)
+        return result
 
     @classmethod
     def update_camera(cls, model: CameraBaseModel):
-        with write_session() as sess:
-            try:
+        try:
+            with write_session() as sess:
                 camera_orm = sess.get(CameraEntity, model.id)
                 camera = cls.prepare_camera(model, camera_orm)
                 sess.add(camera)
+                sess.flush()
+                result = cls._to_model(camera)
+        except Exception as e:
+            Logger.err(str(e))
+            return None
 
-                return CameraModelWithRelations.model_validate(
-                    camera.to_dict(
-                        include_relationships=True
-                    )
-                )
-            except Exception as e:
-                Logger.err(str(e))
+        camera_config_cache.put(result, CameraChangeKind.UPDATED)
+        return result
 
     @classmethod
     def set_online(cls, camera_id: int, online: bool = True):
-        with write_session() as sess:
-            try:
+        try:
+            with write_session() as sess:
                 cam = sess.get(CameraEntity, camera_id)
                 cam.online = online
                 sess.add(cam)
+                result = cls._to_model(cam)
+        except Exception as e:
+            Logger.err(str(e))
+            return None
 
-                return CameraModelWithRelations.model_validate(
-                    cam.to_dict(
-                        include_relationships=True
-                    )
-                )
-            except Exception as e:
-                Logger.err(str(e))
+        camera_config_cache.put(result, CameraChangeKind.ONLINE)
+        return result
+
+    @classmethod
+    def set_cover(cls, camera_id: int, cover: str):
+        try:
+            with write_session() as sess:
+                cam = sess.get(CameraEntity, camera_id)
+                cam.cover = cover
+                sess.add(cam)
+                result = cls._to_model(cam)
+        except Exception as e:
+            Logger.err(str(e))
+            return None
+
+        camera_config_cache.put(result, CameraChangeKind.COVER)
+        return result
 
     @classmethod
     def prepare_camera(cls, model: CameraBaseModel, target: CameraEntity):
@@ -121,6 +175,10 @@ class CameraRepository(BaseRepository):
             camera.record = model.record
             camera.record_mode = model.record_mode.value
             camera.record_duration = model.record_duration
+            camera.record_passthrough = model.record_passthrough
+            camera.decode_threads = model.decode_threads
+            camera.decode_thread_type = model.decode_thread_type.value if model.decode_thread_type else None
+            camera.decode_low_delay = model.decode_low_delay
             camera.delete_after = model.delete_after
             if model.protocol is not CameraProtocolEnum.USB:
                 camera.ip = model.ip
@@ -12,13 +12,17 @@
 #  #
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from datetime import datetime
 from typing import Optional
 
 from fastapi import UploadFile
 from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import contains_eager
 from sqlmodel import select, col
 
+from classes.devices.device_index import device_index
+from classes.devices.sensor_value import to_db_value
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from classes.storages.device_storage import device_storage
@@ -30,8 +34,13 @@ from entities.sensor_entity import SensorEntity
 from models.device_model import DeviceUpdateModel, DeviceModel
 from models.device_model_relations import DeviceModelWithRelations
 from models.device_netif import DeviceNetifBase, DeviceNetif
+from models.device_sync_model import DeviceSyncState, DeviceSyncResult
 from repositories.base_repository import BaseRepository
 
+# Поля, которые синхронизация берет с устройства
+SYNC_SENSOR_FIELDS = ('name', 'type', 'active', 'options')
+SYNC_INTERFACE_FIELDS = ('name', 'ip', 'mask', 'gw')
+
 
 class DeviceRepository(BaseRepository):
     entity_class = DeviceEntity
@@ -211,6 +220,100 @@ class DeviceRepository(BaseRepository):
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
 
+    @classmethod
+    def apply_sync(cls, state: DeviceSyncState) -> Optional[DeviceSyncResult]:
+        """Применяет состояние устройства одной транзакцией.
+        Сравнивает с сохраненными строками устройства, сенсоров и интерфейсов и пишет только отличия:
+        сенсоры и интерфейсы - одним INSERT ... ON CONFLICT DO UPDATE на таблицу.
+        None - устройство еще не зарегистрировано.
+        """
+        now = datetime.now()
+        with write_session() as sess:
+            device = sess.exec(
+                select(DeviceEntity).where(DeviceEntity.external_id == state.external_id)
+            ).first()
+            if device is None:
+                return None
+
+            for key in ('name', 'capabilities', 'free_heap', 'total_heap'):
+                value = getattr(state, key)
+                if getattr(device, key) != value:
+                    setattr(device, key, value)
+            device.online = True
+            device.last_sync = now
+            sess.add(device)
+
+            result = DeviceSyncResult(device_id=device.id)
+
+            stored = {
+                (sensor.capability, sensor.identifier): sensor
+                for sensor in sess.exec(select(SensorEntity).where(SensorEntity.device_id == device.id)).all()
+            }
+            rows = []
+            for item in state.sensors:
+                current = stored.get((item.capability, item.identifier))
+                if current is not None:
+                    result.sensor_ids[(item.capability, item.identifier)] = current.id
+                    if all(getattr(current, key) == getattr(item, key) for key in SYNC_SENSOR_FIELDS):
+                        continue
+                    result.updated.append(current.id)
+                else:
+                    result.created += 1
+                rows.append({
+                    'device_id': device.id,
+                    'capability': item.capability,
+                    'identifier': item.identifier,
+                    'name': item.name,
+                    'type': item.type,
+                    'active': item.active,
+                    'options': item.options,
+                    # Для существующих сенсоров пользовательское имя и значение не перезаписываются
+                    'visible_name': current.visible_name if current is not None else item.name,
+                    'value': current.value if current is not None else to_db_value(item.value),
+                    'last_sync': now,
+                    'created': current.created if current is not None else now,
+                    'updated': now,
+                })
+            if rows:
+                stmt = pg_insert(SensorEntity).values(rows)
+                # RETURNING отдает и id новых сенсоров
+                written = sess.execute(stmt.on_conflict_do_update(
+                    constraint='uq_device_id_cap_ident',
+                    set_={key: stmt.excluded[key] for key in (*SYNC_SENSOR_FIELDS, 'last_sync', 'updated')}
+                ).returning(SensorEntity.id, SensorEntity.capability, SensorEntity.identifier))
+                for sensor_id, capability, identifier in written:
+                    result.sensor_ids[(capability, identifier)] = sensor_id
+
+            interfaces = {
+                ni.mac: ni
+                for ni in sess.exec(
+                    select(DeviceNetworkInterface).where(DeviceNetworkInterface.device_id == device.id)
+                ).all()
+            }
+            rows = [
+                {
+                    'device_id': device.id,
+                    **item.model_dump(),
+                    'last_sync': now,
+                    'created': now,
+                    'updated': now,
+                }
+                for item in state.interfaces
+                if item.mac not in interfaces
+                   or any(getattr(interfaces[item.mac], key) != getattr(item, key) for key in SYNC_INTERFACE_FIELDS)
+            ]
+            if rows:
+                stmt = pg_insert(DeviceNetworkInterface).values(rows)
+                sess.execute(stmt.on_conflict_do_update(
+                    index_elements=['mac'],
+                    set_={key: stmt.excluded[key] for key in ('device_id', *SYNC_INTERFACE_FIELDS, 'last_sync', 'updated')}
+                ))
+                result.interfaces = len(rows)
+
+        # Сенсоры записаны массовым INSERT в обход ORM - сбрасываем устройство в индексе явно
+        device_index.invalidate_devices([result.device_id])
+        return result
+
     @classmethod
     def save_network_interface(self, ni: DeviceNetifBase):
         with write_session() as sess:
@@ -68,7 +68,8 @@ class LogRepository(BaseRepository):
                     page_params=params,
                     where_conditions=where_conditions,
                     include_relationships=False,
-                    order_by=col(LogEntity.timestamp).desc()
+                    order_by=col(LogEntity.timestamp).desc(),
+                    keyset_column=col(LogEntity.timestamp)
                 )
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
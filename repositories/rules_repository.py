@@ -19,6 +19,7 @@ from starlette.exceptions import HTTPException
 from classes.l10n.l10n import _
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
+from classes.rules.rule_graph import rule_graph_cache
 from classes.rules.rules_store import rules_triggers_store
 from database.session import write_session, read_session
 from entities.camera_area import CameraAreaEntity
@@ -57,12 +58,12 @@ class RulesRepository(BaseRepository):
         with read_session() as sess:
             try:
                 rules = sess.exec(
-                    select(RuleEntity)
+                    select(RuleEntity).options(*RuleEntity.eager_options('graph'))
                 ).all()
                 return [
                     RuleModel.model_validate(
                         rule.to_dict(
-                            include_relationships=True
+                            profile='graph'
                         )
                     )
                     for rule in rules
@@ -74,12 +75,12 @@ class RulesRepository(BaseRepository):
     def get_rule(cls, rule_id: int):
         with read_session() as sess:
             try:
-                rule = sess.get(RuleEntity, rule_id)
+                rule = sess.get(RuleEntity, rule_id, options=RuleEntity.eager_options('graph'))
                 if not rule:
                     raise HTTPException(status_code=404, detail="Rule not found")
                 return RuleModel.model_validate(
                     rule.to_dict(
-                        include_relationships=True
+                        profile='graph'
                     )
                 )
             except Exception as e:
@@ -95,11 +96,13 @@ class RulesRepository(BaseRepository):
                 if not rule:
                     raise HTTPException(status_code=404, detail=_("Rule not found"))
                 sess.delete(rule)
-                return True
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
                 return False
 
+        rule_graph_cache.invalidate(rule_id)
+        return True
+
     @classmethod
     def add_rule(cls, rule_data: RuleCreate):
         with write_session() as sess:
@@ -206,13 +209,18 @@ class RulesRepository(BaseRepository):
                 ]
                 rules_triggers_store.reread(triggers)
 
-                return RuleModel.model_validate(
+                result = RuleModel.model_validate(
                     rule.to_dict(
                         include_relationships=True
                     )
                 )
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
+                return None
+
+        # Сбрасываем скомпилированный граф после commit, чтобы не закэшировать старую версию
+        rule_graph_cache.invalidate(rule_id)
+        return result
 
     @classmethod
     def get_node(cls, node_id: str):
@@ -291,7 +299,8 @@ class RulesRepository(BaseRepository):
                             SensorEntity.visible_name,
                             SensorEntity.identifier
                         ],
-                        include_relationships=True
+                        include_relationships=True,
+                        profile='device'
                     )
                     ar: list[SensorModelWithDevice] = res.items
                     for sensor in ar:
@@ -15,17 +15,24 @@
 
 from datetime import datetime
 
+from sqlalchemy import func
 from sqlmodel import select, col, asc
 
+from classes.charts.chart_downsample import ChartPoint, ChartDownsample, downsample
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from database.session import write_session, read_session
+from entities.enums.sensor_history_resolution_enum import SensorHistoryResolutionEnum
 from entities.sensor_history import SensorHistory
-from models.sensor_history_model import SearchHistoryModel, SensorHistoryModel
+from models.sensor_history_model import SearchHistoryModel, SensorHistoryModel, SensorHistoryStatsModel
 from repositories.base_repository import BaseRepository
+from repositories.sensor_history_rollup_repository import SensorHistoryRollupRepository
 
 
 class SensorHistoryRepository(BaseRepository):
+    # Во сколько раз источник может превышать запрошенное число точек до прореживания
+    source_oversample: int = 4
+
     @classmethod
     def get_last_record(cls, sensor_id: int) -> None | SensorHistoryModel:
         with read_session() as sess:
@@ -45,26 +52,74 @@ class SensorHistoryRepository(BaseRepository):
                 Logger.err(str(e), LoggerType.APP)
 
     @classmethod
-    def get_sensor_history(cls, sensor_id: int, body: SearchHistoryModel):
+    def _count_raw(cls, sess, sensor_id: int, start: datetime, end: datetime, limit: int) -> int:
+        """Количество сырых числовых записей в периоде, но не больше limit"""
+        sub = (
+            select(SensorHistory.id)
+            .where(SensorHistory.sensor_id == sensor_id)
+            .where(col(SensorHistory.created).between(start, end))
+            .where(col(SensorHistory.value_num).is_not(None))
+            .limit(limit)
+            .subquery()
+        )
+        return sess.exec(select(func.count()).select_from(sub)).one()
+
+    @classmethod
+    def _get_raw_points(cls, sess, sensor_id: int, start: datetime, end: datetime) -> list[ChartPoint]:
+        rows = sess.exec(
+            select(SensorHistory.created, SensorHistory.value_num)
+            .where(SensorHistory.sensor_id == sensor_id)
+            .where(col(SensorHistory.created).between(start, end))
+            .where(col(SensorHistory.value_num).is_not(None))
+            .order_by(asc(SensorHistory.created))
+        ).all()
+        return [(created, round(value, 2)) for created, value in rows]
+
+    @classmethod
+    def get_sensor_history_stats(cls, sensor_id: int, start: datetime, end: datetime) -> SensorHistoryStatsModel:
+        """Минимум, максимум и среднее числовых значений за период (считаются в БД)"""
         with read_session() as sess:
-            try:
-                start: datetime = body.range[0]
-                end: datetime = body.range[1]
-                query = select(SensorHistory).where(
-                    SensorHistory.sensor_id == sensor_id
-                ).where(
-                    col(SensorHistory.created).between(
-                        start, end
-                    )
-                ).order_by(
-                    asc(SensorHistory.created)
+            count, minimum, maximum, average = sess.exec(
+                select(
+                    func.count(SensorHistory.value_num),
+                    func.min(SensorHistory.value_num),
+                    func.max(SensorHistory.value_num),
+                    func.avg(SensorHistory.value_num)
                 )
-                history: list[SensorHistory] = sess.exec(query).all()
-                return [
-                    SensorHistoryModel.model_validate(
-                        item.to_dict()
-                    )
-                    for item in history
-                ]
-            except Exception as e:
-                Logger.err(str(e), LoggerType.APP)
+                .where(SensorHistory.sensor_id == sensor_id)
+                .where(col(SensorHistory.created).between(start, end))
+            ).one()
+            return SensorHistoryStatsModel(
+                count=count,
+                min=minimum,
+                max=maximum,
+                avg=float(average) if average is not None else None
+            )
+
+    @classmethod
+    def get_sensor_history_points(cls, sensor_id: int, body: SearchHistoryModel) -> list[ChartPoint]:
+        """Точки графика за период, не больше body.points.
+        Сырая история читается, только если ее немного, иначе берутся агрегаты
+        самого мелкого разрешения, укладывающегося в лимит. Результат прореживается body.downsample.
+        """
+        start: datetime = body.range[0]
+        end: datetime = body.range[1]
+        if not body.points or body.downsample == ChartDownsample.NONE:
+            with read_session() as sess:
+                return cls._get_raw_points(sess, sensor_id, start, end)
+
+        budget = body.points * cls.source_oversample
+        with read_session() as sess:
+            if cls._count_raw(sess, sensor_id, start, end, budget + 1) <= budget:
+                points = cls._get_raw_points(sess, sensor_id, start, end)
+                return downsample(points, body.points, body.downsample)
+
+        span = (end - start).total_seconds()
+        resolution = SensorHistoryResolutionEnum.DAY
+        for candidate in SensorHistoryResolutionEnum:
+            if span / candidate.seconds <= budget:
+                resolution = candidate
+                break
+
+        points = SensorHistoryRollupRepository.get_points(sensor_id, resolution, start, end)
+        return downsample(points, body.points, body.downsample)
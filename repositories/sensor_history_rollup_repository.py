@@ -0,0 +1,125 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text, func
+from sqlmodel import select, col
+
+from classes.charts.chart_downsample import ChartPoint
+from classes.logger.logger import Logger
+from classes.logger.logger_types import LoggerType
+from database.session import write_session, read_session
+from entities.enums.sensor_history_resolution_enum import SensorHistoryResolutionEnum
+from entities.sensor_history import SensorHistory
+from entities.sensor_history_rollup import SensorHistoryRollup
+from repositories.base_repository import BaseRepository
+
+# Минутные агрегаты из сырой истории, в агрегаты попадают только числовые значения
+RAW_TO_MINUTE_SQL = text("""
+    INSERT INTO device_sensors_history_rollups (sensor_id, resolution, bucket, count, sum, min, max, last)
+    SELECT sensor_id, :resolution, date_trunc('minute', created) AS bucket,
+           count(*), sum(value_num), min(value_num), max(value_num),
+           (array_agg(value_num ORDER BY created DESC))[1]
+    FROM device_sensors_history
+    WHERE created >= :since AND value_num IS NOT NULL
+    GROUP BY sensor_id, bucket
+    ON CONFLICT (sensor_id, resolution, bucket) DO UPDATE SET
+        count = EXCLUDED.count, sum = EXCLUDED.sum, min = EXCLUDED.min, max = EXCLUDED.max, last = EXCLUDED.last
+""")
+
+# Часовые и дневные агрегаты из агрегатов меньшего разрешения
+ROLLUP_SQL = text("""
+    INSERT INTO device_sensors_history_rollups (sensor_id, resolution, bucket, count, sum, min, max, last)
+    SELECT sensor_id, :resolution, date_trunc(:trunc, bucket) AS target,
+           sum(count), sum(sum), min(min), max(max), (array_agg(last ORDER BY bucket DESC))[1]
+    FROM device_sensors_history_rollups
+    WHERE resolution = :source AND bucket >= :since
+    GROUP BY sensor_id, target
+    ON CONFLICT (sensor_id, resolution, bucket) DO UPDATE SET
+        count = EXCLUDED.count, sum = EXCLUDED.sum, min = EXCLUDED.min, max = EXCLUDED.max, last = EXCLUDED.last
+""")
+
+
+class SensorHistoryRollupRepository(BaseRepository):
+    # Время последнего пересчета, None - при первом запуске берется из БД
+    watermark: Optional[datetime] = None
+    # Запас на записи, закоммиченные позже своего created
+    lag = timedelta(minutes=1)
+
+    @classmethod
+    def _initial_since(cls, sess) -> Optional[datetime]:
+        last_bucket = sess.exec(
+            select(func.max(SensorHistoryRollup.bucket))
+            .where(SensorHistoryRollup.resolution == SensorHistoryResolutionEnum.MINUTE.value)
+        ).first()
+        if last_bucket is not None:
+            return last_bucket
+        # Агрегатов еще нет - строим по всей истории
+        return sess.exec(select(func.min(SensorHistory.created))).first()
+
+    @classmethod
+    def refresh(cls):
+        """Пересчитывает агрегаты для интервалов, затронутых новыми записями.
+        Пересчет идемпотентен: интервал всегда агрегируется целиком.
+        """
+        with write_session() as sess:
+            try:
+                started = datetime.now()
+                since = cls.watermark - cls.lag if cls.watermark is not None else cls._initial_since(sess)
+                if since is None:
+                    return
+
+                sess.execute(RAW_TO_MINUTE_SQL, {
+                    'resolution': SensorHistoryResolutionEnum.MINUTE.value,
+                    'since': since.replace(second=0, microsecond=0),
+                })
+                sess.execute(ROLLUP_SQL, {
+                    'resolution': SensorHistoryResolutionEnum.HOUR.value,
+                    'trunc': SensorHistoryResolutionEnum.HOUR.trunc,
+                    'source': SensorHistoryResolutionEnum.MINUTE.value,
+                    'since': since.replace(minute=0, second=0, microsecond=0),
+                })
+                sess.execute(ROLLUP_SQL, {
+                    'resolution': SensorHistoryResolutionEnum.DAY.value,
+                    'trunc': SensorHistoryResolutionEnum.DAY.trunc,
+                    'source': SensorHistoryResolutionEnum.HOUR.value,
+                    'since': since.replace(hour=0, minute=0, second=0, microsecond=0),
+                })
+                sess.commit()
+                cls.watermark = started
+            except Exception as e:
+                sess.rollback()
+                Logger.err(f'Sensor history rollup error: {e}', LoggerType.DEVICES)
+
+    @classmethod
+    def get_points(
+            cls,
+            sensor_id: int,
+            resolution: SensorHistoryResolutionEnum,
+            start: datetime,
+            end: datetime
+    ) -> list[ChartPoint]:
+        """Средние значения агрегатов за период"""
+        with read_session() as sess:
+            rows = sess.exec(
+                select(SensorHistoryRollup.bucket, SensorHistoryRollup.sum, SensorHistoryRollup.count)
+                .where(SensorHistoryRollup.sensor_id == sensor_id)
+                .where(SensorHistoryRollup.resolution == resolution.value)
+                .where(col(SensorHistoryRollup.bucket).between(start, end))
+                .order_by(col(SensorHistoryRollup.bucket).asc())
+            ).all()
+            return [(bucket, total / count) for bucket, total, count in rows if count]
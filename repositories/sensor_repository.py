@@ -12,14 +12,16 @@
 #  #
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
-from typing import Optional, Union
+from datetime import datetime
+from typing import Optional, Union, Dict, List, Any
 
+from sqlalchemy import insert, update
 from sqlmodel import select, col, or_
 from sqlalchemy.orm import selectinload
 from starlette.exceptions import HTTPException
 
-from classes.events.event_bus import event_bus
-from classes.events.event_types import EventType
+from classes.devices.device_index import device_index
+from classes.devices.sensor_ingest_buffer import sensor_ingest_buffer
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from classes.storages.device_storage import device_storage
@@ -33,8 +35,6 @@ from models.sensor_model import SensorModel, SensorModelWithDevice, SensorCreate
 from repositories.base_repository import BaseRepository
 from starlette.status import HTTP_404_NOT_FOUND
 
-from repositories.sensor_history_repository import SensorHistoryRepository
-
 
 class SensorRepository(BaseRepository):
     entity_class = SensorEntity
@@ -45,7 +45,7 @@ class SensorRepository(BaseRepository):
         if sensor_orm is not None:
             return SensorModelWithDevice.model_validate(
                 sensor_orm.to_dict(
-                    include_relationships=True
+                    profile='device'
                 )
             )
         return None
@@ -54,10 +54,12 @@ class SensorRepository(BaseRepository):
     def get_sensor(cls, sensor_id: int):
         with read_session() as sess:
             try:
-                q = select(SensorEntity).where(SensorEntity.id == sensor_id)
+                q = (
+                    select(SensorEntity)
+                    .options(*SensorEntity.eager_options('device'))
+                    .where(SensorEntity.id == sensor_id)
+                )
                 sensor_orm = sess.exec(q).first()
-                if sensor_orm:
-                    sess.refresh(sensor_orm)
                 return cls._return_sensor_with_relations(sensor_orm)
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
@@ -78,33 +80,29 @@ class SensorRepository(BaseRepository):
 
     @classmethod
     def update_sensor_value(cls, sensor_id: int, value: Optional[Union[int | float | str]]):
-        with write_session() as sess:
-            try:
-                sensor = sess.get(SensorEntity, sensor_id)
-                if isinstance(sensor, SensorEntity):
-                    sensor.value = value
-                    sess.add(sensor)
-
-                    last_record = SensorHistoryRepository.get_last_record(sensor.id)
-                    if last_record is None or last_record.value != str(
-                            value):  # Todo map_type last_record.value in model by type
-                        history = SensorHistory()
-                        history.sensor_id = sensor_id
-                        history.value = value
-                        sess.add(history)
-
-                    sess.commit()
-
-                    sensor_model = cls._return_sensor_with_relations(sensor)
-                    if sensor_model is not None:
-                        event_bus.publish(
-                            event_type=EventType.SENSOR_CHANGE_STATE,
-                            sensor=sensor_model
-                        )
+        """Принимает новое значение сенсора в конвейер записи.
+        Значение сразу попадает в память и событие SENSOR_CHANGE_STATE, в БД - пачкой
+        """
+        try:
+            return sensor_ingest_buffer.submit(sensor_id, value)
+        except Exception as e:
+            Logger.err(str(e), LoggerType.APP)
 
-                    return sensor_model
-            except Exception as e:
-                Logger.err(str(e), LoggerType.APP)
+    @classmethod
+    def write_values(cls, values: Dict[int, Optional[str]], history: List[Dict[str, Any]]):
+        """Одна транзакция на пачку: текущие значения сенсоров и строки истории"""
+        with write_session() as sess:
+            if values:
+                now = datetime.now()
+                sess.execute(
+                    update(SensorEntity),
+                    [
+                        {'id': sensor_id, 'value': value, 'updated': now}
+                        for sensor_id, value in values.items()
+                    ]
+                )
+            if history:
+                sess.execute(insert(SensorHistory), history)
 
     @classmethod
     def create_sensor(cls, model: SensorCreateModel):
@@ -137,6 +135,9 @@ class SensorRepository(BaseRepository):
                     sess.add(sensor)
                     ### sess.commit()
 
+                    # Конвейер значений перечитает сенсор с новыми метаданными
+                    device_index.invalidate_sensors([sensor.id])
+
                     return SensorModel.model_validate(
                         sensor.to_dict()
                     )
@@ -165,7 +166,8 @@ class SensorRepository(BaseRepository):
                     ],
                     joins=[
                         SensorEntity.device
-                    ]
+                    ],
+                    profile='device'
                 )
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
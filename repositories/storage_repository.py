@@ -13,6 +13,7 @@
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from classes.cameras.camera_config_cache import camera_config_cache, CameraChangeKind
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from classes.storages.filesystem import Filesystem
@@ -20,6 +21,7 @@ from database.session import write_session, read_session
 from entities.storage import StorageEntity
 from models.storage_model import StorageModel, StorageModelBase
 from repositories.base_repository import BaseRepository
+from repositories.camera_repository import CameraRepository
 from sqlmodel import select
 from starlette.exceptions import HTTPException
 
@@ -96,11 +98,18 @@ class StorageRepository(BaseRepository):
                 storage.active = model.active
                 sess.add(storage)
                 ### sess.commit()
-                return StorageModel.model_validate(
+                result = StorageModel.model_validate(
                     storage.to_dict()
                 )
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
+                return None
+
+        # Камеры хранилища перечитываются после commit: потоки получат новый путь
+        for camera in CameraRepository.get_cameras() or []:
+            if camera.storage_id == result.id:
+                CameraRepository.reload_camera(camera.id, CameraChangeKind.UPDATED)
+        return result
 
     @classmethod
     def delete_storage(cls, storage_id: int):
@@ -109,6 +118,9 @@ class StorageRepository(BaseRepository):
                 storage = sess.get(StorageEntity, storage_id)
                 if storage is not None:
                     sess.delete(storage)
-                return SuccessResponse(success=True)
             except Exception as e:
                 Logger.err(str(e), LoggerType.APP)
+                return None
+
+        camera_config_cache.invalidate()
+        return SuccessResponse(success=True)
@@ -13,6 +13,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from classes.auth.principal_cache import principal_cache
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from database.session import write_session, read_session
@@ -95,13 +96,19 @@ class UserRepository(BaseRepository):
                         pass
                     session.add(user_db)
                     session.flush()
-                    return UserResponseOut.model_validate(
+                    result = UserResponseOut.model_validate(
                         user_db.to_dict(
                             include_relationships=True
                         )
                     )
+                else:
+                    return None
             except Exception as e:
                 Logger.err(f'Error update user: {str(e)}', LoggerType.USERS)
+                return None
+
+        principal_cache.invalidate(user.id)
+        return result
 
     @classmethod
     def delete_user(cls, user_id: int) -> bool:
@@ -110,7 +117,9 @@ class UserRepository(BaseRepository):
                 session.exec(
                     delete(UserEntity).where(col(UserEntity.id) == user_id)
                 )
-                return True
             except Exception as e:
                 Logger.err(f'Error create user: {str(e)}', LoggerType.USERS)
-        return False
+                return False
+
+        principal_cache.invalidate(user_id)
+        return True
@@ -16,7 +16,7 @@
 from typing import Annotated
 
 import cv2
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, Query
 from fastapi.responses import StreamingResponse
 from starlette.responses import Response
 
@@ -40,6 +40,7 @@ from responses.success import SuccessResponse
 from responses.user import UserResponseOut
 from starlette.exceptions import HTTPException
 
+from services.cameras.classes.mjpeg_hub import MjpegProfile
 from services.cameras.classes.static_stream_manager import static_stream_manager
 from services.cameras.classes.stream_registry import StreamRegistry
 
@@ -129,7 +130,9 @@ def get_camera_cover(
 async def get_camera_stream(
         camera_id: int,
         user: Annotated[UserResponseOut, Depends(check_permission_by_token("cameras:view"))],
-        background_tasks: BackgroundTasks,
+        width: Annotated[int, Query(ge=160, le=1920)] = 640,
+        quality: Annotated[int, Query(ge=10, le=100)] = 80,
+        fps: Annotated[float, Query(gt=0, le=30)] = 25,
 ):
     # Проверяем глобальное состояние shutdown
     if lifespan_manager.is_shutting_down:
@@ -143,15 +146,12 @@ async def get_camera_stream(
     stream = StreamRegistry.find_by_camera(camera)
 
     if stream and stream.opened and StreamRegistry.is_running():
-        # Добавляем задачу для очистки
-        background_tasks.add_task(
-            lambda: stream.stop_frame_generation()
-            if hasattr(stream, 'stop_frame_generation')
-            else None
-        )
-
+        # Подписчик сам отключается от хаба камеры при закрытии соединения
         return StreamingResponse(
-            content=stream.generate_frames_async(),
+            content=stream.generate_frames_async(
+                profile=MjpegProfile.snap(width, quality),
+                fps=fps
+            ),
             media_type='multipart/x-mixed-replace; boundary=frame'
         )
 
@@ -16,6 +16,7 @@
 from datetime import datetime
 from fastapi import APIRouter, Response, status
 from sqlmodel import delete
+from classes.auth.principal_cache import principal_cache
 from classes.crypto.hasher import Hasher
 from classes.logger.logger_types import LoggerType
 from config.dependencies import get_ecosystem
@@ -72,6 +73,9 @@ def install_ecosystem(body: InstallBody, response: Response):
                 session.merge(install_date_db)
                 ecosystem.config.reread()
 
+            # Все пользователи пересозданы
+            principal_cache.invalidate()
+
     except InvalidToken:
         response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         Logger.err('Token error, failed to install Ecosystem', LoggerType.APP)
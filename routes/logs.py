@@ -20,6 +20,7 @@ from fastapi import APIRouter, Depends
 from classes.auth.auth import Auth
 from models.log_model import LogPageParams
 from repositories.log_repository import LogRepository
+from services.log.log_service import LogService
 from responses.user import UserResponseOut
 
 logs = APIRouter(
@@ -34,3 +35,10 @@ def get_logs(
         params: LogPageParams
 ):
     return LogRepository.get_logs(params)
+
+
+@logs.get('/stats')
+def get_logs_stats(
+        user: Annotated[UserResponseOut, Depends(Auth.get_current_active_user)]
+):
+    return LogService.get_stats()
@@ -26,7 +26,7 @@ from classes.devices.device_sensor_type_enum import DeviceSensorTypeEnum
 from classes.l10n.l10n import _
 from classes.storages.device_storage import device_storage
 from models.pagination_model import PageParams
-from models.sensor_history_model import SearchHistoryModel, SensorHistoryModel
+from models.sensor_history_model import SearchHistoryModel, SensorHistoryStatsModel
 from models.sensor_model import SensorModelWithHistory, SensorUpdateModel, SensorPayload, SensorModel, \
     SensorModelWithDevice, SensorUpdateModelUi
 from repositories.sensor_history_repository import SensorHistoryRepository
@@ -90,12 +90,12 @@ def get_sensors_history(
 ):
     try:
         sensor: SensorModelWithHistory = SensorRepository.get_sensor(sensor_id)
-        history: list[SensorHistoryModel] = SensorHistoryRepository.get_sensor_history(
+        points = SensorHistoryRepository.get_sensor_history_points(
             sensor_id,
             body
         )
         series = SensorHistoryChart(sensor)
-        series.set_series(history)
+        series.set_points(points)
         return series.series
     except Exception as e:
         raise HTTPException(
@@ -104,6 +104,25 @@ def get_sensors_history(
         )
 
 
+@sensors.post('/{sensor_id}/history/stats', response_model=SensorHistoryStatsModel)
+def get_sensors_history_stats(
+        sensor_id: int,
+        body: Annotated[SearchHistoryModel, Body()],
+        user: Annotated[UserResponseOut, Depends(Auth.get_current_active_user)],
+):
+    try:
+        return SensorHistoryRepository.get_sensor_history_stats(
+            sensor_id,
+            body.range[0],
+            body.range[1]
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=_('Error getting sensors history')
+        )
+
+
 @sensors.get('/{sensor_id}/cover/{width}', description="Get sensor cover")
 def get_sensor_cover(
         sensor_id: int,
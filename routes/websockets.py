@@ -13,21 +13,20 @@
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import json
 from typing import Annotated
-import cv2
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect
 from websockets.exceptions import ConnectionClosed
 
 from classes.auth.auth import Auth
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from classes.websockets.websockets import WebSockets
-from entities.camera import CameraEntity
 from repositories.camera_repository import CameraRepository
 from responses.user import UserResponseOut
-from services.cameras.cameras_service import CamerasService
+from services.cameras.classes.mjpeg_hub import MjpegProfile
+from services.cameras.classes.stream_registry import StreamRegistry
 
-connected_clients: list[WebSocket] = []
 websockets = APIRouter(
     prefix='/ws',
     tags=['ws']
@@ -38,40 +37,70 @@ websockets = APIRouter(
 async def websocket_endpoint(
         websocket: WebSocket,
         user: Annotated[UserResponseOut, Depends(Auth.validate_ws_token)],
-
+        topics: Annotated[str | None, Query()] = None,
 ):
-    await WebSockets.add_client(websocket)
+    """
+    Уведомления сервера. Без параметра topics клиент получает все топики, кроме значений сенсоров
+    (sensor.value) - на них нужно подписаться явно.
+    Подписка задается при подключении (?topics=detection,storage.size) или сообщениями
+    {"action": "subscribe" | "unsubscribe", "topics": ["detection", "rule.executed"]}
+    """
+    initial_topics = [t.strip() for t in topics.split(',') if t.strip()] if topics else None
+    await WebSockets.add_client(websocket, topics=initial_topics)
     Logger.debug(f'Add client [{user.username}] to server', LoggerType.WEBSOCKETS)
 
     try:
         while True:
             data = await websocket.receive_text()
-            await websocket.send_text(f"Message text was: {data}")
-    except (WebSocketDisconnect, ConnectionClosed):
+            command = _parse_ws_command(data)
+            if command is None:
+                WebSockets.send(websocket, f"Message text was: {data}")
+            elif command['action'] == 'subscribe':
+                WebSockets.subscribe(websocket, command['topics'])
+            else:
+                WebSockets.unsubscribe(websocket, command['topics'])
+    except (WebSocketDisconnect, ConnectionClosed, RuntimeError):
         Logger.debug(f'Client [{user.username}] closes connection', LoggerType.WEBSOCKETS)
+    finally:
         WebSockets.remove_client(websocket)
 
 
+def _parse_ws_command(data: str) -> dict | None:
+    try:
+        command = json.loads(data)
+    except ValueError:
+        return None
+    if (not isinstance(command, dict)
+            or command.get('action') not in ('subscribe', 'unsubscribe')
+            or not isinstance(command.get('topics'), list)):
+        return None
+    return command
+
+
 @websockets.websocket('/cameras/{camera_id}/stream')
 async def get_cameras(
         websocket: WebSocket,
+        camera_id: int,
         user: Annotated[UserResponseOut, Depends(Auth.validate_token)],
-        camera: CameraEntity = Depends(CameraRepository.get_camera)
+        width: Annotated[int, Query(ge=160, le=1920)] = 640,
+        quality: Annotated[int, Query(ge=10, le=100)] = 80,
+        fps: Annotated[float, Query(gt=0, le=30)] = 25,
 ):
     await websocket.accept()
-    connected_clients.append(websocket)
 
-    for stream in CamerasService.streams:
-        if stream.id == camera.id:
-            try:
-                while True:
-                    _, encoded_frame = cv2.imencode('.jpg', stream.resized)
-                    frame_data = encoded_frame.tobytes()
-                    await websocket.send_bytes(frame_data)
-                    # asyncio.run()
-            except (WebSocketDisconnect, ConnectionClosed):
-                await websocket.close(code=1001)
-                Logger.debug(f'[WebSocketDisconnect] Client {user.username} disconnects', LoggerType.WEBSOCKETS)
-            except Exception as e:
-                await websocket.close(code=1001)
-                Logger.err(f"@get_cameras err {e}", LoggerType.WEBSOCKETS)
+    camera = CameraRepository.get_camera(camera_id)
+    stream = StreamRegistry.find_by_camera(camera) if camera is not None else None
+    if stream is None:
+        await websocket.close(code=1008)
+        return
+
+    try:
+        # Кадры кодируются хабом камеры один раз для всех зрителей
+        async for jpeg in stream.mjpeg_hub.frames(MjpegProfile.snap(width, quality), fps):
+            await websocket.send_bytes(jpeg)
+        await websocket.close(code=1001)
+    except (WebSocketDisconnect, ConnectionClosed):
+        Logger.debug(f'[WebSocketDisconnect] Client {user.username} disconnects', LoggerType.WEBSOCKETS)
+    except Exception as e:
+        await websocket.close(code=1001)
+        Logger.err(f"@get_cameras err {e}", LoggerType.WEBSOCKETS)
@@ -39,3 +39,7 @@ class BaseService:
 
     def run(self):
         return
+
+    def stop(self):
+        """Остановка сервиса при завершении приложения"""
+        self.running = False
@@ -13,9 +13,10 @@
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import time
+import threading
 from typing import TYPE_CHECKING
 
+from classes.cameras.camera_config_cache import camera_config_cache, CameraChangeEvent, CameraChangeKind
 from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from classes.thread.daemon import Daemon
@@ -35,20 +36,34 @@ class CamerasService(BaseService):
     streams: list[CameraStream] = []
     checking_thread: Daemon | None = None
     daemon: Daemon | None = None
+    # Первичная загрузка и события кэша могут прийти из разных потоков
+    streams_lock = threading.Lock()
 
     def cameras_list_task(self):
-        while True:
-            self.cameras = CameraRepository.get_cameras()
+        """Запускает потоки для всех камер. Дальнейшие изменения приходят событиями кэша конфигурации"""
+        camera_config_cache.subscribe(self.on_camera_changed)
+        self.cameras = CameraRepository.get_cameras() or []
+        with self.streams_lock:
             for cam in self.cameras:
-                current_stream = StreamRegistry.find_by_camera(cam)  # Используем StreamRegistry
-                if current_stream:
-                    current_stream.set_camera(cam)
-                    Logger.debug(f'[{cam.name}] Update camera in camera registry', LoggerType.CAMERAS)
-                else:
-                    new_stream = CameraStream(camera=cam)
-                    StreamRegistry.add_stream(new_stream)  # Добавляем поток в реестр
-                    Logger.debug(f'[{cam.name}] New stream added', LoggerType.CAMERAS)
-            time.sleep(5)
+                if StreamRegistry.find_by_camera(cam) is None:
+                    self._add_stream(cam)
+
+    def on_camera_changed(self, event: CameraChangeEvent):
+        cam = event.camera
+        with self.streams_lock:
+            stream = StreamRegistry.find_by_camera(cam)
+            if stream is None:
+                self._add_stream(cam)
+                return
+        if event.kind in (CameraChangeKind.ONLINE, CameraChangeKind.COVER):
+            stream.update_state(cam)
+        else:
+            stream.set_camera(cam, restart=event.needs_restart)
+            Logger.debug(f'[{cam.name}] Update camera in camera registry ({event.kind})', LoggerType.CAMERAS)
+
+    def _add_stream(self, cam: "CameraModelWithRelations"):
+        StreamRegistry.add_stream(CameraStream(camera=cam))
+        Logger.debug(f'[{cam.name}] New stream added', LoggerType.CAMERAS)
 
     def run(self):
         Logger.debug('Starting camera streams...', LoggerType.CAMERAS)
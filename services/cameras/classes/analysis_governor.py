@@ -0,0 +1,147 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import time
+from enum import Enum
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from services.systeminfo.systeminfo_service import SysteminfoService
+
+
+class AnalysisMode(str, Enum):
+    # Полный анализ кадров с целевой частотой
+    ACTIVE = 'active'
+    # Сцена статична: дешевая проверка уменьшенного кадра с низкой частотой
+    IDLE = 'idle'
+
+
+class AnalysisGovernor:
+    """Регулятор частоты и разрешения анализа движения одной камеры.
+
+    В режиме ACTIVE трекер получает кадры с частотой target_fps. Если движения нет дольше idle_after,
+    камера переходит в IDLE: трекер не вызывается, вместо него с частотой idle_fps сравниваются
+    уменьшенные до probe_width кадры. Заметное изменение сразу возвращает камеру в ACTIVE.
+
+    При превышении общесистемного бюджета CPU (SysteminfoService) частоты всех камер снижаются,
+    но не ниже min_active_fps и min_idle_fps, чтобы начало движения не пропускалось.
+    """
+
+    # Общий для всех камер коэффициент частоты по загрузке CPU
+    cpu_scale: float = 1.0
+    min_cpu_scale: float = 0.25
+    cpu_checked: float = 0
+    cpu_lock = threading.Lock()
+
+    def __init__(
+            self,
+            target_fps: Optional[float] = None,
+            idle_fps: Optional[float] = None,
+            idle_after: Optional[float] = None,
+            probe_width: int = 160,
+            min_active_fps: float = 3,
+            min_idle_fps: float = 1
+    ):
+        self.target_fps = target_fps or settings.CAMERA_ANALYSIS_FPS or 10
+        self.idle_fps = idle_fps or settings.CAMERA_ANALYSIS_IDLE_FPS or 2
+        self.idle_after = idle_after or settings.CAMERA_ANALYSIS_IDLE_AFTER or 15
+        self.probe_width = probe_width
+        self.min_active_fps = min(min_active_fps, self.target_fps)
+        self.min_idle_fps = min(min_idle_fps, self.idle_fps)
+
+        # Первые кадры анализируются полностью, чтобы трекер набрал историю
+        self.mode = AnalysisMode.ACTIVE
+        self.last_analysis: float = 0
+        self.last_probe: float = 0
+        self.last_motion: float = time.time()
+        self._probe_prev: Optional[np.ndarray] = None
+        self._probe_threshold = 25
+
+    @property
+    def fps(self) -> float:
+        """Текущая частота анализа с учетом режима и загрузки CPU"""
+        if self.mode == AnalysisMode.ACTIVE:
+            return max(self.min_active_fps, self.target_fps * self.cpu_scale)
+        return max(self.min_idle_fps, self.idle_fps * self.cpu_scale)
+
+    def admit(self, frame: np.ndarray, now: float, min_area: int = 100) -> bool:
+        """Нужно ли передать кадр трекеру. frame - кадр, который анализирует трекер,
+        min_area - минимальная площадь движения в его пикселях
+        """
+        self.update_cpu_scale(now)
+        if now - self.last_analysis < 1.0 / self.fps:
+            return False
+
+        if self.mode == AnalysisMode.ACTIVE:
+            self.last_analysis = now
+            return True
+
+        self.last_analysis = now
+        if not self._probe(frame, min_area):
+            return False
+
+        self.mode = AnalysisMode.ACTIVE
+        self.last_motion = now
+        return True
+
+    def report(self, motion: bool, now: float):
+        """Результат анализа кадра: есть ли движение (в том числе неподтвержденное)"""
+        if motion:
+            self.last_motion = now
+        elif self.mode == AnalysisMode.ACTIVE and now - self.last_motion > self.idle_after:
+            self.mode = AnalysisMode.IDLE
+            self._probe_prev = None
+
+    def _probe(self, frame: np.ndarray, min_area: int) -> bool:
+        """Сравнение уменьшенного кадра с предыдущим уменьшенным кадром"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.probe_width / width)
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (3, 3), 0)
+
+        prev = self._probe_prev
+        self._probe_prev = gray
+        if prev is None or prev.shape != gray.shape:
+            return False
+
+        diff = cv2.absdiff(gray, prev)
+        _, mask = cv2.threshold(diff, self._probe_threshold, 255, cv2.THRESH_BINARY)
+        # Площадь движения в пикселях уменьшенного кадра, с запасом в два раза
+        return cv2.countNonZero(mask) >= max(1.0, min_area * scale * scale * 0.5)
+
+    @classmethod
+    def update_cpu_scale(cls, now: float):
+        """Пересчитывает общий коэффициент частоты по загрузке CPU не чаще раза в секунду"""
+        if now - cls.cpu_checked < 1.0:
+            return
+
+        with cls.cpu_lock:
+            if now - cls.cpu_checked < 1.0:
+                return
+            cls.cpu_checked = now
+
+            budget = settings.CAMERA_ANALYSIS_CPU_BUDGET or 85
+            load = SysteminfoService.cpu.last
+            if load > budget:
+                cls.cpu_scale = max(cls.min_cpu_scale, cls.cpu_scale * 0.7)
+            elif load < budget * 0.9:
+                cls.cpu_scale = min(1.0, cls.cpu_scale * 1.2)
@@ -15,6 +15,7 @@
 
 import os
 import traceback
+from datetime import timedelta
 from threading import Thread
 from typing import Callable, Any, TYPE_CHECKING
 
@@ -167,6 +168,8 @@ class CameraNotifier:
                     # Создаем поток записи движения
                     stream.destroy_output_container()
                     stream.create_output_container(CameraStorage.video_detections_path(stream.camera))
+                    # Клип начинается с буфера пакетов перед событием
+                    recording.start = event.timestamp - timedelta(seconds=stream.pre_event_duration())
                 else:
                     event_entity.camera_recording_id = founded_record.id
 
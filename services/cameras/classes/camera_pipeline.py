@@ -0,0 +1,318 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Optional
+
+from classes.logger.logger import Logger
+from classes.logger.logger_types import LoggerType
+from models.camera_stream_model import CameraPipelineStageModel
+
+# Стадии конвейера камеры
+STAGE_INGEST = 'ingest'
+STAGE_DECODE = 'decode'
+STAGE_ANALYSIS = 'analysis'
+STAGE_RECORD = 'record'
+STAGE_PUBLISH = 'publish'
+
+
+class DropPolicy(str, Enum):
+    """Что делать с элементом, если очередь стадии заполнена"""
+    # Вытесняется самый старый элемент: стадии нужен только свежий кадр
+    DROP_OLDEST = 'drop_oldest'
+    # Отбрасывается новый элемент: очередь сохраняет непрерывность уже принятого
+    DROP_NEWEST = 'drop_newest'
+    # Очередь сбрасывается целиком, новые элементы отбрасываются до ключевого кадра
+    KEYFRAME = 'keyframe'
+
+
+@dataclass(slots=True)
+class StageEntry:
+    item: Any
+    epoch: int
+    enqueued: float
+
+
+class StageMetrics:
+    """Счетчики и задержки стадии по последним window элементам"""
+
+    def __init__(self, window: int = 256):
+        self._lock = threading.Lock()
+        self.processed: int = 0
+        self.dropped: int = 0
+        self._waits: deque[float] = deque(maxlen=window)
+        self._processes: deque[float] = deque(maxlen=window)
+
+    def observe(self, wait: float, process: float):
+        with self._lock:
+            self.processed += 1
+            self._waits.append(wait)
+            self._processes.append(process)
+
+    def drop(self, count: int = 1):
+        with self._lock:
+            self.dropped += count
+
+    def snapshot(self, name: str, **kwargs) -> CameraPipelineStageModel:
+        with self._lock:
+            waits = list(self._waits)
+            processes = list(self._processes)
+            processed = self.processed
+            dropped = self.dropped
+
+        latencies = sorted(wait + process for wait, process in zip(waits, processes))
+        count = len(latencies)
+        return CameraPipelineStageModel(
+            name=name,
+            processed=processed,
+            dropped=dropped,
+            wait_ms=round(sum(waits) / count * 1000, 2) if count else 0,
+            process_ms=round(sum(processes) / count * 1000, 2) if count else 0,
+            latency_p95_ms=round(latencies[min(count - 1, int(count * 0.95))] * 1000, 2) if count else 0,
+            latency_max_ms=round(latencies[-1] * 1000, 2) if count else 0,
+            **kwargs
+        )
+
+
+class StageQueue:
+    """Ограниченная очередь между стадиями. Запись никогда не блокирует производителя:
+    при переполнении элементы отбрасываются согласно политике и учитываются в метриках
+    """
+
+    def __init__(self, capacity: int, policy: DropPolicy, metrics: StageMetrics):
+        self.capacity = capacity
+        self.policy = policy
+        self.metrics = metrics
+        self.closed: bool = False
+        self._items: deque[StageEntry] = deque()
+        self._cond = threading.Condition()
+        self._waiting_keyframe: bool = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item: Any, epoch: int, keyframe: bool = True) -> bool:
+        with self._cond:
+            if self.closed:
+                return False
+
+            if self._waiting_keyframe:
+                if not keyframe:
+                    self.metrics.drop()
+                    return False
+                self._waiting_keyframe = False
+
+            if len(self._items) >= self.capacity:
+                if self.policy == DropPolicy.DROP_OLDEST:
+                    self._items.popleft()
+                    self.metrics.drop()
+                elif self.policy == DropPolicy.DROP_NEWEST:
+                    self.metrics.drop()
+                    return False
+                else:
+                    # Без пропущенных пакетов следующий кадр не декодируется - ждем ключевой
+                    self.metrics.drop(len(self._items))
+                    self._items.clear()
+                    if not keyframe:
+                        self._waiting_keyframe = True
+                        self.metrics.drop()
+                        return False
+
+            self._items.append(StageEntry(item=item, epoch=epoch, enqueued=time.perf_counter()))
+            self._cond.notify()
+            return True
+
+    def get(self, timeout: float) -> Optional[StageEntry]:
+        with self._cond:
+            if not self._items and not self.closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+            self._waiting_keyframe = False
+
+    def open(self):
+        with self._cond:
+            self.closed = False
+            self._items.clear()
+            self._waiting_keyframe = False
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+
+class PipelineStage:
+    """Стадия конвейера: свой поток, читающий свою очередь.
+    tick вызывается после каждого элемента и раз в tick_interval без элементов
+    """
+
+    def __init__(
+            self,
+            pipeline: "CameraPipeline",
+            name: str,
+            handler: Callable[[Any], None],
+            capacity: int,
+            policy: DropPolicy,
+            tick: Optional[Callable[[], None]] = None,
+            tick_interval: float = 1.0
+    ):
+        self.pipeline = pipeline
+        self.name = name
+        self.handler = handler
+        self.tick = tick
+        self.tick_interval = tick_interval
+        self.metrics = StageMetrics()
+        self.queue = StageQueue(capacity=capacity, policy=policy, metrics=self.metrics)
+        self.thread: Optional[threading.Thread] = None
+        # Поток, не успевший завершиться при stop, не должен продолжить работу после start
+        self.generation: int = 0
+        # Удерживается на время обработки элемента, reset ждет его освобождения
+        self.busy = threading.Lock()
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.generation += 1
+        self.queue.open()
+        self.thread = threading.Thread(
+            target=self._run,
+            args=(self.generation,),
+            daemon=True,
+            name=f"Camera-{self.name}-{self.pipeline.name}"
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float):
+        self.generation += 1
+        self.queue.close()
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.thread = None
+
+    def is_current(self) -> bool:
+        return self.thread is threading.current_thread()
+
+    def _run(self, generation: int):
+        while generation == self.generation and not self.queue.closed:
+            entry = self.queue.get(self.tick_interval)
+            with self.busy:
+                if entry is not None and entry.epoch == self.pipeline.epoch:
+                    started = time.perf_counter()
+                    try:
+                        self.handler(entry.item)
+                    except Exception as e:
+                        Logger.err(f"⚠️ [{self.pipeline.name}] Pipeline stage {self.name} error: {e}",
+                                   LoggerType.CAMERAS)
+                    self.metrics.observe(started - entry.enqueued, time.perf_counter() - started)
+
+                if self.tick is not None and not self.queue.closed:
+                    try:
+                        self.tick()
+                    except Exception as e:
+                        Logger.err(f"⚠️ [{self.pipeline.name}] Pipeline stage {self.name} tick error: {e}",
+                                   LoggerType.CAMERAS)
+
+    def stats(self) -> CameraPipelineStageModel:
+        return self.metrics.snapshot(
+            self.name,
+            policy=self.queue.policy.value,
+            capacity=self.queue.capacity,
+            queued=len(self.queue)
+        )
+
+
+class CameraPipeline:
+    """Конвейер кадров камеры.
+
+    Поток чтения (ingest) только раздает пакеты по очередям стадий, каждая стадия работает
+    в своем потоке. Очереди ограничены и никогда не блокируют запись, поэтому отставание
+    одной стадии (например, анализа) не задерживает чтение потока и запись видео.
+    Элементы, поставленные до reset (перезапуск входного потока), стадиями не обрабатываются.
+    """
+
+    def __init__(self, name: str, stop_timeout: float = 5.0):
+        self.name = name
+        self.stop_timeout = stop_timeout
+        self.epoch: int = 0
+        self.ingest = StageMetrics()
+        self.stages: dict[str, PipelineStage] = {}
+
+    def add_stage(
+            self,
+            name: str,
+            handler: Callable[[Any], None],
+            capacity: int,
+            policy: DropPolicy,
+            tick: Optional[Callable[[], None]] = None,
+            tick_interval: float = 1.0
+    ) -> PipelineStage:
+        stage = PipelineStage(
+            pipeline=self,
+            name=name,
+            handler=handler,
+            capacity=capacity,
+            policy=policy,
+            tick=tick,
+            tick_interval=tick_interval
+        )
+        self.stages[name] = stage
+        return stage
+
+    def start(self):
+        for stage in self.stages.values():
+            stage.start()
+
+    def stop(self):
+        self.epoch += 1
+        for stage in self.stages.values():
+            stage.stop(self.stop_timeout)
+
+    def put(self, stage: str, item: Any, keyframe: bool = True) -> bool:
+        """Передает элемент стадии, не блокируя вызывающий поток"""
+        return self.stages[stage].queue.put(item, self.epoch, keyframe)
+
+    def observe_ingest(self, started: float):
+        """Учитывает обработку пакета потоком чтения (started - time.perf_counter())"""
+        self.ingest.observe(0, time.perf_counter() - started)
+
+    def reset(self):
+        """Отбрасывает элементы в очередях и дожидается окончания обработки текущих (не дольше stop_timeout).
+        Вызывается перед закрытием контейнеров, с которыми работают стадии
+        """
+        self.epoch += 1
+        for stage in self.stages.values():
+            stage.queue.clear()
+        for stage in self.stages.values():
+            if stage.thread is None or stage.is_current():
+                continue
+            if stage.busy.acquire(timeout=self.stop_timeout):
+                stage.busy.release()
+            else:
+                Logger.warn(f"⚠️ [{self.name}] Pipeline stage {stage.name} is still busy", LoggerType.CAMERAS)
+
+    def stats(self) -> list[CameraPipelineStageModel]:
+        return [self.ingest.snapshot(STAGE_INGEST)] + [stage.stats() for stage in self.stages.values()]
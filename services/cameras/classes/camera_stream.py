@@ -15,33 +15,41 @@
 
 import asyncio
 from datetime import datetime
+from fractions import Fraction
 import os
-import queue
 import threading
 import time
 from typing import TYPE_CHECKING, Optional, Union
 
 import av
 import cv2
-import imutils
 import numpy as np
 from av import VideoFrame
+from av.codec.context import Flags as CodecFlags
 from pydantic import BaseModel
 
 from classes.logger.logger_types import LoggerType
 from config.dependencies import get_ecosystem
+from config.settings import settings
 from classes.logger.logger import Logger
 from classes.storages.camera_storage import CameraStorage
 from classes.storages.filesystem import Filesystem
 from classes.thread.daemon import Daemon
 
+from entities.enums.camera_decode_thread_type_enum import CameraDecodeThreadTypeEnum
 from entities.enums.camera_record_type_enum import CameraRecordTypeEnum
 from models.camera_model import CameraModelWithRelations
 from models.enums.log_code import LogCode
 from models.log_model import LogEntityCode
 from repositories.camera_events_repository import CameraEventsRepository
 from repositories.camera_repository import CameraRepository
+from services.cameras.classes.analysis_governor import AnalysisGovernor, AnalysisMode
 from services.cameras.classes.camera_notifier import CameraNotifier
+from services.cameras.classes.camera_pipeline import CameraPipeline, DropPolicy, STAGE_DECODE, STAGE_ANALYSIS, \
+    STAGE_RECORD, STAGE_PUBLISH
+from services.cameras.classes.mjpeg_hub import MjpegHub, MjpegProfile, mjpeg_part
+from services.cameras.classes.packet_ring_buffer import PacketRingBuffer
+from services.cameras.classes.shared_frame import SharedFrame, freeze
 from services.cameras.classes.stream_registry import StreamRegistry, StreamState
 from services.cameras.utils.cameras_helpers import get_no_signal_frame
 
@@ -53,6 +61,10 @@ if TYPE_CHECKING:
 from services.cameras.classes.roi_tracker import ROIDetectionEvent
 from services.cameras.classes.roi_tracker import ROITracker
 
+# Кодеки, которые можно писать в fMP4 без перекодирования
+PASSTHROUGH_VIDEO_CODECS = ('h264', 'hevc')
+PASSTHROUGH_AUDIO_CODECS = ('aac',)
+
 
 class ScreenshotResultModel(BaseModel):
     success: bool = False
@@ -61,6 +73,20 @@ class ScreenshotResultModel(BaseModel):
     ecosystem: "Ecosystem" = None
 
 
+def copy_packet(packet: av.Packet) -> av.Packet:
+    """Копия пакета для записи: mux забирает данные пакета себе,
+    а исходный пакет еще нужен стадии декодирования
+    """
+    copy = av.Packet(bytes(packet))
+    copy.pts = packet.pts
+    copy.dts = packet.dts
+    copy.duration = packet.duration
+    copy.stream = packet.stream
+    copy.time_base = packet.time_base
+    copy.is_keyframe = packet.is_keyframe
+    return copy
+
+
 class CameraStream:
     def __init__(self, camera: CameraModelWithRelations):
         self._stop_requested = False  # Добавляем флаг остановки
@@ -73,10 +99,6 @@ class CameraStream:
         self.camera: Optional[CameraModelWithRelations] = None
         self.link: Optional[str] = None
 
-        # Timer processing settings
-        self.silence_timer: float = 0
-        self.silence_pause: int = 10
-
         # Frame processing
         self.font = cv2.FONT_HERSHEY_SIMPLEX
         self.delay_counter = 0
@@ -105,6 +127,7 @@ class CameraStream:
         self.path: Optional[str] = None
         self.screen_interval: int = 30
         self.screen_timer: float = 0
+        self.screenshot_part_start: float = 0
 
         # PyAV containers
         self.input_container: Optional[Union[av.container.InputContainer | av.Stream]] = None
@@ -113,6 +136,20 @@ class CameraStream:
         self.audio_output_stream = None
         self.write: bool = False
 
+        # Passthrough (копирование пакетов без перекодирования)
+        self.passthrough: bool = False
+        self.audio_passthrough: bool = False
+        self.passthrough_start: Optional[Fraction] = None
+
+        # Буфер пакетов перед событием для клипов движения
+        self.pre_event = PacketRingBuffer(seconds=settings.CAMERA_PRE_EVENT_SECONDS or 0)
+        self.pre_event_enabled: bool = False
+        self._pre_event_pending: bool = False
+
+        # Декодирование только ключевых кадров (режим скриншотов)
+        self._keyframes_only: bool = False
+        self._decode_resync: bool = False
+
         # Error handling
         self.capture_error: Optional[bool] = None
         self.output_file: Optional[str] = None
@@ -130,13 +167,28 @@ class CameraStream:
         # For permanent events
         self.permanent_event: Optional["CameraEventModel"] = None
 
-        self._container_lock = threading.Lock()
-
-        # Атрибуты для асинхронной генерации
-        self.frame_queue = queue.Queue(maxsize=2)  # Буфер на 2 кадра
-        self.frame_generation_thread = None
-        self.frame_generation_running = False
-        self.frame_generation_lock = threading.Lock()
+        # Контейнер записи используется стадией записи и потоками уведомлений
+        self._container_lock = threading.RLock()
+        self.last_flush_time: float = 0
+        self.flush_interval: int = 30  # Флашим каждые 30 секунд
+        # Частота и разрешение анализа движения
+        self.governor = AnalysisGovernor()
+
+        # Конвейер: чтение -> декодирование -> анализ / запись / публикация.
+        # Анализ и публикации нужен только последний кадр, запись и декодирование
+        # при переполнении пропускают пакеты до следующего ключевого кадра
+        self.pipeline = CameraPipeline(name=camera.name)
+        self.pipeline.add_stage(STAGE_DECODE, self._decode_packet, capacity=128, policy=DropPolicy.KEYFRAME)
+        self.pipeline.add_stage(STAGE_ANALYSIS, self._analyze_frame, capacity=1, policy=DropPolicy.DROP_OLDEST)
+        self.pipeline.add_stage(STAGE_RECORD, self._record_item, capacity=64, policy=DropPolicy.KEYFRAME,
+                                tick=self._record_tick)
+        self.pipeline.add_stage(STAGE_PUBLISH, self._publish_frame, capacity=1, policy=DropPolicy.DROP_OLDEST)
+
+        # MJPEG трансляция: кадр кодируется один раз на профиль для всех зрителей
+        self.frame_seq: int = 0
+        self._decoded_seq: int = 0
+        self._no_signal_frame: Optional[np.ndarray] = None
+        self.mjpeg_hub = MjpegHub(name=camera.name, source=self._mjpeg_source)
 
         # Регистрируем callback для перезапуска
         StreamRegistry.register_restart_callback(self._handle_registry_state_change)
@@ -163,12 +215,9 @@ class CameraStream:
         self._last_registry_state = new_state
 
         if new_state == StreamState.RESTARTING:
-            # Останавливаем генерацию кадров при перезапуске
+            # Останавливаем генерацию кадров при перезапуске,
+            # новые подписчики запустят ее снова
             self.stop_frame_generation()
-        elif new_state == StreamState.RUNNING:
-            # При возврате в running состояние можно автоматически перезапустить
-            if self.opened and self.camera.active:
-                self.start_frame_generation()
 
     # Event handlers (unchanged)
     def handle_motion_start(self, event: "ROIDetectionEvent"):
@@ -200,36 +249,35 @@ class CameraStream:
             proto = camera.protocol
         return f'{proto.lower()}://{userinfo}{camera.ip}:{port}/{stream}'
 
-    def set_camera(self, camera: CameraModelWithRelations):
+    def set_camera(self, camera: CameraModelWithRelations, restart: bool = False):
+        """Применяет конфигурацию камеры.
+        restart - изменились параметры подключения или записи (событие кэша конфигурации камер)
+        """
         self.need_skip = True
-        if self.camera is not None and self.camera.model_dump() != camera.model_dump():
-            changed_fields = {
-                field: (getattr(self.camera, field), new_value)
-                for field, new_value in camera.model_dump().items()
-                if hasattr(self.camera, field)
-                   and new_value is not None  # Игнорируем None в обновлении
-                   and getattr(self.camera, field) != new_value
-            }
-
-            if changed_fields and not 'cover' in changed_fields:
-                Logger.debug(f"Changes detected in {self.camera.name}: {changed_fields}", LoggerType.CAMERAS)
-                Logger.debug(f'{self.camera.name} was changed! Changes: {changed_fields}', LoggerType.CAMERAS)
-                self.need_restart = True
+        previous = self.camera
+        if previous is not None and restart:
+            Logger.debug(f'{previous.name} was changed, restart stream', LoggerType.CAMERAS)
+            self.need_restart = True
 
         self.camera = camera
         self.id = self.camera.id
         self.link = self.prepare_link(self.camera)
         self.path = os.path.join(self.camera.storage.path, str(self.camera.id))
 
-        if self.camera.record_mode != camera.record_mode:
+        if previous is not None and previous.record_mode != camera.record_mode:
             self.destroy_output_container()
             self.time_part_start = 0
+            self.screenshot_part_start = 0
 
         if isinstance(self.tracker, ROITracker):
             self.tracker.update_all_rois(self.camera.areas)
 
         self.need_skip = False
 
+    def update_state(self, camera: CameraModelWithRelations):
+        """Обновляет состояние камеры (online, обложка) без перенастройки потока"""
+        self.camera = camera
+
     def date_filename(self):
         return datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')
 
@@ -257,9 +305,9 @@ class CameraStream:
     #     return CameraStorage.get_cover(camera=self.camera, width=w)
 
     def get_current_frame(self) -> np.ndarray:
-        """Безопасно возвращает текущий кадр"""
+        """Безопасно возвращает текущий кадр (только для чтения)"""
         if self.resized is not None and self.opened:
-            return self.resized.copy()  # Делаем копию для потокобезопасности
+            return self.resized
         return self.get_no_signal_frame()
 
     def _create_input_container(self):
@@ -268,9 +316,15 @@ class CameraStream:
             'timeout': '5000000',  # 5 seconds timeout
             'max_delay': '500000',  # Max packet delay
         }
+        if self.camera.decode_low_delay:
+            # Не буферизуем входной поток
+            options['fflags'] = 'nobuffer'
+            options['flags'] = 'low_delay'
 
         try:
             self.input_container = av.open(self.link, options=options, timeout=10)
+            self._configure_decoder()
+            self._configure_pre_event()
             self.capture_error = False
             if not self.camera.online:
                 CameraRepository.set_online(camera_id=self.camera.id)
@@ -306,6 +360,41 @@ class CameraStream:
             # Set offline
             self._create_input_container()
 
+    def _configure_decoder(self):
+        """Настройки декодера камеры. Применяются до первого декодирования, пока кодек не открыт"""
+        self._keyframes_only = False
+        self._decode_resync = False
+
+        thread_type = self.camera.decode_thread_type
+        if thread_type is None and self.camera.decode_low_delay:
+            # Многопоточность по кадрам задерживает каждый кадр на число потоков
+            thread_type = CameraDecodeThreadTypeEnum.SLICE
+
+        for stream in self.input_container.streams.video:
+            codec_context = stream.codec_context
+            if self.camera.decode_threads is not None:
+                codec_context.thread_count = self.camera.decode_threads
+            if thread_type is not None:
+                codec_context.thread_type = thread_type.value
+            if self.camera.decode_low_delay:
+                codec_context.flags |= CodecFlags.low_delay
+
+    def _configure_pre_event(self):
+        """Буфер пакетов перед событием: клипы движения в режиме passthrough начинаются
+        за несколько секунд до срабатывания. Пакеты старого входного потока отбрасываются
+        """
+        self.pre_event.clear()
+        self._pre_event_pending = False
+        self.pre_event_enabled = (
+                self.pre_event.seconds > 0
+                and self.is_video_detection_mode()
+                and self.is_passthrough_mode()
+        )
+
+    def pre_event_duration(self) -> float:
+        """Сколько секунд до текущего момента будет записано в начало нового клипа"""
+        return self.pre_event.duration() if self.pre_event_enabled else 0
+
     def create_input_container(self):
         if self.input_container is None:
             self._create_input_container()
@@ -333,6 +422,21 @@ class CameraStream:
     def is_detection_mode(self):
         return self.is_screenshot_detection_mode() or self.is_video_detection_mode()
 
+    def is_keyframes_only(self):
+        """Достаточно ключевых кадров: камера только делает периодические скриншоты
+        и трансляцию никто не смотрит
+        """
+        return self.is_screenshots_mode() and self.mjpeg_hub.subscribers_count() == 0
+
+    def is_passthrough_mode(self):
+        """Запись копированием пакетов H.264/H.265 без перекодирования"""
+        if not self.camera.record_passthrough:
+            return False
+        if self.input_container is None or len(self.input_container.streams.video) == 0:
+            return False
+        codec_name = self.input_container.streams.video[0].codec_context.name
+        return codec_name in PASSTHROUGH_VIDEO_CODECS
+
     def stop_write_video(self):
         self.write = False
 
@@ -376,6 +480,48 @@ class CameraStream:
             self.destroy_output_container()
             return False
 
+    def write_packet_safe(self, packet: av.Packet):
+        """Копирует пакет входного потока в выходной контейнер (remux)"""
+        if self.output_container is None or packet is None or packet.dts is None:
+            return False
+
+        in_stream = packet.stream
+        if in_stream.type == 'video':
+            out_stream = self.output_stream
+        elif in_stream.type == 'audio' and self.audio_passthrough:
+            out_stream = self.audio_output_stream
+        else:
+            return False
+
+        if out_stream is None:
+            return False
+
+        # Файл должен начинаться с ключевого кадра, все что до него - отбрасываем
+        if self.passthrough_start is None:
+            if in_stream.type != 'video' or not packet.is_keyframe:
+                return False
+            self.passthrough_start = packet.dts * in_stream.time_base
+
+        try:
+            # Сдвигаем временные метки так, чтобы запись начиналась с нуля
+            offset = int(self.passthrough_start / in_stream.time_base)
+            if packet.dts < offset:
+                return False
+            packet.dts -= offset
+            if packet.pts is not None:
+                packet.pts -= offset
+
+            packet.stream = out_stream
+            self.output_container.mux(packet)
+            return True
+
+        except EOFError as e:
+            self.destroy_output_container()
+        except Exception as e:
+            Logger.err(f"[{self.camera.name}] PyAV Remux Error: {e}", LoggerType.CAMERAS)
+            self.destroy_output_container()
+            return False
+
     def is_file_valid(self, filepath: str) -> bool:
         try:
             with av.open(filepath) as container:
@@ -391,131 +537,160 @@ class CameraStream:
             return False
 
     def destroy_output_container(self):
-        if self.output_container is None:
-            return
+        with self._container_lock:
+            if self.output_container is None:
+                return
 
-        try:
-            # Сначала флашим все данные
-            self.flush_output_container()
+            try:
+                # Сначала флашим все данные
+                self.flush_output_container()
 
-            # Затем закрываем контейнер
-            if self.output_container is not None:
-                self.output_container.close()
-                Logger.debug(f"🔳️ [{self.camera.name}] Output container stopped: {self.output_file}",
-                             LoggerType.CAMERAS)
+                # Затем закрываем контейнер
+                if self.output_container is not None:
+                    self.output_container.close()
+                    Logger.debug(f"🔳️ [{self.camera.name}] Output container stopped: {self.output_file}",
+                                 LoggerType.CAMERAS)
 
-            # Обработка постоянных событий
-            if self.is_record_permanent() and self.permanent_event is not None:
-                try:
-                    CameraEventsRepository.close_permanent_event(
-                        event=self.permanent_event
-                    )
-                    Logger.debug(f'🎬 [{self.camera.name}] Permanent event end: #ID{self.permanent_event.id}]')
-                except Exception as e:
-                    Logger.debug(f"[{self.camera.name}] Error closing permanent event: {e}", LoggerType.CAMERAS)
+                # Обработка постоянных событий
+                if self.is_record_permanent() and self.permanent_event is not None:
+                    try:
+                        CameraEventsRepository.close_permanent_event(
+                            event=self.permanent_event
+                        )
+                        Logger.debug(f'🎬 [{self.camera.name}] Permanent event end: #ID{self.permanent_event.id}]')
+                    except Exception as e:
+                        Logger.debug(f"[{self.camera.name}] Error closing permanent event: {e}", LoggerType.CAMERAS)
 
-        except Exception as e:
-            Logger.debug(f"[{self.camera.name}] Error during container destruction: {e}", LoggerType.CAMERAS)
-        finally:
-            # Всегда сбрасываем состояние
-            self.output_container = None
-            self.output_stream = None
-            if hasattr(self, 'audio_output_stream'):
-                self.audio_output_stream = None
-            self.output_file = None
-            self.time_part_start = 0
-            self.permanent_event = None
+            except Exception as e:
+                Logger.debug(f"[{self.camera.name}] Error during container destruction: {e}", LoggerType.CAMERAS)
+            finally:
+                # Всегда сбрасываем состояние
+                self.output_container = None
+                self.output_stream = None
+                if hasattr(self, 'audio_output_stream'):
+                    self.audio_output_stream = None
+                self.output_file = None
+                self.time_part_start = 0
+                self.permanent_event = None
+                self.passthrough = False
+                self.audio_passthrough = False
+                self.passthrough_start = None
 
     def create_output_container(self, path: str):
-        # не стартуем, если поток должен быть закрыт (exit приложения)
-        if not self.opened:
-            return
+        with self._container_lock:
+            # не стартуем, если поток должен быть закрыт (exit приложения)
+            if not self.opened:
+                return
 
-        self.video_pts = 0
-        self.audio_pts = 0
+            self.video_pts = 0
+            self.audio_pts = 0
+            self.passthrough = self.is_passthrough_mode()
+            self.audio_passthrough = False
+            self.passthrough_start = None
+            # Клип движения начнется с содержимого буфера
+            self._pre_event_pending = self.pre_event_enabled and self.passthrough
 
-        if not Filesystem.exists(path):
-            Filesystem.mkdir(path, recursive=True)
+            if not Filesystem.exists(path):
+                Filesystem.mkdir(path, recursive=True)
 
-        filename = f"{self.date_filename()}.mp4"
-        full_path = os.path.join(path, filename)
+            filename = f"{self.date_filename()}.mp4"
+            full_path = os.path.join(path, filename)
 
-        try:
-            # Используем movflags для фрагментированного MP4
-            options = {
-                'movflags': 'frag_keyframe+empty_moov+default_base_moof',
-                # 'fragment_duration': '1000',  # 1 секунда между фрагментами
-            }
-
-            # Create output container
-            self.output_container = av.open(
-                full_path,
-                mode='w',
-                options=options)
-
-            # Get frame info from input or use defaults
-            if self.input_container is not None and len(self.input_container.streams.video) > 0:
-                input_video_stream = self.input_container.streams.video[0]
-                width = input_video_stream.width
-                height = input_video_stream.height
-                fps = input_video_stream.average_rate
-                codec_name = 'h264'
-
-                # Add video stream to container
-                self.output_stream = self.output_container.add_stream(codec_name, rate=fps)
-                self.output_stream.width = width
-                self.output_stream.height = height
-                self.output_stream.pix_fmt = 'yuv420p'
-                self.output_stream.time_base = input_video_stream.time_base
-
-                # Add audio stream if exists
-                if len(self.input_container.streams.audio) > 0:
-                    input_audio_stream = self.input_container.streams.audio[0]
-                    in_audio_ctx = input_audio_stream.codec_context
-                    self.audio_output_stream = self.output_container.add_stream(
-                        'aac',
-                        rate=in_audio_ctx.sample_rate,
-                        layout=in_audio_ctx.layout.name,
-                    )
-                    self.audio_output_stream.time_base = input_audio_stream.time_base
-            else:
-                # Fallback values if no input stream
-                width, height = 640, 480
-                fps = 25
-                codec_name = 'h264'
-                self.output_stream = self.output_container.add_stream(codec_name, rate=fps)
-                self.output_stream.width = width
-                self.output_stream.height = height
-                self.output_stream.pix_fmt = 'yuv420p'
-
-            self.output_file = full_path
-            Logger.debug(f"[{self.camera.name}] Output container started: {full_path}", LoggerType.CAMERAS)
-            return True
+            try:
+                # Используем movflags для фрагментированного MP4
+                options = {
+                    'movflags': 'frag_keyframe+empty_moov+default_base_moof',
+                    # 'fragment_duration': '1000',  # 1 секунда между фрагментами
+                }
+
+                # Create output container
+                self.output_container = av.open(
+                    full_path,
+                    mode='w',
+                    options=options)
+
+                # Get frame info from input or use defaults
+                if self.input_container is not None and len(self.input_container.streams.video) > 0:
+                    input_video_stream = self.input_container.streams.video[0]
+                    width = input_video_stream.width
+                    height = input_video_stream.height
+                    fps = input_video_stream.average_rate
+                    codec_name = 'h264'
+
+                    if self.passthrough:
+                        # Копируем параметры кодека входного потока, пакеты пишутся как есть
+                        self.output_stream = self.output_container.add_stream_from_template(input_video_stream)
+                    else:
+                        # Add video stream to container
+                        self.output_stream = self.output_container.add_stream(codec_name, rate=fps)
+                        self.output_stream.width = width
+                        self.output_stream.height = height
+                        self.output_stream.pix_fmt = 'yuv420p'
+                        self.output_stream.time_base = input_video_stream.time_base
+
+                    # Add audio stream if exists
+                    if len(self.input_container.streams.audio) > 0:
+                        input_audio_stream = self.input_container.streams.audio[0]
+                        in_audio_ctx = input_audio_stream.codec_context
+                        if self.passthrough and in_audio_ctx.name in PASSTHROUGH_AUDIO_CODECS:
+                            self.audio_passthrough = True
+                            self.audio_output_stream = self.output_container.add_stream_from_template(
+                                input_audio_stream
+                            )
+                        else:
+                            # G.711 и прочие кодеки камер не поддерживаются MP4 - перекодируем в AAC
+                            self.audio_output_stream = self.output_container.add_stream(
+                                'aac',
+                                rate=in_audio_ctx.sample_rate,
+                                layout=in_audio_ctx.layout.name,
+                            )
+                            self.audio_output_stream.time_base = input_audio_stream.time_base
+                else:
+                    # Fallback values if no input stream
+                    self.passthrough = False
+                    width, height = 640, 480
+                    fps = 25
+                    codec_name = 'h264'
+                    self.output_stream = self.output_container.add_stream(codec_name, rate=fps)
+                    self.output_stream.width = width
+                    self.output_stream.height = height
+                    self.output_stream.pix_fmt = 'yuv420p'
+
+                self.output_file = full_path
+                Logger.debug(
+                    f"[{self.camera.name}] Output container started: {full_path}, passthrough={self.passthrough}",
+                    LoggerType.CAMERAS)
+                return True
 
-        except Exception as e:
-            Logger.err(f"[{self.camera.name}] Failed to initialize output container: {e}", LoggerType.CAMERAS)
-            self.output_container = None
-            self.output_stream = None
-            self.audio_output_stream = None
-            return False
+            except Exception as e:
+                Logger.err(f"[{self.camera.name}] Failed to initialize output container: {e}", LoggerType.CAMERAS)
+                self.output_container = None
+                self.output_stream = None
+                self.audio_output_stream = None
+                self.passthrough = False
+                self.audio_passthrough = False
+                return False
 
     def flush_output_container(self):
-        if self.output_container is None:
-            return
-
-        try:
-            # Для видео
-            if self.output_stream is not None:
-                for packet in self.output_stream.encode(None):  # Flush encoder
-                    self.output_container.mux(packet)
+        with self._container_lock:
+            if self.output_container is None:
+                return
 
-            # Для аудио, если есть
-            if hasattr(self, 'audio_output_stream') and self.audio_output_stream is not None:
-                for packet in self.audio_output_stream.encode(None):
-                    self.output_container.mux(packet)
+            try:
+                # Для видео (в режиме passthrough кодировщика нет)
+                if self.output_stream is not None and not self.passthrough:
+                    for packet in self.output_stream.encode(None):  # Flush encoder
+                        self.output_container.mux(packet)
+
+                # Для аудио, если есть
+                if (hasattr(self, 'audio_output_stream')
+                        and self.audio_output_stream is not None
+                        and not self.audio_passthrough):
+                    for packet in self.audio_output_stream.encode(None):
+                        self.output_container.mux(packet)
 
-        except Exception as e:
-            Logger.err(f"[{self.camera.name}] Error during flush: {e}", LoggerType.CAMERAS)
+            except Exception as e:
+                Logger.err(f"[{self.camera.name}] Error during flush: {e}", LoggerType.CAMERAS)
 
     def is_stream_alive(self):
         """Проверяет, активен ли поток, включая проверку на зависание"""
@@ -550,13 +725,10 @@ class CameraStream:
         return isinstance(self.input_container, av.container.InputContainer)
 
     def loop_frames(self):
+        """Стадия чтения: демультиплексирует входной поток и раздает пакеты стадиям конвейера"""
         try:
-            first_run: bool = True
             need_create_input = False
 
-            last_flush_time = time.time()
-            flush_interval = 30  # Флашим каждые 30 секунд
-
             if self.input_container is None:
                 need_create_input = True
 
@@ -576,6 +748,9 @@ class CameraStream:
             # Initialize PTS counters
             self.video_pts = 0
             self.audio_pts = 0
+            self.last_flush_time = time.time()
+            self.governor = AnalysisGovernor()
+            self.pipeline.start()
 
             while self.camera.active and self.opened and not self._stop_requested:
                 try:
@@ -591,12 +766,6 @@ class CameraStream:
                     # Проверяем, нужно ли перезапустить контейнер
                     current_time = time.time()
 
-                    # Периодический flush
-                    if current_time - last_flush_time > flush_interval:
-                        with self._container_lock:
-                            self.flush_output_container()
-                        last_flush_time = current_time
-
                     if self.need_restart and (current_time - self.last_restart_time) > self.restart_delay:
                         self._perform_restart()
                         continue
@@ -611,98 +780,10 @@ class CameraStream:
                         if not self.camera.active and not self.opened:
                             break
 
-                        if not self.camera.active and not self.opened:
-                            break
-
                         if self.need_skip or self.need_restart:
                             break
 
-                        # Демультиплексируем пакеты в фреймы
-                        for frame in packet.decode():
-                            self.last_frame_time = time.time()  # Обновляем время последнего кадра
-                            if (isinstance(frame, av.AudioFrame)
-                                    and hasattr(self, 'audio_output_stream')
-                                    and self.audio_output_stream is not None):
-                                # Обработка аудиофреймов
-                                if self.output_container is not None and self.write:
-                                    # Устанавливаем PTS для аудио
-                                    if not hasattr(self, 'audio_pts'):
-                                        self.audio_pts = 0
-                                    frame.pts = self.audio_pts
-                                    self.audio_pts += frame.samples
-
-                                    # Кодируем и записываем аудиофрейм
-                                    for packet in self.audio_output_stream.encode(frame):
-                                        if self.audio_output_stream is not None:
-                                            self.output_container.mux(packet)
-                                        else:
-                                            break
-                                else:
-                                    self.destroy_output_container()
-                                continue
-
-                            if isinstance(frame, av.VideoFrame):
-                                # Обработка видеофреймов
-                                self.original = frame.to_ndarray(format='bgr24')
-                                self.resized = imutils.resize(self.original, width=640)
-
-                                # Start permanent record or permanent screenshots
-                                if self.is_record_permanent() and self.time_part_start == 0:
-                                    self.time_part_start = time.time()
-
-                                    if self.is_screenshots_mode():
-                                        res = CameraStorage.take_screenshot(self.camera, self.original)
-                                        Logger.debug(
-                                            f"[Camera {self.camera.name}] Take screenshot: success={res.success}, fn={res.filename}, dir={res.directory}]",
-                                            LoggerType.CAMERAS)
-                                    elif self.is_video_mode() and (self.output_container is None):
-                                        self.create_output_container(CameraStorage.video_path(self.camera))
-                                        self.write = True
-                                        # Create event
-                                        self.permanent_event = CameraEventsRepository.add_permanent_event(
-                                            camera=self.camera,
-                                            frame=self.original,
-                                            record_path=self.output_file
-                                        )
-                                        Logger.debug(
-                                            f'🎬 [{self.camera.name}] Permanent event start: #ID{self.permanent_event.id}]',
-                                            LoggerType.CAMERAS)
-
-                                    Logger.debug(
-                                        f'📽 [{self.camera.name}] with permanent record mode: {self.camera.record_mode}',
-                                        LoggerType.CAMERAS)
-
-                                # Take cover
-                                now = time.time()
-                                elapsed = now - self.screen_timer
-
-                                if elapsed > self.screen_interval:
-                                    CameraStorage.upload_cover(self.camera, self.original)
-                                    self.screen_timer = now
-
-                                # Write frames to output container if needed
-                                with self._container_lock:
-                                    if self.output_container is not None and self.write:
-                                        self.write_frame_safe(frame)
-                                    else:
-                                        self.destroy_output_container()
-
-                                pause = time.time() - self.silence_timer
-
-                                if self.is_detection_mode() and (pause > self.silence_pause or first_run is True):
-                                    frame_copy = self.resized.copy()
-                                    changes = self.tracker.detect_changes(frame_copy, self.original)
-                                    __frame = self.tracker.draw_rois(frame_copy, changes)
-
-                                elif self.is_record_permanent():
-                                    record_part_diff = time.time() - self.time_part_start
-                                    if record_part_diff > self.camera.record_duration * 60:
-                                        self.destroy_output_container()
-                                        Logger.debug(f'Camera {self.camera.name} end record video part',
-                                                     LoggerType.CAMERAS)
-
-                                first_run = False
-
+                        self._dispatch_packet(packet)
 
                 except EOFError as e:
                     if not self._stop_requested:  # Проверяем флаг перед обработкой ошибок
@@ -724,6 +805,8 @@ class CameraStream:
                         self.need_restart = True
                         self.capture_error = True
                         time.sleep(5)
+            # Стадии работают с контейнерами - останавливаем их до закрытия
+            self.pipeline.stop()
             self.destroy_output_container()
             self.stop_input_container()
             self.output_container = None
@@ -732,12 +815,231 @@ class CameraStream:
             if not self._stop_requested:
                 Logger.warn(f'⛔️ [{self.camera.name}] stop stream', LoggerType.CAMERAS)
         finally:
+            self.pipeline.stop()
             self.stop_frame_generation()
 
+    def _dispatch_packet(self, packet: av.Packet):
+        """Передает пакет стадиям декодирования и записи, не дожидаясь их"""
+        started = time.perf_counter()
+        is_video = packet.stream.type == 'video'
+        keyframe = is_video and packet.is_keyframe
+
+        # В режиме passthrough пакеты пишутся как есть, минуя декодирование.
+        # Буфер перед событием заполняется до очереди записи: ее сбросы не оставляют в нем дыр
+        if packet.dts is not None:
+            if self.pre_event_enabled and (is_video or packet.stream.codec_context.name in PASSTHROUGH_AUDIO_CODECS):
+                self.pre_event.push(packet)
+            if self.passthrough and (is_video or self.audio_passthrough):
+                self.pipeline.put(STAGE_RECORD, packet, keyframe)
+
+        keyframes_only = self.is_keyframes_only()
+        if keyframes_only != self._keyframes_only:
+            self._keyframes_only = keyframes_only
+            # После режима ключевых кадров у декодера нет опорных кадров до следующего ключевого
+            self._decode_resync = not keyframes_only
+
+        if keyframe:
+            self._decode_resync = False
+
+        if keyframes_only or self._decode_resync:
+            # Декодируем только ключевые кадры, звук не нужен вовсе
+            if not keyframe:
+                self.last_frame_time = time.time()
+                self.pipeline.observe_ingest(started)
+                return
+            self.pipeline.put(STAGE_DECODE, packet, keyframe)
+
+        # Аудио в режиме passthrough не декодируем - только копируем пакет
+        elif is_video or not self.audio_passthrough:
+            self.pipeline.put(STAGE_DECODE, packet, keyframe)
+
+        self.pipeline.observe_ingest(started)
+
+    def _decode_packet(self, packet: av.Packet):
+        """Стадия декодирования: кадры в BGR для анализа и публикации, исходные кадры - для записи"""
+        if packet.stream.type == 'video':
+            # Декодер пропускает неключевые кадры, даже если контейнер их не пометил
+            skip_frame = 'NONKEY' if self._keyframes_only else 'DEFAULT'
+            codec_context = packet.stream.codec_context
+            if codec_context.skip_frame != skip_frame:
+                codec_context.skip_frame = skip_frame
+
+        for frame in packet.decode():
+            self.last_frame_time = time.time()  # Обновляем время последнего кадра
+
+            if isinstance(frame, av.AudioFrame):
+                if self.audio_output_stream is not None:
+                    self.pipeline.put(STAGE_RECORD, frame, False)
+                continue
+
+            if isinstance(frame, av.VideoFrame):
+                # В режиме passthrough запись идет пакетами, кадр нужен только для начала новой части
+                if not self.passthrough:
+                    self.pipeline.put(STAGE_RECORD, frame, frame.key_frame)
+
+                # Один неизменяемый кадр на всех потребителей, без копий
+                self._decoded_seq += 1
+                shared = SharedFrame(
+                    original=frame.to_ndarray(format='bgr24'),
+                    width=640,
+                    seq=self._decoded_seq,
+                    timestamp=time.time()
+                )
+                self.pipeline.put(STAGE_PUBLISH, shared)
+                if self.is_detection_mode():
+                    self.pipeline.put(STAGE_ANALYSIS, shared)
+
+    def _analyze_frame(self, shared: SharedFrame):
+        """Стадия анализа: поиск движения в зонах камеры"""
+        if not self.is_detection_mode() or self.tracker is None:
+            return
+
+        now = time.time()
+        escalating = self.governor.mode == AnalysisMode.IDLE
+        if not self.governor.admit(shared.resized, now, self.tracker.min_area()):
+            return
+
+        if escalating:
+            # История трекера устарела за время простоя - сравнивать с ней нельзя
+            self.tracker.reset_history()
+
+        # Трекер хранит ссылки на общий кадр, зоны рисуются на отдельной копии
+        changes = self.tracker.detect_changes(shared.resized, shared.original)
+        self.governor.report(bool(changes) or self.tracker.has_motion(), now)
+
+    def _publish_frame(self, shared: SharedFrame):
+        """Стадия публикации: текущий кадр для MJPEG, обложка и периодические скриншоты"""
+        self.original = shared.original
+        self.resized = shared.resized
+        self.frame_seq = shared.seq
+
+        # Take cover
+        now = time.time()
+        if now - self.screen_timer > self.screen_interval:
+            CameraStorage.upload_cover(self.camera, shared.original)
+            self.screen_timer = now
+
+        # Permanent screenshots
+        if self.is_screenshots_mode() and now - self.screenshot_part_start > self.camera.record_duration * 60:
+            self.screenshot_part_start = now
+            res = CameraStorage.take_screenshot(self.camera, shared.original)
+            Logger.debug(
+                f"[Camera {self.camera.name}] Take screenshot: success={res.success}, fn={res.filename}, dir={res.directory}]",
+                LoggerType.CAMERAS)
+
+    def _record_item(self, item: Union[av.Packet, av.VideoFrame, av.AudioFrame]):
+        """Стадия записи: пакеты passthrough, кадры для кодирования и звук"""
+        if isinstance(item, av.Packet):
+            self._record_packet(item)
+        elif isinstance(item, av.AudioFrame):
+            self._record_audio_frame(item)
+        elif isinstance(item, av.VideoFrame):
+            self._record_video_frame(item)
+
+    def _record_packet(self, packet: av.Packet):
+        """Пакет passthrough. Пакет общий со стадией декодирования и буфером,
+        mux забирает его данные - поэтому пишется копия
+        """
+        is_video = packet.stream.type == 'video'
+        with self._container_lock:
+            if self.output_container is None or not self.write:
+                # Запись остановлена: закрываем файл по видеопакетам, как по кадрам без passthrough
+                if is_video:
+                    self.destroy_output_container()
+                return
+
+            if not self.passthrough:
+                return
+
+            if self._pre_event_pending:
+                self._pre_event_pending = False
+                # Буфер до текущего пакета включительно, более новые пакеты еще придут из очереди
+                for buffered in self.pre_event.packets_until(packet):
+                    self.write_packet_safe(copy_packet(buffered))
+            else:
+                self.write_packet_safe(copy_packet(packet))
+
+        if is_video:
+            self._end_permanent_part()
+
+    def _record_video_frame(self, frame: VideoFrame):
+        # Start permanent record
+        if self.is_video_mode() and self.time_part_start == 0:
+            self.time_part_start = time.time()
+
+            if self.output_container is None:
+                self.create_output_container(CameraStorage.video_path(self.camera))
+                self.write = True
+                # Create event
+                self.permanent_event = CameraEventsRepository.add_permanent_event(
+                    camera=self.camera,
+                    frame=frame.to_ndarray(format='bgr24'),
+                    record_path=self.output_file
+                )
+                Logger.debug(
+                    f'🎬 [{self.camera.name}] Permanent event start: #ID{self.permanent_event.id}]',
+                    LoggerType.CAMERAS)
+
+            Logger.debug(
+                f'📽 [{self.camera.name}] with permanent record mode: {self.camera.record_mode}',
+                LoggerType.CAMERAS)
+
+        # Write frames to output container if needed
+        with self._container_lock:
+            if self.output_container is None or not self.write:
+                self.destroy_output_container()
+            elif not self.passthrough:
+                self.write_frame_safe(frame)
+
+        self._end_permanent_part()
+
+    def _end_permanent_part(self):
+        """Закрывает часть постоянной записи длиннее record_duration, следующая начнется с нового кадра"""
+        if self.is_video_mode() and self.time_part_start != 0:
+            record_part_diff = time.time() - self.time_part_start
+            if record_part_diff > self.camera.record_duration * 60:
+                self.destroy_output_container()
+                Logger.debug(f'Camera {self.camera.name} end record video part',
+                             LoggerType.CAMERAS)
+
+    def _record_audio_frame(self, frame: av.AudioFrame):
+        with self._container_lock:
+            if self.audio_output_stream is None:
+                return
+
+            if self.output_container is None or not self.write:
+                self.destroy_output_container()
+                return
+
+            # В режиме passthrough звук пишем только после первого ключевого кадра
+            if self.passthrough and self.passthrough_start is None:
+                return
+
+            # Устанавливаем PTS для аудио
+            frame.pts = self.audio_pts
+            self.audio_pts += frame.samples
+
+            # Кодируем и записываем аудиофрейм
+            for audio_packet in self.audio_output_stream.encode(frame):
+                self.output_container.mux(audio_packet)
+
+    def _record_tick(self):
+        """Периодический flush контейнера записи"""
+        now = time.time()
+        if now - self.last_flush_time > self.flush_interval:
+            self.flush_output_container()
+            self.last_flush_time = now
+
+    def get_pipeline_stats(self):
+        """Очереди и задержки стадий конвейера"""
+        return self.pipeline.stats()
+
     def _perform_restart(self):
         """Выполняет полный перезапуск потока"""
         Logger.debug(f"🔄 [{self.camera.name}] Performing full restart...", LoggerType.CAMERAS)
         try:
+            # Стадии не должны обращаться к закрываемому входному контейнеру
+            self.pipeline.reset()
             self.destroy_output_container()
             self.stop_input_container()
             self.create_input_container()
@@ -749,81 +1051,23 @@ class CameraStream:
             self.last_restart_time = time.time()
 
     def get_no_signal_frame(self):
-        return get_no_signal_frame(width=640)
-
-    def start_frame_generation(self):
-        """Запускает генерацию кадров в отдельном потоке"""
-        with self.frame_generation_lock:
-            if self.frame_generation_running:
-                return
-
-            self.frame_generation_running = True
-            self.frame_generation_thread = threading.Thread(
-                target=self._frame_generation_worker,
-                daemon=True  # Важно: делаем поток демоном
-            )
-            self.frame_generation_thread.start()
+        if self._no_signal_frame is None:
+            self._no_signal_frame = freeze(get_no_signal_frame(width=640))
+        return self._no_signal_frame
+
+    def _mjpeg_source(self) -> tuple[int, Optional[np.ndarray]]:
+        """Источник кадров для MJPEG хаба. Заставка всегда имеет номер -1 и кодируется один раз"""
+        frame_seq = self.frame_seq
+        frame = self.resized
+        if self.input_container is None or frame is None:
+            return -1, self.get_no_signal_frame()
+        return frame_seq, frame
 
     def stop_frame_generation(self):
-        """Останавливает генерацию кадров"""
-        with self.frame_generation_lock:
-            self.frame_generation_running = False
-            if self.frame_generation_thread and self.frame_generation_thread.is_alive():
-                self.frame_generation_thread.join(timeout=1.0)
-            # Очищаем очередь
-            while not self.frame_queue.empty():
-                try:
-                    self.frame_queue.get_nowait()
-                except queue.Empty:
-                    break
-
-    def _frame_generation_worker(self):
-        """Рабочий поток для генерации кадров"""
-        while self.frame_generation_running and self.opened:
-            try:
-                if self.input_container is None or self.resized is None:
-                    frame = self.get_no_signal_frame()
-                else:
-                    frame = self.resized
-
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    time.sleep(0.03)
-                    continue
-
-                frame_data = (b'--frame\r\n'
-                              b'Content-Type: image/jpeg\r\n\r\n' +
-                              buffer.tobytes() + b'\r\n')
-
-                # Очищаем очередь если она полная
-                if self.frame_queue.full():
-                    try:
-                        self.frame_queue.get_nowait()
-                    except queue.Empty:
-                        pass
-
-                self.frame_queue.put(frame_data)
-                time.sleep(0.03)
-
-            except Exception as e:
-                Logger.debug(f"[{self.camera.name}] Frame generation error: {e}", LoggerType.CAMERAS)
-                break
-
-    def generate_frames(self):
+        """Останавливает генерацию кадров и отключает всех зрителей"""
+        self.mjpeg_hub.close()
 
-        while True:
-            if self.input_container is None or self.resized is None:
-                frame = self.get_no_signal_frame()
-            else:
-                frame = self.resized
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
-                continue
-
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-
-    async def generate_frames_async(self):
+    async def generate_frames_async(self, profile: Optional[MjpegProfile] = None, fps: float = 25):
         """Асинхронная генерация кадров для StreamingResponse"""
         # Проверяем состояние реестра перед запуском
         if StreamRegistry.is_shutting_down():
@@ -842,39 +1086,13 @@ class CameraStream:
                 # Если перезапуск затянулся, возвращаем ошибку
                 raise Exception("Stream restart taking too long")
 
-        self.start_frame_generation()
-
-        try:
-            while (self.opened and
-                   self.frame_generation_running and
-                   not StreamRegistry.is_shutting_down()):
-
-                # Проверяем, не начался ли перезапуск
-                if StreamRegistry.is_restarting():
-                    break
-
-                try:
-                    # Асинхронно получаем кадр из очереди
-                    frame_data = await asyncio.get_event_loop().run_in_executor(
-                        None, self.frame_queue.get, True, 1.0
-                    )
-                    yield frame_data
-                except queue.Empty:
-                    # Если нет кадров, отправляем заставку
-                    if not StreamRegistry.is_restarting():
-                        placeholder = self.get_no_signal_frame()
-                        ret, buffer = cv2.imencode('.jpg', placeholder)
-                        if ret:
-                            yield (b'--frame\r\n'
-                                   b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-                    await asyncio.sleep(0.5)
-                except Exception as e:
-                    Logger.debug(f"[{self.camera.name}] Async frame error: {e}", LoggerType.CAMERAS)
-                    break
-        finally:
-            if not StreamRegistry.is_restarting():
-                # Не останавливаем генерацию если идет перезапуск
-                self.stop_frame_generation()
+        async for jpeg in self.mjpeg_hub.frames(profile or MjpegProfile(), fps):
+            # Проверяем, не начался ли перезапуск или остановка
+            if (not self.opened
+                    or StreamRegistry.is_shutting_down()
+                    or StreamRegistry.is_restarting()):
+                break
+            yield mjpeg_part(jpeg)
 
     def is_stopped(self):
         return self._stop_requested
@@ -896,9 +1114,6 @@ class CameraStream:
             self.daemon = Daemon(self.loop_frames)
             Logger.debug(f"👻 [{self.camera.name}] Daemon started", LoggerType.CAMERAS)
 
-        # Запускаем генерацию кадров
-        self.start_frame_generation()
-
         Logger.debug(f"✅ [{self.camera.name}] Camera stream started", LoggerType.CAMERAS)
 
     def stop(self):
@@ -911,7 +1126,6 @@ class CameraStream:
         # Устанавливаем флаг остановки
         self._stop_requested = True
         self.opened = False
-        self.frame_generation_running = False
 
         # Останавливаем генерацию кадров
         self.stop_frame_generation()
@@ -930,15 +1144,9 @@ class CameraStream:
             except Exception as e:
                 Logger.debug(f"[{self.camera.name}] Error stopping tracker: {e}", LoggerType.CAMERAS)
 
-        # Закрываем контейнеры
+        # Закрываем контейнеры, дождавшись стадий конвейера
+        self.pipeline.reset()
         self.destroy_output_container()
         self.stop_input_container()
 
-        # Очищаем очередь кадров
-        while not self.frame_queue.empty():
-            try:
-                self.frame_queue.get_nowait()
-            except queue.Empty:
-                break
-
         Logger.debug(f"✅ [{self.camera.name}] Camera stream stopped completely", LoggerType.CAMERAS)
@@ -0,0 +1,276 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, AsyncIterator, ClassVar
+
+import cv2
+import imutils
+import numpy as np
+
+from classes.logger.logger import Logger
+from classes.logger.logger_types import LoggerType
+
+# Источник кадров: возвращает (порядковый номер кадра, кадр)
+FrameSource = Callable[[], tuple[int, Optional[np.ndarray]]]
+
+
+def mjpeg_part(jpeg: bytes) -> bytes:
+    """Оборачивает JPEG в часть multipart/x-mixed-replace ответа"""
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+
+@dataclass(frozen=True)
+class MjpegProfile:
+    """Профиль кодирования кадра: ширина и качество JPEG"""
+    width: int = 640
+    quality: int = 80
+
+    # Допустимые значения: кадр кодируется один раз на профиль, произвольные профили клиентов
+    # сводятся к ближайшим из небольшого набора
+    widths: ClassVar[tuple[int, ...]] = (160, 320, 480, 640, 960, 1280, 1920)
+    qualities: ClassVar[tuple[int, ...]] = (30, 50, 70, 80, 90)
+
+    @classmethod
+    def snap(cls, width: int, quality: int) -> "MjpegProfile":
+        return cls(
+            width=min(cls.widths, key=lambda item: abs(item - width)),
+            quality=min(cls.qualities, key=lambda item: abs(item - quality))
+        )
+
+
+class MjpegSubscriber:
+    """Подписчик хаба с ограниченной очередью кадров.
+    Очередь живет в event loop подписчика, кадры в нее кладет рабочий поток хаба.
+    """
+
+    def __init__(
+            self,
+            profile: MjpegProfile,
+            fps: float,
+            loop: asyncio.AbstractEventLoop,
+            maxsize: int = 2
+    ):
+        self.profile = profile
+        self.interval = 1.0 / fps if fps > 0 else 0
+        self.loop = loop
+        self.queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=maxsize)
+        self.last_sent: float = 0
+        self.last_seq: Optional[int] = None
+        self.dropped: int = 0
+        self.closed: bool = False
+
+    def offer(self, data: Optional[bytes]):
+        """Кладет кадр в очередь (вызывается в event loop).
+        Если клиент не успевает - самый старый кадр вытесняется.
+        """
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(data)
+
+    def close(self):
+        """Сигнализирует генератору подписчика о завершении"""
+        self.closed = True
+        self.offer(None)
+
+
+class MjpegHub:
+    """Хаб MJPEG трансляции для одной камеры.
+
+    Каждый кадр кодируется в JPEG не более одного раза для каждого профиля,
+    после чего раздается всем подписчикам (HTTP MJPEG и WebSocket).
+    Рабочий поток работает только пока есть подписчики.
+    """
+
+    def __init__(self, name: str, source: FrameSource, max_fps: float = 25, max_width: int = 640):
+        self.name = name
+        self.max_fps = max_fps
+        # Ширина кадров источника: кадр не увеличивается
+        self.max_width = max_width
+        self._source = source
+        self._subscribers: set[MjpegSubscriber] = set()
+        self._cache: dict[MjpegProfile, tuple[int, bytes]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        # Счетчики
+        self.encoded: int = 0
+        self.delivered: int = 0
+
+    def subscribe(self, profile: MjpegProfile, fps: float, maxsize: int = 2) -> MjpegSubscriber:
+        """Создает подписчика, должен вызываться из event loop"""
+        subscriber = MjpegSubscriber(
+            profile=self._fit(profile),
+            fps=min(fps, self.max_fps) if fps > 0 else self.max_fps,
+            loop=asyncio.get_running_loop(),
+            maxsize=maxsize
+        )
+        with self._lock:
+            self._subscribers.add(subscriber)
+            self._ensure_worker()
+        Logger.debug(f"[{self.name}] MJPEG subscriber added, total: {len(self._subscribers)}", LoggerType.CAMERAS)
+        return subscriber
+
+    def unsubscribe(self, subscriber: MjpegSubscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            total = len(self._subscribers)
+            # Кадры профилей без подписчиков больше не нужны
+            in_use = {item.profile for item in self._subscribers}
+            for profile in [profile for profile in self._cache if profile not in in_use]:
+                del self._cache[profile]
+        Logger.debug(f"[{self.name}] MJPEG subscriber removed, total: {total}, dropped: {subscriber.dropped}",
+                     LoggerType.CAMERAS)
+
+    def subscribers_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def close(self):
+        """Отключает всех подписчиков и останавливает рабочий поток"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+            self._running = False
+            thread = self._thread
+            self._thread = None
+
+        for subscriber in subscribers:
+            self._call_in_loop(subscriber, subscriber.close)
+
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        with self._lock:
+            self._cache.clear()
+
+    def get_jpeg(self, profile: MjpegProfile) -> Optional[bytes]:
+        """Возвращает текущий кадр в JPEG (из кэша, если кадр не изменился)"""
+        seq, frame = self._source()
+        return self._encode(self._fit(profile), seq, frame)
+
+    async def frames(self, profile: MjpegProfile, fps: float, timeout: float = 1.0) -> AsyncIterator[bytes]:
+        """Асинхронный генератор JPEG кадров для одного клиента.
+        Если новых кадров нет дольше timeout - повторяет последний кадр, чтобы соединение не простаивало.
+        """
+        subscriber = self.subscribe(profile, fps)
+        try:
+            while not subscriber.closed:
+                try:
+                    data = await asyncio.wait_for(subscriber.queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    data = await asyncio.to_thread(self.get_jpeg, subscriber.profile)
+
+                if data is None:
+                    if subscriber.closed:
+                        break
+                    continue
+                yield data
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _ensure_worker(self):
+        if self._running and self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._worker,
+            daemon=True,
+            name=f"MjpegHub-{self.name}"
+        )
+        self._thread.start()
+
+    def _fit(self, profile: MjpegProfile) -> MjpegProfile:
+        """Профили шире источника кодируются в ширине источника, один раз"""
+        if profile.width <= self.max_width:
+            return profile
+        return MjpegProfile(width=self.max_width, quality=profile.quality)
+
+    def _encode(self, profile: MjpegProfile, seq: int, frame: Optional[np.ndarray]) -> Optional[bytes]:
+        with self._lock:
+            cached = self._cache.get(profile)
+        if cached is not None and cached[0] == seq:
+            return cached[1]
+
+        if frame is None:
+            return None
+
+        if frame.shape[1] > profile.width:
+            frame = imutils.resize(frame, width=profile.width)
+
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, profile.quality])
+        if not ret:
+            return None
+
+        data = buffer.tobytes()
+        with self._lock:
+            self._cache[profile] = (seq, data)
+        self.encoded += 1
+        return data
+
+    def _call_in_loop(self, subscriber: MjpegSubscriber, callback: Callable, *args):
+        try:
+            subscriber.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Event loop подписчика уже закрыт
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def _worker(self):
+        """Кодирует новые кадры один раз на профиль и раздает их подписчикам с учетом их частоты"""
+        tick = 1.0 / self.max_fps
+        while True:
+            with self._lock:
+                if self._thread is not threading.current_thread():
+                    # Хаб закрыт или уже запущен новый рабочий поток
+                    break
+                if not self._running or not self._subscribers:
+                    self._running = False
+                    self._thread = None
+                    break
+                subscribers = list(self._subscribers)
+
+            try:
+                seq, frame = self._source()
+                now = time.time()
+                encoded: dict[MjpegProfile, Optional[bytes]] = {}
+
+                for subscriber in subscribers:
+                    if subscriber.last_seq == seq or now - subscriber.last_sent < subscriber.interval:
+                        continue
+
+                    if subscriber.profile not in encoded:
+                        encoded[subscriber.profile] = self._encode(subscriber.profile, seq, frame)
+                    data = encoded[subscriber.profile]
+                    if data is None:
+                        continue
+
+                    subscriber.last_seq = seq
+                    subscriber.last_sent = now
+                    self.delivered += 1
+                    self._call_in_loop(subscriber, subscriber.offer, data)
+
+            except Exception as e:
+                Logger.debug(f"[{self.name}] MJPEG hub error: {e}", LoggerType.CAMERAS)
+
+            time.sleep(tick)
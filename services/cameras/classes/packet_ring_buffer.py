@@ -0,0 +1,80 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import time
+from collections import deque
+
+import av
+
+
+class PacketRingBuffer:
+    """Кольцевой буфер закодированных пакетов камеры за последние seconds секунд.
+
+    Пакеты хранятся группами от ключевого кадра до следующего (GOP) и отбрасываются только
+    целыми группами, поэтому буфер всегда начинается с ключевого кадра видео и его можно
+    записать в начало клипа без перекодирования. max_bytes ограничивает память при длинных GOP.
+    """
+
+    def __init__(self, seconds: float, max_bytes: int = 32 * 1024 * 1024):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        # Группы: (время ключевого кадра, пакеты)
+        self._groups: deque[tuple[float, list[av.Packet]]] = deque()
+        self._bytes: int = 0
+        self._lock = threading.Lock()
+
+    def push(self, packet: av.Packet):
+        """Добавляет пакет. Пакеты до первого ключевого кадра видео не сохраняются"""
+        now = time.monotonic()
+        with self._lock:
+            if packet.stream.type == 'video' and packet.is_keyframe:
+                self._groups.append((now, []))
+            elif not self._groups:
+                return
+
+            self._groups[-1][1].append(packet)
+            self._bytes += packet.size
+
+            # Старейшая группа не нужна, если следующая уже покрывает окно
+            while len(self._groups) > 1 and (
+                    now - self._groups[1][0] >= self.seconds or self._bytes > self.max_bytes):
+                _, dropped = self._groups.popleft()
+                self._bytes -= sum(item.size for item in dropped)
+
+    def packets(self) -> list[av.Packet]:
+        """Пакеты буфера по порядку, начиная с ключевого кадра"""
+        with self._lock:
+            return [packet for _, group in self._groups for packet in group]
+
+    def packets_until(self, last: av.Packet) -> list[av.Packet]:
+        """Пакеты буфера по порядку до last включительно. Если last уже нет в буфере - только он"""
+        packets = self.packets()
+        for index, packet in enumerate(packets):
+            if packet is last:
+                return packets[:index + 1]
+        return [last]
+
+    def duration(self) -> float:
+        """Сколько секунд до текущего момента покрывает буфер"""
+        with self._lock:
+            if not self._groups:
+                return 0
+            return time.monotonic() - self._groups[0][0]
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
+            self._bytes = 0
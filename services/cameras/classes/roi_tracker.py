@@ -26,8 +26,9 @@ from classes.logger.logger import Logger
 from sqlmodel import col, select
 from models.camera_area_model import CameraAreaBaseModel
 from models.camera_model import CameraModelWithRelations
+from services.cameras.classes.shared_frame import freeze, shared
 from services.cameras.enums.roi_enum import ROIEventType
-from services.cameras.models.roi_models import ROIEvent, ROIDetectionEvent, ROIRecordEvent, ROI
+from services.cameras.models.roi_models import ROIEvent, ROIDetectionEvent, ROIRecordEvent, ROI, CompiledROI
 from services.cameras.models.roi_settings import ROISettings
 
 
@@ -68,9 +69,20 @@ class ROITracker:
         self.blur_size = 3
         self.morph_size = 2
         self.recording_extension = 5
+        self._kernel = np.ones((self.morph_size, self.morph_size), np.uint8)
+
+        # Рабочие буферы, переиспользуются между кадрами одного размера
+        self._buffers_shape: Optional[tuple[int, int]] = None
+        self._gray: Optional[np.ndarray] = None
+        self._blurred: Optional[np.ndarray] = None
+        self._diff: Optional[np.ndarray] = None
+        self._combined_diff: Optional[np.ndarray] = None
+        self._threshold: Optional[np.ndarray] = None
+        self._morph: Optional[np.ndarray] = None
+        self._last_valid_gray: Optional[np.ndarray] = None
+        self._has_last_valid: bool = False
 
         # Защита от ложных срабатываний
-        self.last_valid_frame = None
         self.frame_validity_threshold = 20
         self.consecutive_black_frames = 0
         self.max_black_frames = 5
@@ -78,6 +90,8 @@ class ROITracker:
         self.min_solidity = 0.85
 
         self.frame_diff: Optional[np.ndarray] = None  # Добавляем для хранения diff между кадрам
+        # Кадр с зонами для событий текущего кадра: (активные зоны, кадр)
+        self._annotated: Optional[tuple[frozenset, np.ndarray]] = None
 
         self._pending_movements: Dict[int, int] = {}  # Для отслеживания неподтвержденных движений
         self.movement_confirmation_frames = 2  # Количество кадров для подтверждения
@@ -141,6 +155,21 @@ class ROITracker:
         self.active_movements.clear()
         self._pending_movements.clear()
 
+    def reset_history(self):
+        """Сброс истории кадров: следующий кадр сравнивается только с последующими"""
+        self.frame_history.clear()
+        self._has_last_valid = False
+        self.frame_diff = None
+
+    def has_motion(self) -> bool:
+        """Есть ли движение: подтвержденное, ожидающее подтверждения или идет запись"""
+        return bool(self.active_movements or self._pending_movements or self.recording)
+
+    def min_area(self, default: int = 100) -> int:
+        """Наименьшая минимальная площадь движения среди включенных ROI"""
+        areas = [roi.options.min_area for roi in self.rois if roi.options.enabled]
+        return min(areas) if areas else default
+
     def set_advanced_settings(self,
                               max_black_frames: int = 5,
                               brightness_thresh: int = 10,
@@ -160,14 +189,43 @@ class ROITracker:
         self.global_diff_threshold = global_diff_thresh
         self.min_solidity = min_solidity
 
+    def _ensure_buffers(self, shape: tuple[int, int]) -> None:
+        """Выделяет рабочие буферы под размер кадра. При смене размера история кадров сбрасывается"""
+        if self._buffers_shape == shape:
+            return
+
+        self._buffers_shape = shape
+        self._gray = np.empty(shape, dtype=np.uint8)
+        self._blurred = np.empty(shape, dtype=np.uint8)
+        self._diff = np.empty(shape, dtype=np.uint8)
+        self._combined_diff = np.empty(shape, dtype=np.uint8)
+        self._threshold = np.empty(shape, dtype=np.uint8)
+        self._morph = np.empty(shape, dtype=np.uint8)
+        self._last_valid_gray = np.empty(shape, dtype=np.uint8)
+        self._has_last_valid = False
+        self.frame_history.clear()
+        self.frame_diff = None
+
+    def _push_history(self, gray: np.ndarray) -> None:
+        """Добавляет кадр в историю, переиспользуя буфер самого старого кадра"""
+        if len(self.frame_history) == self.frame_history.maxlen:
+            buffer = self.frame_history.popleft()
+        else:
+            buffer = np.empty_like(gray)
+        np.copyto(buffer, gray)
+        self.frame_history.append(buffer)
+
     def is_frame_valid(self, frame: np.ndarray) -> bool:
-        """Расширенная проверка валидности кадра с анализом стабильности"""
+        """Расширенная проверка валидности кадра с анализом стабильности.
+        Серый кадр остается в self._gray и используется в detect_changes.
+        """
         if frame is None or frame.size == 0:
             return False
 
         try:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            avg_brightness = np.mean(gray)
+            self._ensure_buffers(frame.shape[:2])
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            avg_brightness = cv2.mean(gray)[0]
         except cv2.error as e:
             Logger.err(f"OpenCV error: {e}")
             return False
@@ -181,20 +239,31 @@ class ROITracker:
             self.consecutive_black_frames = 0
 
             # Дополнительная проверка на "замороженный" кадр
-            if self.last_valid_frame is not None:
-                diff = cv2.absdiff(gray, cv2.cvtColor(self.last_valid_frame, cv2.COLOR_BGR2GRAY))
-                if np.mean(diff) < 1.0:  # Почти идентичные кадры
+            if self._has_last_valid:
+                diff = cv2.absdiff(gray, self._last_valid_gray, dst=self._diff)
+                if cv2.mean(diff)[0] < 1.0:  # Почти идентичные кадры
                     return False
 
-            self.last_valid_frame = frame.copy()
+            np.copyto(self._last_valid_gray, gray)
+            self._has_last_valid = True
 
         return True
 
     def set_original_frame(self, frame: np.ndarray):
-        self.original_frame = frame.copy()
+        self.original_frame = shared(frame)
 
     def set_resized_frame(self, frame: np.ndarray):
-        self.resized_frame = frame.copy()
+        self.resized_frame = shared(frame)
+        self._annotated = None
+
+    def annotated_frame(self) -> np.ndarray:
+        """Текущий кадр с отрисованными зонами, общий для всех событий кадра.
+        Перерисовывается, только если изменился набор активных зон
+        """
+        key = frozenset(self.active_movements)
+        if self._annotated is None or self._annotated[0] != key:
+            self._annotated = (key, freeze(self.draw_rois(self.resized_frame)))
+        return self._annotated[1]
 
     def detect_changes(self, current_frame: np.ndarray, original_frame: np.ndarray) -> List[ROIDetectionEvent]:
         """Улучшенная детекция с защитой от ложных срабатываний"""
@@ -205,33 +274,30 @@ class ROITracker:
         self.set_resized_frame(current_frame)
 
         try:
-            gray = cv2.cvtColor(current_frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (self.blur_size, self.blur_size), 0)
+            gray = cv2.GaussianBlur(self._gray, (self.blur_size, self.blur_size), 0, dst=self._blurred)
         except cv2.error as e:
             Logger.err(f"OpenCV error in detect_changes: {e}")
             return []
 
         if not self.frame_history:
-            self.frame_history.append(gray)
+            self._push_history(gray)
             return []
 
-        # Анализ нескольких предыдущих кадров
-        frame_diffs = []
+        # Анализ нескольких предыдущих кадров: поэлементный максимум разниц
+        combined_diff = self._combined_diff
+        combined_diff.fill(0)
         for prev_frame in self.frame_history:
-            diff = cv2.absdiff(gray, prev_frame)
-            frame_diffs.append(diff)
-
-        # Комбинированная разница
-        combined_diff = np.max(frame_diffs, axis=0)
+            cv2.absdiff(gray, prev_frame, dst=self._diff)
+            cv2.max(combined_diff, self._diff, dst=combined_diff)
         self.frame_diff = combined_diff  # Сохраняем для визуализации
 
         # Адаптивный порог
-        _, threshold = cv2.threshold(combined_diff, self.threshold, 255, cv2.THRESH_BINARY)
+        cv2.threshold(combined_diff, self.threshold, 255, cv2.THRESH_BINARY, dst=self._threshold)
 
         # Морфологические операции
-        kernel = np.ones((self.morph_size, self.morph_size), np.uint8)
-        threshold = cv2.morphologyEx(threshold, cv2.MORPH_OPEN, kernel)
-        threshold = cv2.dilate(threshold, kernel, iterations=1)
+        cv2.morphologyEx(self._threshold, cv2.MORPH_OPEN, self._kernel, dst=self._morph)
+        threshold = cv2.dilate(self._morph, self._kernel, dst=self._threshold, iterations=1)
+        height, width = threshold.shape
 
         results = []
         current_movements = set()
@@ -240,15 +306,24 @@ class ROITracker:
             if not roi.options.enabled:
                 continue
 
-            mask = roi.get_mask(threshold.shape[1], threshold.shape[0])
-            roi_diff = cv2.bitwise_and(threshold, mask)
+            compiled = roi.compile(width, height)
+            if compiled is None:
+                continue
+
+            # Работаем только в пределах прямоугольника ROI
+            roi_diff = cv2.bitwise_and(compiled.crop(threshold), compiled.mask, dst=compiled.scratch)
 
             # Фильтр по минимальной площади срабатывания
-            if np.sum(roi_diff) < roi.options.min_area * 0.5:  # Эмпирический коэффициент
+            if cv2.countNonZero(roi_diff) * 255 < roi.options.min_area * 0.5:  # Эмпирический коэффициент
                 continue
 
-            contours, _ = cv2.findContours(roi_diff, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            changes = self._process_contours(contours, roi.options)
+            contours, _ = cv2.findContours(
+                roi_diff,
+                cv2.RETR_EXTERNAL,
+                cv2.CHAIN_APPROX_SIMPLE,
+                offset=(compiled.x, compiled.y)
+            )
+            changes = self._process_contours(contours, roi.options, compiled)
 
             if changes:
                 # Дополнительная проверка устойчивости изменений
@@ -261,14 +336,14 @@ class ROITracker:
                             camera=self.camera,
                             changes=changes,
                             timestamp=datetime.now(),
-                            frame=self.draw_rois(self.resized_frame),
+                            frame=self.annotated_frame(),
                             original=self.original_frame
                         )
                     )
 
         self._update_movement_states(current_movements)
         self._update_recording_state(current_movements)
-        self.frame_history.append(gray)
+        self._push_history(gray)
         return results
 
     def _is_real_movement(self, changes: List[dict], roi: ROI) -> bool:
@@ -317,7 +392,7 @@ class ROITracker:
                             camera=self.camera,
                             changes=[],
                             timestamp=now,
-                            frame=self.draw_rois(self.resized_frame),
+                            frame=self.annotated_frame(),
                             original=self.original_frame
                         )
                         self._trigger_motion_start(event)
@@ -345,59 +420,83 @@ class ROITracker:
                         camera=self.camera,
                         changes=[],
                         timestamp=now,
-                        frame=self.draw_rois(self.resized_frame),
+                        frame=self.annotated_frame(),
                         original=self.original_frame
                     )
                     self._trigger_motion_end(event)
 
                     Logger.debug(f"🏃 [{self.camera.name}] Движение завершено в ROI {roi_id}", LoggerType.CAMERAS)
 
-    def _process_contours(self, contours, settings: ROISettings) -> List[dict]:
+    def _process_contours(self, contours, settings: ROISettings, compiled: CompiledROI) -> List[dict]:
         """Обработка и фильтрация контуров с учетом чувствительности ROI"""
-        changes = []
-
         # Рассчитываем динамический порог на основе чувствительности
         # Чем выше sensitivity, тем выше порог (меньше чувствительность)
         dynamic_threshold = int(self.threshold * settings.sensitivity)
 
+        # Сначала дешевые геометрические фильтры
+        candidates = []
         for contour in contours:
             area = cv2.contourArea(contour)
             if area < settings.min_area:
                 continue
 
-            # Дополнительная проверка на значимость изменения
-            # Основанная на чувствительности
-            contour_mask = np.zeros_like(self.frame_history[-1])
-            cv2.drawContours(contour_mask, [contour], -1, 255, -1)
-            mean_diff = cv2.mean(self.frame_diff, contour_mask)[0]
-
-            if mean_diff < dynamic_threshold:
-                continue
-
             x, y, w, h = cv2.boundingRect(contour)
             aspect_ratio = w / max(1, h)
 
             if not (settings.min_aspect_ratio <= aspect_ratio <= settings.max_aspect_ratio):
                 continue
 
-            solidity = self._calculate_solidity(contour)
+            solidity = self._calculate_solidity(contour, area)
             if solidity < self.min_solidity:
                 continue
 
+            candidates.append((contour, area, (x, y, w, h), aspect_ratio, solidity))
+
+        if not candidates:
+            return []
+
+        # Дополнительная проверка на значимость изменения
+        # Основанная на чувствительности
+        mean_diffs = self._contours_mean_diff([c[0] for c in candidates], compiled)
+
+        changes = []
+        for (contour, area, bbox, aspect_ratio, solidity), mean_diff in zip(candidates, mean_diffs):
+            if mean_diff < dynamic_threshold:
+                continue
+
             changes.append({
-                'bbox': (x, y, w, h),
+                'bbox': bbox,
                 'area': area,
                 'aspect_ratio': aspect_ratio,
                 'solidity': solidity,
-                'mean_diff': mean_diff  # Добавляем информацию о значимости изменения
+                'mean_diff': float(mean_diff)  # Добавляем информацию о значимости изменения
             })
         return changes
 
-    def _calculate_solidity(self, contour) -> float:
+    def _contours_mean_diff(self, contours: list, compiled: CompiledROI) -> np.ndarray:
+        """Средняя разница кадров внутри каждого контура за один проход по области ROI.
+        Контуры заливаются своими номерами в буфер меток, суммы считаются через bincount.
+        """
+        labels = compiled.labels
+        labels.fill(0)
+        for index in range(len(contours)):
+            cv2.drawContours(labels, contours, index, index + 1, -1, offset=(-compiled.x, -compiled.y))
+
+        label_values = labels.ravel()
+        diff_values = compiled.crop(self.frame_diff).ravel()
+        size = len(contours) + 1
+
+        sums = np.bincount(label_values, weights=diff_values, minlength=size)
+        counts = np.bincount(label_values, minlength=size)
+        return sums[1:] / np.maximum(counts[1:], 1)
+
+    def _calculate_solidity(self, contour, area: Optional[float] = None) -> float:
         """Вычисление solidity контура"""
         hull = cv2.convexHull(contour)
         hull_area = cv2.contourArea(hull)
-        return float(cv2.contourArea(contour)) / hull_area if hull_area > 0 else 0
+        if area is None:
+            area = cv2.contourArea(contour)
+        return float(area) / hull_area if hull_area > 0 else 0
 
     def _update_recording_state(self, current_movements: set[int]) -> None:
         """Обновление состояния записи"""
@@ -447,15 +546,18 @@ class ROITracker:
     def draw_rois(self, frame: np.ndarray, changes: List[ROIDetectionEvent] = None,
                   roi_id: int | None = None) -> np.ndarray:
         """
-        Отрисовка ROI и изменений на кадре
+        Отрисовка ROI и изменений на кадре. Входной кадр не изменяется
 
         Args:
             frame: Входной кадр
             changes: Список изменений для визуализации
 
         Returns:
-            np.ndarray: Кадр с визуализацией
+            np.ndarray: Кадр с визуализацией (входной кадр, если рисовать нечего)
         """
+        if not changes and not any(roi.id in self.active_movements for roi in self.rois):
+            return frame
+
         overlay = frame.copy()
 
         _exit = False
@@ -477,19 +579,20 @@ class ROITracker:
                 border = (0, 255, 255)
                 cv2.polylines(overlay, [pts], True, border, thickness)
 
-        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+        # Результат смешивания пишется в копию, входной кадр может быть общим
+        result = cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, dst=overlay)
 
         if changes:
             for change in changes:
                 for obj in change.changes:
                     x, y, w, h = obj["bbox"]
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 255), 2)
+                    cv2.rectangle(result, (x, y), (x + w, y + h), (0, 255, 255), 2)
 
         # status_text = f"Recording: {'ON' if self.recording else 'OFF'}"
         # cv2.putText(frame, status_text, (10, 20),
         #             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
 
-        return frame
+        return result
 
     def get_roi(self, roi_id: int) -> Optional[ROI]:
         """Получение ROI по ID"""
@@ -0,0 +1,57 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import imutils
+import numpy as np
+
+
+def freeze(frame: np.ndarray) -> np.ndarray:
+    """Запрещает запись в кадр и возвращает его же. Кадр можно отдавать любому числу потребителей"""
+    frame.flags.writeable = False
+    return frame
+
+
+def shared(frame: np.ndarray) -> np.ndarray:
+    """Кадр только для чтения: общий кадр возвращается как есть,
+    изменяемый копируется - владелец может изменить его позже
+    """
+    if not frame.flags.writeable:
+        return frame
+    return freeze(frame.copy())
+
+
+class SharedFrame:
+    """Неизменяемый кадр камеры: оригинал в BGR и уменьшенная копия.
+
+    Один объект передается стадиям конвейера, трекеру, уведомлениям, MJPEG хабу и записи скриншотов
+    без копирования: массивы открыты только на чтение, память освобождается, когда на кадр
+    не остается ссылок. Потребитель, которому нужно рисовать на кадре, берет копию через mutable().
+    """
+
+    __slots__ = ('original', 'resized', 'seq', 'timestamp')
+
+    def __init__(self, original: np.ndarray, width: int, seq: int, timestamp: float):
+        self.original = freeze(original)
+        # Кадр уже нужной ширины не уменьшаем и не копируем
+        if original.shape[1] == width:
+            self.resized = original
+        else:
+            self.resized = freeze(imutils.resize(original, width=width))
+        self.seq = seq
+        self.timestamp = timestamp
+
+    def mutable(self, original: bool = False) -> np.ndarray:
+        """Изменяемая копия уменьшенного (или оригинального) кадра"""
+        return (self.original if original else self.resized).copy()
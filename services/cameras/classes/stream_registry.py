@@ -119,7 +119,10 @@ class StreamRegistry:
                     camera_id=stream.id,
                     stopped=stream.is_stopped(),
                     need_restart=stream.need_restart,
-                    capture_error=stream.capture_error
+                    capture_error=stream.capture_error,
+                    pipeline=stream.get_pipeline_stats(),
+                    analysis_mode=stream.governor.mode.value,
+                    analysis_fps=round(stream.governor.fps, 2)
                 )
             )
         return res
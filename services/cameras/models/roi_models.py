@@ -13,17 +13,43 @@
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from dataclasses import dataclass
 from datetime import datetime
 
 import cv2
-from typing import List
+from typing import List, Optional
 import numpy as np
-from pydantic import BaseModel, field_validator, Field, ConfigDict
+from pydantic import BaseModel, field_validator, Field, ConfigDict, PrivateAttr
 from services.cameras.enums.roi_enum import ROIEventType
 from models.camera_model import CameraModelWithRelations
 from services.cameras.models.roi_settings import ROISettings
 
 
+@dataclass
+class CompiledROI:
+    """
+    Предвычисленная маска ROI для конкретного размера кадра
+    Attributes:
+        shape (tuple[int, int]): Размер кадра (height, width), для которого построена маска
+        x, y, w, h (int): Ограничивающий прямоугольник ROI в координатах кадра
+        mask (np.ndarray): Маска ROI, обрезанная по прямоугольнику
+        scratch (np.ndarray): Буфер под пересечение маски с порогом движения
+        labels (np.ndarray): Буфер меток контуров для подсчета статистики
+    """
+    shape: tuple[int, int]
+    x: int
+    y: int
+    w: int
+    h: int
+    mask: np.ndarray
+    scratch: np.ndarray
+    labels: np.ndarray
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """Вырезает область ROI из кадра (view, без копирования)"""
+        return frame[self.y:self.y + self.h, self.x:self.x + self.w]
+
+
 class ROI(BaseModel):
     """
     Область интереса (Region of Interest)
@@ -42,6 +68,8 @@ class ROI(BaseModel):
     camera_id: int = 0
     options: ROISettings | None = Field(default_factory=ROISettings)
 
+    _compiled: Optional[CompiledROI] = PrivateAttr(default=None)
+
     @classmethod
     @field_validator('points')
     def validate_points(cls, v):
@@ -63,6 +91,36 @@ class ROI(BaseModel):
         cv2.fillPoly(mask, [pts], 255)
         return mask
 
+    def compile(self, width: int, height: int) -> Optional[CompiledROI]:
+        """Маска и ограничивающий прямоугольник ROI, пересчитываются только при смене размера кадра"""
+        if self._compiled is not None and self._compiled.shape == (height, width):
+            return self._compiled
+
+        pts = np.array(self.points, np.int32).reshape((-1, 1, 2))
+        bx, by, bw, bh = cv2.boundingRect(pts)
+
+        # Ограничиваем прямоугольник границами кадра
+        x, y = max(bx, 0), max(by, 0)
+        w, h = min(bx + bw, width) - x, min(by + bh, height) - y
+        if w <= 0 or h <= 0:
+            self._compiled = None
+            return None
+
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(mask, [pts], 255, offset=(-x, -y))
+
+        self._compiled = CompiledROI(
+            shape=(height, width),
+            x=x,
+            y=y,
+            w=w,
+            h=h,
+            mask=mask,
+            scratch=np.empty_like(mask),
+            labels=np.zeros((h, w), dtype=np.int32)
+        )
+        return self._compiled
+
     @property
     def bgr_color(self) -> tuple:
         """Конвертация HEX цвета в BGR"""
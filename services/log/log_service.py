@@ -13,11 +13,15 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import threading
+import json
+import os
 import queue
+import threading
 import time
-from datetime import datetime, timedelta
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Iterable
+
+from sqlalchemy import insert
 
 from config.settings import settings
 from database.session import write_session
@@ -30,7 +34,12 @@ from services.scheduler.models.task_schedule import TaskSchedule
 
 
 class LogService(BaseService):
-    """Фоновый воркер для асинхронной записи логов в БД"""
+    """Фоновый воркер для асинхронной записи логов в БД.
+
+    Логи забираются из очереди пачками (по размеру или по окну времени) и пишутся
+    одним многострочным INSERT. Если БД недоступна - пачка дописывается в локальный
+    spool файл (ndjson), который воспроизводится в БД, когда запись снова проходит.
+    """
 
     name = 'log'
     queue = queue.Queue(
@@ -40,15 +49,52 @@ class LogService(BaseService):
     flush_interval = None
     batch_size = None
 
+    spool_file = os.path.join(settings.LOG_DIR, 'logs_spool.ndjson')
+    spool_lock = threading.Lock()
+    last_replay_attempt: float = 0
+
+    # Счетчики
+    stats_lock = threading.Lock()
+    enqueued: int = 0
+    dropped: int = 0
+    spooled: int = 0
+    replayed: int = 0
+    flushed: int = 0
+    flush_failures: int = 0
+    flush_count: int = 0
+    flush_time_total: float = 0
+    last_flush_ms: float = 0
+    max_flush_ms: float = 0
+
     @classmethod
     def add_log(cls, log_data: Dict):
         """Добавление лога в очередь (неблокирующее)"""
         try:
             LogService.queue.put_nowait(log_data)
+            with cls.stats_lock:
+                cls.enqueued += 1
         except queue.Full:
-            # При переполнении - пишем в emergency файл
+            # При переполнении - пишем в spool файл
             cls._write_to_emergency_file(log_data)
 
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Счетчики воркера логов"""
+        with cls.stats_lock:
+            return {
+                'queue_size': cls.queue.qsize(),
+                'enqueued': cls.enqueued,
+                'dropped': cls.dropped,
+                'spooled': cls.spooled,
+                'replayed': cls.replayed,
+                'flushed': cls.flushed,
+                'flush_failures': cls.flush_failures,
+                'last_flush_ms': round(cls.last_flush_ms, 2),
+                'avg_flush_ms': round(cls.flush_time_total / cls.flush_count * 1000, 2) if cls.flush_count else 0,
+                'max_flush_ms': round(cls.max_flush_ms, 2),
+                'spool_bytes': os.path.getsize(cls.spool_file) if os.path.exists(cls.spool_file) else 0,
+            }
+
     def clear_old_logs(self):
         LogRepository.delete_old_logs(1)
 
@@ -62,68 +108,163 @@ class LogService(BaseService):
             ))
 
         """Основной цикл воркера"""
-        last_flush = time.time()
-
         self.batch_size = settings.LOG_BATCH_SIZE or 50
         self.flush_interval = settings.LOG_FLUSH_INTERVAL or 5
         self.buffer: List[Dict] = []
         self.thread = None
 
+        last_flush = time.time()
+
         while self.running:
             try:
-                # Неблокирующее чтение из очереди
+                # Ждем первую запись не дольше окна flush, остальное забираем без ожидания
+                timeout = max(0.0, self.flush_interval - (time.time() - last_flush))
                 try:
-                    log_data = LogService.queue.get_nowait()
-                    self.buffer.append(log_data)
+                    self.buffer.append(LogService.queue.get(timeout=timeout))
+                    while len(self.buffer) < self.batch_size:
+                        self.buffer.append(LogService.queue.get_nowait())
                 except queue.Empty:
                     pass
 
-                # Проверяем условия для flush
                 current_time = time.time()
                 should_flush = (
                         len(self.buffer) >= self.batch_size or
-                        int(current_time - last_flush) >= self.flush_interval
+                        current_time - last_flush >= self.flush_interval
                 )
 
-                if should_flush and self.buffer:
-                    self._flush_buffer()
+                if should_flush:
+                    if self.buffer:
+                        self._flush_buffer()
                     last_flush = current_time
-
-                time.sleep(0.01)  # Не грузим CPU
+                    self._replay_spool()
 
             except Exception as e:
                 self._handle_error(e)
 
+        # Дописываем остаток при остановке
+        try:
+            while True:
+                self.buffer.append(LogService.queue.get_nowait())
+        except queue.Empty:
+            pass
+        self._flush_buffer()
+
+    @classmethod
+    def _insert(cls, rows: List[Dict]):
+        """Один многострочный INSERT для всей пачки"""
+        with write_session() as session:
+            session.execute(insert(LogEntity), rows)
+            session.commit()
+
     def _flush_buffer(self):
         """Пакетная запись в БД"""
         if not self.buffer:
             return
 
+        rows = self.buffer
+        self.buffer = []
+        started = time.perf_counter()
         try:
-            with write_session() as session:
-                # Bulk insert
-                session.bulk_insert_mappings(LogEntity, self.buffer)
-                session.commit()
-                # print('Flushing', self.buffer)
-                pass
+            self._insert(rows)
+        except Exception as e:
+            # При ошибке БД - пишем в spool для последующей синхронизации
+            with LogService.stats_lock:
+                LogService.flush_failures += 1
+            self._spool(rows)
+            self._handle_error(e)
+            return
 
-            # Очистка только после успешного commit
-            self.buffer.clear()
+        elapsed = time.perf_counter() - started
+        with LogService.stats_lock:
+            LogService.flushed += len(rows)
+            LogService.flush_count += 1
+            LogService.flush_time_total += elapsed
+            LogService.last_flush_ms = elapsed * 1000
+            LogService.max_flush_ms = max(LogService.max_flush_ms, elapsed * 1000)
 
+    @classmethod
+    def _spool(cls, rows: Iterable[Dict]) -> bool:
+        """Дописывает записи в конец spool файла"""
+        rows = list(rows)
+        try:
+            lines = ''.join(json.dumps(row, default=cls._json_default) + '\n' for row in rows)
+            with cls.spool_lock:
+                with open(cls.spool_file, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            with cls.stats_lock:
+                cls.spooled += len(rows)
+            return True
         except Exception as e:
-            # При ошибке БД - пишем в файл для последующей синхронизации
-            self.buffer.clear()
+            with cls.stats_lock:
+                cls.dropped += len(rows)
+            cls._handle_error(e)
+            return False
+
+    def _replay_spool(self):
+        """Воспроизводит spool файл в БД пачками.
+        Файл переименовывается, чтобы новые ошибки записи продолжали дописываться в новый spool.
+        Невоспроизведенный остаток возвращается в spool.
+        """
+        if not os.path.exists(LogService.spool_file):
+            return
+        now = time.time()
+        if now - LogService.last_replay_attempt < settings.LOG_SPOOL_REPLAY_INTERVAL:
+            return
+        LogService.last_replay_attempt = now
+
+        replay_file = LogService.spool_file + '.replay'
+        with LogService.spool_lock:
+            if not os.path.exists(replay_file):
+                os.replace(LogService.spool_file, replay_file)
+
+        with open(replay_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+        position = 0
+        try:
+            while position < len(lines):
+                chunk = lines[position:position + self.batch_size]
+                rows = [self._from_spool(line) for line in chunk if line.strip()]
+                rows = [row for row in rows if row is not None]
+                if rows:
+                    self._insert(rows)
+                    with LogService.stats_lock:
+                        LogService.replayed += len(rows)
+                position += len(chunk)
+        except Exception as e:
+            self._handle_error(e)
+
+        rest = lines[position:]
+        with LogService.spool_lock:
+            if rest:
+                with open(LogService.spool_file, 'a', encoding='utf-8') as f:
+                    f.writelines(rest)
+            os.remove(replay_file)
+
+    @classmethod
+    def _from_spool(cls, line: str) -> Dict | None:
+        try:
+            row = json.loads(line)
+            if isinstance(row.get('timestamp'), str):
+                row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+            return row
+        except ValueError:
+            with cls.stats_lock:
+                cls.dropped += 1
+            return None
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
 
     @classmethod
     def _write_to_emergency_file(cls, log_data: Dict):
-        """Запись в emergency файл при переполнении очереди"""
-        # with open('/tmp/logs_emergency.ndjson', 'a') as f:
-        #    f.write(json.dumps(log_data) + '\n')
-        print(str(log_data))
+        """Запись в spool файл при переполнении очереди"""
+        cls._spool([log_data])
 
     @classmethod
     def _handle_error(cls, error: Exception):
         """Обработка ошибок воркера"""
-        # with open('/tmp/log_worker_errors.log', 'a') as f:
-        #    f.write(f"{time.time()}: {str(error)}\n")
         print(error)
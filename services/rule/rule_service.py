@@ -19,6 +19,7 @@ from classes.logger.logger import Logger
 from classes.logger.logger_types import LoggerType
 from classes.rules.rule_execution_tracker import RuleExecutionTracker
 from classes.rules.rule_executor import RuleExecutor
+from classes.rules.rule_graph import rule_graph_cache, CompiledRuleGraph
 from classes.rules.rules_store import rules_triggers_store
 from classes.thread.task_manager import TaskManager
 from database.session import write_session
@@ -27,7 +28,6 @@ from models.camera_event_model import CameraEventModel
 from models.device_model_relations import DeviceModelWithRelations
 from models.rule_model import RuleNodeTypes, NodeVisualize, RuleNodeTypeKeys
 from models.sensor_model import SensorModelWithDevice
-from repositories.rules_repository import RulesRepository
 from services.base_service import BaseService
 from sqlmodel import select
 
@@ -50,9 +50,9 @@ class RuleService(BaseService):
     ):
         trigger_entity_id: int = entity_id
 
-        exists = rules_triggers_store.find(key=trigger).exists(entity_id=trigger_entity_id)
-        if exists:
-            trigger_models = rules_triggers_store.find(key=trigger).find(entity_id=trigger_entity_id)
+        collection = rules_triggers_store.find(key=trigger)
+        if collection.exists(entity_id=trigger_entity_id):
+            trigger_models = collection.find(entity_id=trigger_entity_id)
             for model in trigger_models:
                 Logger.debug(
                     f"✅ Rule {model.rule_id} has entity {trigger_entity_id} with all ids: {model.ids}",
@@ -67,9 +67,11 @@ class RuleService(BaseService):
                     )
                     continue
 
-                rule = RulesRepository.get_rule(model.rule_id)
+                graph = rule_graph_cache.get(model.rule_id)
+                if graph is None:
+                    continue
                 self._execute_rule_with_tracking(
-                    rule,
+                    graph,
                     trigger_entity_id,
                     **kwargs
                 )
@@ -92,10 +94,11 @@ class RuleService(BaseService):
         )
 
     def _execute_rule_with_tracking(
-            self, rule,
+            self, graph: CompiledRuleGraph,
             entity_id: int | None = None,
             **kwargs):
         """Запускает выполнение правила с отслеживанием статуса"""
+        rule = graph.rule
         # Пытаемся пометить правило как выполняющееся
         if not self.execution_tracker.mark_executing(rule.id):
             Logger.warn(f"Rule {rule.id} is already executing, skipping", LoggerType.RULES)
@@ -107,12 +110,12 @@ class RuleService(BaseService):
                 # Обязательно передаем entity_id
                 RuleService.task_manager.submit(
                     self._execute_rule,
-                    rule=rule,
+                    graph=graph,
                     entity_id=entity_id,
                     **kwargs
                 )
             else:
-                self._execute_rule(rule, entity_id, **kwargs)
+                self._execute_rule(graph, entity_id, **kwargs)
         except Exception as e:
             # В случае ошибки при запуске снимаем блокировку
             self.execution_tracker.mark_completed(rule.id)
@@ -120,15 +123,15 @@ class RuleService(BaseService):
 
     def _execute_rule(
             self,
-            rule,
+            graph: CompiledRuleGraph,
             entity_id: int | None = None,
             **kwargs):
         """Внутренний метод выполнения правила"""
         try:
-            RuleExecutor(rule).execute(entity_id, **kwargs)
+            RuleExecutor(graph.instance(), graph=graph).execute(entity_id, **kwargs)
         finally:
             # Всегда снимаем блокировку после выполнения
-            self.execution_tracker.mark_completed(rule.id)
+            self.execution_tracker.mark_completed(graph.rule.id)
 
     def run(self):
         with write_session() as session:
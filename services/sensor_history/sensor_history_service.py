@@ -0,0 +1,31 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+
+from repositories.sensor_history_rollup_repository import SensorHistoryRollupRepository
+from services.base_service import BaseService
+
+
+class SensorHistoryService(BaseService):
+    """Поддерживает агрегаты истории сенсоров (1m/1h/1d) в актуальном состоянии"""
+
+    name = 'sensor_history'
+    interval: int = 60
+
+    def run(self):
+        while self.running:
+            SensorHistoryRollupRepository.refresh()
+            time.sleep(self.interval)
@@ -0,0 +1,84 @@
+#  Copyright (C) 2025 Mikhail Sazanov
+#  #
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published
+#  by the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  #
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+#  #
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import atexit
+import threading
+from typing import Any, Dict, List, Optional
+
+from classes.configuration.configuration import EcosystemDatabaseConfiguration
+from classes.devices.device_index import device_index
+from classes.devices.sensor_ingest_buffer import sensor_ingest_buffer
+from classes.logger.logger import Logger
+from classes.logger.logger_types import LoggerType
+from config.settings import settings
+from repositories.sensor_repository import SensorRepository
+from services.base_service import BaseService
+
+
+class SensorIngestService(BaseService):
+    """Конвейер записи значений сенсоров.
+
+    Значения принимает sensor_ingest_buffer, сервис пишет накопленные текущие значения
+    и строки истории одной транзакцией раз в flush_interval
+    или при накоплении batch_size строк истории.
+    """
+
+    name = 'sensor_ingest'
+
+    def __init__(self, config: EcosystemDatabaseConfiguration):
+        super().__init__(config)
+        # Поток сервиса - daemon: без остановки остаток пачки потерялся бы при выходе
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0):
+        """Останавливает цикл и дожидается записи остатка"""
+        self.running = False
+        sensor_ingest_buffer.wakeup.set()
+        if self.thread is not None and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+
+    def run(self):
+        """Основной цикл: запись накопленных значений раз в flush_interval"""
+        flush_interval = settings.SENSOR_INGEST_FLUSH_INTERVAL or 1.0
+        while self.running:
+            sensor_ingest_buffer.wakeup.wait(timeout=flush_interval)
+            sensor_ingest_buffer.wakeup.clear()
+            self.flush()
+
+        # Дописываем остаток при остановке
+        self.flush()
+
+    @classmethod
+    def flush(cls):
+        values, history = sensor_ingest_buffer.take()
+        if not values and not history:
+            return
+
+        try:
+            SensorRepository.write_values(values, history)
+        except Exception as e:
+            Logger.err(f'Sensor values batch failed, retrying per sensor: {e}', LoggerType.APP)
+            cls._flush_per_sensor(values, history)
+
+    @classmethod
+    def _flush_per_sensor(cls, values: Dict[int, Optional[str]], history: List[Dict[str, Any]]):
+        """Запись по сенсорам: ошибка одного сенсора (например, удаленного) не теряет всю пачку"""
+        for sensor_id, value in values.items():
+            rows = [row for row in history if row['sensor_id'] == sensor_id]
+            try:
+                SensorRepository.write_values({sensor_id: value}, rows)
+            except Exception as e:
+                Logger.err(f'Sensor #{sensor_id} values dropped: {e}', LoggerType.APP)
+                device_index.invalidate_sensors([sensor_id])
+                sensor_ingest_buffer.forget(sensor_id)
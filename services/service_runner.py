@@ -72,6 +72,14 @@ class ServiceRunner:
         Logger.warn(f"Service '{service_name}' not found", LoggerType.SERVICES)
         return None
 
+    def stop(self):
+        """Останавливает все сервисы"""
+        for service in self.services:
+            try:
+                service.stop()
+            except Exception as e:
+                Logger.err(f"⏩ ServiceRunner stop {service.name}: {e}", LoggerType.SERVICES)
+
     def get_service_class_name(self, name: str):
         __name__ = ''
         expl = name.split('_')